@@ -0,0 +1,305 @@
+"""
+End-to-end benchmark of the download jobs: every job is processed by a real DownloadManager (extraction, download,
+upload, preview) against local stand-in servers, so the results don't depend on the network and no account is
+needed:
+
+- VideoServer: synthetic video with 'Range' support (direct links) and an HLS variant
+- FakeUploaderApi: OpenLoad.co / VeryStream.com API ('upload_link', upload POST, 'splash_image')
+- FakeBot: Telegram bot with a fixed request latency
+
+For every concurrency level the benchmark reports the throughput, the job latency percentiles and the peak RSS.
+
+Usage (from the repository folder):
+    python _benchmarks/e2e_benchmark.py --jobs 1,4,16 --source direct
+    python _benchmarks/e2e_benchmark.py --jobs 4 --source hls --output results.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.bandwidthgovernor import BandwidthGovernor
+from classes.downloadjob import DownloadJob
+from classes.downloadmanager import DownloadManager
+from classes.downloadrequest import DownloadRequest
+from classes.messagequeue import MessageQueue
+from classes.metadatacache import MetadataCache
+from classes.notifier import Notifier
+from classes.openloadwrapper import OpenloadWrapper
+from classes.previewgenerator import PreviewGenerator
+from classes.progressmessage import ProgressMessage
+from classes.thumbnailpoller import ThumbnailPoller
+from classes.tracesummary import TraceSummary
+
+from fakebot import FakeBot
+from fakeuploader import FakeUploaderApi
+from syntheticvideo import SyntheticVideo
+from videoserver import VideoServer
+
+
+class RssSampler:
+    """
+    Measures the peak resident memory of the process while a benchmark level runs.
+    """
+
+    def __init__(self, interval=0.05):
+        self.INTERVAL = interval
+        self.peak = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def get_rss() -> int:
+        """
+        :return: Current resident memory in bytes (peak of the process if /proc is not available).
+        """
+
+        try:
+            with open("/proc/self/statm") as file:
+                return int(file.read().split()[1]) * resource.getpagesize()
+        except (OSError, ValueError, IndexError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def start(self):
+        self.peak = self.get_rss()
+        self._stop.clear()
+
+        self._thread = threading.Thread(target=self._run, name="RssSampler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+    def _run(self):
+        while not self._stop.wait(self.INTERVAL):
+            self.peak = max(self.peak, self.get_rss())
+
+
+class Benchmark:
+    """
+    Runs the download jobs against the local servers and collects the results of every concurrency level.
+    """
+
+    def __init__(self, args):
+        self.args = args
+
+        self.work_dir = tempfile.mkdtemp(prefix="rimesegate-bench-")
+        self.video_path = SyntheticVideo.generate(
+            args.cache_dir, seconds=args.duration, width=args.width, height=args.height
+        )
+
+        self.video_server = VideoServer(
+            self.video_path, segment_size=args.segment_kb * 1024, latency=args.server_latency,
+            rate=args.server_rate_kb * 1024
+        )
+        self.api = FakeUploaderApi(chunked=not args.no_chunks, splash_delay=args.splash_delay)
+        self.bot = FakeBot(latency=args.telegram_latency)
+
+        self.uploader = OpenloadWrapper(
+            "benchmark", "benchmark", upload_parallelism=args.upload_parallelism,
+            upload_chunk_size=args.chunk_mb * 1024 * 1024, chunked_upload=not args.no_chunks
+        )
+        self.uploader.api_url = self.api.api_url
+
+        self.preview_generator = PreviewGenerator()
+        self.metadata_cache = MetadataCache()
+        self.governor = BandwidthGovernor()
+        self.thumbnail_poller = ThumbnailPoller(initial_delay=args.splash_delay, max_interval=1.0)
+
+        self._job_ids = iter(range(1, 1000000))
+
+    def start(self):
+        self.video_server.start()
+        self.api.start()
+
+        # The notifications are sent in background like in the bot
+        Notifier.MESSAGE_QUEUE = MessageQueue(self.bot)
+        Notifier.MESSAGE_QUEUE.start()
+
+        # The previews and the upload checkpoints are written in the working folder
+        os.chdir(self.work_dir)
+
+    def stop(self):
+        self.video_server.stop()
+        self.api.stop()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def get_url(self, job_id: int) -> str:
+        # Every job has its own url, so the metadata cache and the dedup index don't skip it
+        if self.args.source == "hls":
+            return self.video_server.get_hls_url("job={}".format(job_id))
+
+        return self.video_server.get_video_url("job={}".format(job_id))
+
+    def run_job(self, job_id: int) -> dict:
+        """
+        Processes a job like the JobScheduler worker and waits until it's completed (online thumbnail included).
+
+        :return: {"seconds", "done"}.
+        """
+
+        save_path = os.path.join(self.work_dir, "downloads")
+        os.makedirs(save_path, exist_ok=True)
+
+        manager = DownloadManager(
+            DownloadRequest(self.get_url(job_id), "job-{}".format(job_id)),
+            Notifier.from_chat_id(job_id, self.bot),
+            self.uploader,
+            online_thumbnail=self.args.online_thumbnail,
+            pipelined_upload=self.args.pipelined,
+            preview_generator=self.preview_generator,
+            metadata_cache=self.metadata_cache,
+            download_segments=self.args.segments,
+            concurrent_fragments=self.args.fragments,
+            bandwidth_governor=self.governor,
+            thumbnail_poller=self.thumbnail_poller,
+        )
+
+        job = DownloadJob(manager, {
+            "save_path": save_path,
+            "overwrite_check": False,
+            "automatic_filename": False,
+            "new_download_method": self.args.method == "youtube-dl",
+            "convert_to_mp4": False,
+        })
+
+        started = time.monotonic()
+        job.run()
+
+        while manager.thumbnail_pending:
+            time.sleep(0.01)
+
+        return {"seconds": time.monotonic() - started, "done": manager.progress.stage == ProgressMessage.DONE}
+
+    def run_level(self, concurrency: int) -> dict:
+        """
+        Runs 'rounds * concurrency' jobs, 'concurrency' at the same time.
+
+        :return: Results of the level.
+        """
+
+        count = concurrency * self.args.rounds
+        job_ids = [next(self._job_ids) for _ in range(count)]
+
+        served = self.video_server.bytes_sent
+        uploaded = self.api.bytes_received
+        requests = self.bot.get_total_requests()
+
+        sampler = RssSampler()
+        sampler.start()
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(self.run_job, job_ids))
+
+        elapsed = time.monotonic() - started
+        peak_rss = sampler.stop()
+
+        latencies = sorted(result["seconds"] for result in results)
+        done = sum(1 for result in results if result["done"])
+        transferred = self.video_server.bytes_sent - served + self.api.bytes_received - uploaded
+
+        return {
+            "concurrency": concurrency,
+            "jobs": count,
+            "done": done,
+            "seconds": round(elapsed, 3),
+            "jobs_per_minute": round(done * 60 / elapsed, 2),
+            "mb_per_second": round(transferred / elapsed / (1024 * 1024), 2),
+            "latency": {
+                "p50": round(TraceSummary.percentile(latencies, 50), 3),
+                "p90": round(TraceSummary.percentile(latencies, 90), 3),
+                "p99": round(TraceSummary.percentile(latencies, 99), 3),
+                "max": round(latencies[-1], 3),
+            },
+            "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+            "telegram_requests": self.bot.get_total_requests() - requests,
+        }
+
+
+def print_results(levels: list):
+    print()
+    print("{:>6}{:>8}{:>10}{:>10}{:>10}{:>9}{:>9}{:>9}{:>9}{:>11}".format(
+        "jobs", "done", "seconds", "jobs/min", "MB/s", "p50", "p90", "p99", "max", "RSS MB"))
+
+    for level in levels:
+        latency = level["latency"]
+        print("{:>6}{:>8}{:>10.2f}{:>10.2f}{:>10.2f}{:>9.2f}{:>9.2f}{:>9.2f}{:>9.2f}{:>11.1f}".format(
+            level["concurrency"], "{}/{}".format(level["done"], level["jobs"]), level["seconds"],
+            level["jobs_per_minute"], level["mb_per_second"], latency["p50"], latency["p90"], latency["p99"],
+            latency["max"], level["peak_rss_mb"]))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the RimeSegateBot download jobs")
+    parser.add_argument("--jobs", default="1,4,16", help="Concurrency levels (default: 1,4,16)")
+    parser.add_argument("--rounds", type=int, default=2, help="Jobs of every level = rounds * concurrency")
+    parser.add_argument("--source", choices=("direct", "hls"), default="direct", help="Direct link or HLS")
+    parser.add_argument("--method", choices=("youtube-dl", "segmented"), default="youtube-dl",
+                        help="New (Youtube-DL) or old (segmented HTTP) download method")
+    parser.add_argument("--duration", type=int, default=30, help="Synthetic video duration (seconds)")
+    parser.add_argument("--width", type=int, default=640, help="Synthetic video width")
+    parser.add_argument("--height", type=int, default=360, help="Synthetic video height")
+    parser.add_argument("--segment-kb", type=int, default=256, help="HLS segment size (KB)")
+    parser.add_argument("--server-latency", type=float, default=0.0, help="Video server latency (seconds)")
+    parser.add_argument("--server-rate-kb", type=int, default=0, help="Video server speed per connection (KB/s)")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="Fake Telegram latency (seconds)")
+    parser.add_argument("--splash-delay", type=float, default=1.0, help="Fake thumbnail generation time")
+    parser.add_argument("--online-thumbnail", action="store_true", help="Wait for the uploader thumbnail")
+    parser.add_argument("--pipelined", action="store_true", help="Upload while downloading")
+    parser.add_argument("--no-chunks", action="store_true", help="Upload links without chunked uploads")
+    parser.add_argument("--chunk-mb", type=int, default=8, help="Upload chunk size (MB)")
+    parser.add_argument("--upload-parallelism", type=int, default=4, help="Chunks uploaded at the same time")
+    parser.add_argument("--segments", type=int, default=4, help="Connections of the segmented downloads")
+    parser.add_argument("--fragments", type=int, default=4, help="HLS fragments downloaded at the same time")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "rimesegate-bench-videos"),
+                        help="Folder of the synthetic videos (reused between runs)")
+    parser.add_argument("--output", help="Save the results in a JSON file")
+    args = parser.parse_args(arguments)
+
+    if args.source == "hls" and args.method != "youtube-dl":
+        parser.error("HLS videos are supported only by the youtube-dl method")
+
+    args.cache_dir = os.path.abspath(args.cache_dir)
+    output = os.path.abspath(args.output) if args.output else None
+
+    benchmark = Benchmark(args)
+    benchmark.start()
+
+    print("Video: {} ({:.1f} MB), source: {}, method: {}".format(
+        benchmark.video_path, os.path.getsize(benchmark.video_path) / (1024 * 1024), args.source, args.method))
+
+    levels = []
+    try:
+        for concurrency in (int(value) for value in args.jobs.split(",")):
+            print("Running {} jobs, {} at the same time...".format(concurrency * args.rounds, concurrency))
+            levels.append(benchmark.run_level(concurrency))
+    finally:
+        benchmark.stop()
+
+    print_results(levels)
+
+    if output is not None:
+        with open(output, "w") as file:
+            json.dump({"options": vars(args), "levels": levels}, file, indent=2)
+
+        print("Results saved in", output)
+
+    return 0 if all(level["done"] == level["jobs"] for level in levels) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
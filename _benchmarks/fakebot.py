@@ -0,0 +1,58 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeBot:
+    """
+    Replaces the Telegram.Bot object in the benchmarks: the messages are not sent, every request waits
+    'latency' seconds (Telegram round trip) and is counted.
+    """
+
+    def __init__(self, latency=0.05):
+        """
+        Parametrized constructor method.
+
+        :param latency: (Optional, Default=0.05) Seconds waited by every request.
+        """
+
+        self.LATENCY = latency
+
+        # <method name>: number of requests
+        self.requests = {}
+        self.request_seconds = 0.0
+
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _request(self, method: str, chat_id):
+        started = time.monotonic()
+
+        if self.LATENCY:
+            time.sleep(self.LATENCY)
+
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            self.request_seconds += time.monotonic() - started
+
+        return SimpleNamespace(message_id=next(self._message_ids), chat_id=chat_id)
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self._request("send_message", chat_id)
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        return self._request("edit_message_text", chat_id)
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        return self._request("send_photo", chat_id)
+
+    def send_video(self, chat_id, video, **kwargs):
+        return self._request("send_video", chat_id)
+
+    def send_chat_action(self, chat_id, action, **kwargs):
+        return self._request("send_chat_action", chat_id)
+
+    def get_total_requests(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
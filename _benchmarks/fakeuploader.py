@@ -0,0 +1,196 @@
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeUploaderApi:
+    """
+    Local HTTP server that replaces the OpenLoad.co / VeryStream.com API in the benchmarks:
+
+    - GET <api>/file/ul: returns an upload link (/upload/<n>)
+    - POST /upload/<n>: receives a chunk ('Content-Range: bytes a-b/size'), commits a chunked upload
+      ('Content-Range: bytes */size') or receives the whole file (multipart or chunked transfer encoding)
+    - GET <api>/file/getsplash: the thumbnail url, 'splash_delay' seconds after the upload (404 before)
+
+    The uploaded data is counted and discarded. Point the uploader to the server changing its 'api_url'.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, chunked=True, splash_delay=0.0, latency=0.0):
+        """
+        Parametrized constructor method.
+
+        :param host: (Optional, Default=127.0.0.1) Address where the server listens.
+        :param port: (Optional, Default=0) Port where the server listens (0 = random free port).
+        :param chunked: (Optional, Default=True) If it's true the upload links accept chunked uploads.
+        :param splash_delay: (Optional, Default=0) Seconds between the end of an upload and its thumbnail.
+        :param latency: (Optional, Default=0) Seconds waited before every API response.
+        """
+
+        self.CHUNKED = chunked
+        self.SPLASH_DELAY = splash_delay
+        self.LATENCY = latency
+
+        # Uploaded files: <file id>: time of the end of the upload
+        self.uploaded = {}
+
+        # Received bytes and API requests
+        self.bytes_received = 0
+        self.api_requests = 0
+
+        self._links = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/1/".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="FakeUploaderApi")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _finish_upload(self, link: str, size: int) -> dict:
+        file_id = "f" + link
+
+        with self._lock:
+            self.uploaded[file_id] = time.monotonic()
+
+        return {
+            "id": file_id,
+            "name": "video-{}".format(link),
+            "size": str(size),
+            "sha1": "",
+            "content_type": "video/x-msvideo",
+            "url": "https://uploader.local/f/{}".format(file_id)
+        }
+
+    def _get_splash(self, file_id: str):
+        with self._lock:
+            uploaded = self.uploaded.get(file_id)
+
+        if uploaded is None or time.monotonic() - uploaded < self.SPLASH_DELAY:
+            return None
+
+        return "https://uploader.local/splash/{}.jpg".format(file_id)
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.api_requests += 1
+
+                if server.LATENCY:
+                    time.sleep(server.LATENCY)
+
+                path, _, query = self.path.partition("?")
+                params = {key: values[0] for key, values in parse_qs(query).items()}
+
+                if path.endswith("/file/ul"):
+                    link = next(server._links)
+                    host, port = server._server.server_address[:2]
+                    self._send_json(200, {"url": "http://{}:{}/upload/{}".format(host, port, link),
+                                          "valid_until": "2099-01-01 00:00:00"})
+
+                elif path.endswith("/file/getsplash"):
+                    splash = server._get_splash(params.get("file", ""))
+
+                    if splash is None:
+                        self._send_json(404, None, "thumbnail not ready")
+                    else:
+                        self._send_json(200, splash)
+
+                else:
+                    self._send_json(404, None, "unknown API method")
+
+            def do_POST(self):
+                match = re.match(r"^/upload/(\d+)$", self.path)
+                if match is None:
+                    self.send_error(404)
+                    return
+
+                received = self._read_body()
+                with server._lock:
+                    server.bytes_received += received
+
+                content_range = self.headers.get("Content-Range", "")
+                commit = re.match(r"bytes \*/(\d+)", content_range)
+                chunk = re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range)
+
+                if (commit is not None or chunk is not None) and not server.CHUNKED:
+                    self._send_json(400, None, "chunked uploads not supported", http_status=400)
+
+                elif commit is not None:
+                    self._send_json(200, server._finish_upload(match.group(1), int(commit.group(1))))
+
+                elif chunk is not None:
+                    # Chunk accepted, the upload continues
+                    self._send_json(200, None, "chunk received", http_status=202)
+
+                else:
+                    self._send_json(200, server._finish_upload(match.group(1), received))
+
+            def _read_body(self) -> int:
+                """
+                Reads and discards the request body.
+
+                :return: Number of bytes read.
+                """
+
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    received = 0
+
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                        if size == 0:
+                            # Trailer
+                            while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                                pass
+                            return received
+
+                        received += len(self.rfile.read(size))
+                        self.rfile.readline()
+
+                remaining = int(self.headers.get("Content-Length", 0))
+                received = 0
+
+                while remaining > 0:
+                    data = self.rfile.read(min(remaining, 256 * 1024))
+                    if not data:
+                        break
+
+                    received += len(data)
+                    remaining -= len(data)
+
+                return received
+
+            def _send_json(self, status, result, message="OK", http_status=200):
+                # Like the real API, the errors are in the JSON status
+                body = json.dumps({"status": status, "msg": message, "result": result}).encode()
+
+                self.send_response(http_status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
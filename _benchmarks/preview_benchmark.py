@@ -0,0 +1,222 @@
+"""
+Micro-benchmark of the PreviewGenerator: synthetic clips (several resolutions, durations and codecs) are generated
+with OpenCV and 'generate_preview' is timed with every frame selection and seek mode. The results can be saved as
+a JSON baseline and the following runs are compared with it, so the regressions of the preview code are caught
+(exit code 1 if a case is slower than the baseline more than the tolerance).
+
+Usage (from the repository folder):
+    python _benchmarks/preview_benchmark.py --save-baseline _benchmarks/preview_baseline.json
+    python _benchmarks/preview_benchmark.py --baseline _benchmarks/preview_baseline.json --tolerance 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+
+from classes.previewgenerator import PreviewGenerator
+
+from syntheticvideo import SyntheticVideo
+
+
+class PreviewBenchmark:
+    """
+    Times the preview generation of every (clip, selection, seek mode) case.
+    """
+
+    def __init__(self, clips_dir: str, repeat=3, workers=0):
+        """
+        Parametrized constructor method.
+
+        :param clips_dir: Folder where the synthetic clips are saved (reused between runs).
+        :param repeat: (Optional, Default=3) Number of previews generated for every case.
+        :param workers: (Optional, Default=0) PreviewGenerator worker processes.
+        """
+
+        self.CLIPS_DIR = clips_dir
+        self.REPEAT = repeat
+        self.WORKERS = workers
+
+        self._save_path = tempfile.mkdtemp(prefix="rimesegate-previews-")
+
+    @staticmethod
+    def get_case_name(width, height, seconds, codec, selection, seek_mode) -> str:
+        return "{}x{}-{}s-{}/{}/{}".format(width, height, seconds, codec, selection, seek_mode)
+
+    def run_case(self, clip_path: str, selection: str, seek_mode: str):
+        """
+        Generates the preview of a clip 'repeat' times (plus a warm up run).
+
+        :return: Dict with the timings in seconds or None if the seek mode is not available (keyframe seek
+        without ffmpeg falls back to the timestamp seek, which is measured separately).
+        """
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator = PreviewGenerator(seek_mode=seek_mode, workers=self.WORKERS, selection=selection)
+
+        if generator.seek_mode != seek_mode:
+            return None
+
+        timings = []
+
+        try:
+            for run in range(self.REPEAT + 1):
+                started = time.perf_counter()
+
+                # The generator prints every extracted frame
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generator.generate_preview(clip_path, self._save_path)
+
+                # The first run warms up the OS cache and the worker processes
+                if run > 0:
+                    timings.append(time.perf_counter() - started)
+        finally:
+            generator.shutdown()
+
+        return {
+            "median": round(statistics.median(timings), 4),
+            "min": round(min(timings), 4),
+            "max": round(max(timings), 4),
+        }
+
+    def run(self, resolutions, durations, codecs, selections, seek_modes) -> dict:
+        """
+        Runs every combination of the arguments.
+
+        :return: Dict <case name>: timings.
+        """
+
+        results = {}
+
+        try:
+            for width, height in resolutions:
+                for seconds in durations:
+                    for codec in codecs:
+                        try:
+                            clip_path = SyntheticVideo.generate(self.CLIPS_DIR, seconds=seconds, width=width,
+                                                                height=height, codec=codec)
+                        except RuntimeError as ex:
+                            print("Skipping {} clips: {}".format(codec, ex))
+                            continue
+
+                        for selection in selections:
+                            for seek_mode in seek_modes:
+                                name = self.get_case_name(width, height, seconds, codec, selection, seek_mode)
+                                timings = self.run_case(clip_path, selection, seek_mode)
+
+                                if timings is None:
+                                    print("{:<44} skipped ({} seek not available)".format(name, seek_mode))
+                                    continue
+
+                                results[name] = timings
+                                print("{:<44} {:>8.3f} s (min {:.3f} s)".format(
+                                    name, timings["median"], timings["min"]))
+        finally:
+            shutil.rmtree(self._save_path, ignore_errors=True)
+
+        return results
+
+    @staticmethod
+    def compare(results: dict, baseline: dict, tolerance: float) -> list:
+        """
+        Compares the median timings with a baseline.
+
+        :param results: Results of this run.
+        :param baseline: Results of the baseline.
+        :param tolerance: Max accepted slowdown (0.25 = 25% slower than the baseline).
+        :return: List of (case name, baseline seconds, seconds) of the regressions.
+        """
+
+        regressions = []
+
+        for name, timings in sorted(results.items()):
+            reference = baseline.get(name)
+
+            if reference is None:
+                continue
+
+            if timings["median"] > reference["median"] * (1 + tolerance):
+                regressions.append((name, reference["median"], timings["median"]))
+
+        return regressions
+
+
+def parse_resolutions(value: str) -> list:
+    return [tuple(int(size) for size in resolution.split("x")) for resolution in value.split(",")]
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the RimeSegateBot preview generation")
+    parser.add_argument("--resolutions", default="640x360,1280x720,1920x1080", help="Clip resolutions")
+    parser.add_argument("--durations", default="10,60", help="Clip durations (seconds)")
+    parser.add_argument("--codecs", default="mjpg,mp4v",
+                        help="Clip codecs ({})".format(", ".join(sorted(SyntheticVideo.CODECS))))
+    parser.add_argument("--selections", default="uniform,scene", help="Frame selection modes")
+    parser.add_argument("--seek-modes", default="frame,timestamp,keyframe", help="Seek modes")
+    parser.add_argument("--repeat", type=int, default=3, help="Previews generated for every case")
+    parser.add_argument("--workers", type=int, default=0, help="PreviewGenerator worker processes")
+    parser.add_argument("--clips-dir", default=os.path.join(tempfile.gettempdir(), "rimesegate-bench-videos"),
+                        help="Folder of the synthetic clips (reused between runs)")
+    parser.add_argument("--baseline", help="Compare the results with this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Accepted slowdown (default: 0.25 = 25%%)")
+    parser.add_argument("--save-baseline", help="Save the results as a JSON baseline")
+    args = parser.parse_args(arguments)
+
+    benchmark = PreviewBenchmark(os.path.abspath(args.clips_dir), repeat=args.repeat, workers=args.workers)
+    results = benchmark.run(
+        parse_resolutions(args.resolutions),
+        [int(value) for value in args.durations.split(",")],
+        args.codecs.split(","),
+        args.selections.split(","),
+        args.seek_modes.split(","),
+    )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump({
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "machine": platform.node(),
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "repeat": args.repeat,
+                "workers": args.workers,
+                "results": results,
+            }, file, indent=2, sort_keys=True)
+
+        print("Baseline saved in", args.save_baseline)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+        missing = sorted(set(baseline["results"]) - set(results))
+        if missing:
+            print("Cases of the baseline not measured:", ", ".join(missing))
+
+        regressions = benchmark.compare(results, baseline["results"], args.tolerance)
+
+        for name, reference, seconds in regressions:
+            print("REGRESSION {}: {:.3f} s -> {:.3f} s (+{:.0%})".format(
+                name, reference, seconds, seconds / reference - 1))
+
+        if regressions:
+            return 1
+
+        print("No regressions (tolerance {:.0%})".format(args.tolerance))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
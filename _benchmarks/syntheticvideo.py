@@ -0,0 +1,76 @@
+import os
+
+import cv2
+import numpy as np
+
+
+class SyntheticVideo:
+    """
+    This class generates test videos with OpenCV (no network and no sample files needed). Every frame has a
+    moving gradient, a moving box and the frame number, and the scene changes every few seconds, so the
+    preview generator has different frames to choose.
+    """
+
+    # Codecs: <name>: (fourcc, file extension)
+    CODECS = {
+        "mjpg": ("MJPG", ".avi"),
+        "xvid": ("XVID", ".avi"),
+        "mp4v": ("mp4v", ".mp4"),
+    }
+
+    # Seconds between two scene changes
+    SCENE_SECONDS = 5
+
+    @classmethod
+    def generate(cls, folder: str, seconds=30, width=640, height=360, fps=25, codec="mjpg") -> str:
+        """
+        Writes a video (it's reused if it already exists).
+
+        :param folder: Folder where the video is saved.
+        :param seconds: (Optional, Default=30) Video duration.
+        :param width: (Optional, Default=640) Frame width.
+        :param height: (Optional, Default=360) Frame height.
+        :param fps: (Optional, Default=25) Frames per second.
+        :param codec: (Optional, Default=mjpg) Codec name (see CODECS).
+        :return: Path of the video.
+        """
+
+        fourcc, extension = cls.CODECS[codec]
+        path = os.path.join(folder, "synthetic-{}x{}-{}s-{}fps-{}{}".format(width, height, seconds, fps, codec,
+                                                                         extension))
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            return path
+
+        os.makedirs(folder, exist_ok=True)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+
+        if not writer.isOpened():
+            raise RuntimeError("OpenCV can't write {} videos".format(codec))
+
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+
+        try:
+            for index in range(int(seconds * fps)):
+                scene = index // (cls.SCENE_SECONDS * fps)
+                shift = index * 4
+
+                frame = np.empty((height, width, 3), dtype=np.uint8)
+                frame[:, :, 0] = (x + shift + scene * 60) % 256
+                frame[:, :, 1] = (y + scene * 90) % 256
+                frame[:, :, 2] = (x[::-1] + y + scene * 30) % 256
+
+                box = max(width // 8, 8)
+                left = (shift * 3) % max(width - box, 1)
+                top = (shift * 2) % max(height - box, 1)
+                cv2.rectangle(frame, (left, top), (left + box, top + box), (255, 255, 255), -1)
+
+                cv2.putText(frame, "{:05d}".format(index), (10, max(height // 8, 20)), cv2.FONT_HERSHEY_SIMPLEX,
+                            max(height / 360, 0.4), (0, 0, 0), 2)
+
+                writer.write(frame)
+        finally:
+            writer.release()
+
+        return path
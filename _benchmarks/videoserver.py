@@ -0,0 +1,200 @@
+import math
+import mimetypes
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class VideoServer:
+    """
+    Local HTTP server that replaces the video sites in the benchmarks. It serves a video file:
+
+    - /video<ext>: the whole file (HEAD and 'Range' requests supported, like a CDN)
+    - /hls/index.m3u8: the same file split in HLS segments (/hls/seg<i>.ts)
+    - /hls/player.html: a page with a JWPlayer setup, so Youtube-DL extracts the HLS formats with its native
+      downloader (fragments downloaded by the bot)
+
+    Every url accepts a query string (ex: ?job=3), so every job can request a different url. The server can add a
+    latency before every response and limit the speed of every connection, like a remote server.
+    """
+
+    def __init__(self, video_path: str, host="127.0.0.1", port=0, segment_size=256 * 1024, latency=0.0, rate=0):
+        """
+        Parametrized constructor method.
+
+        :param video_path: Served video.
+        :param host: (Optional, Default=127.0.0.1) Address where the server listens.
+        :param port: (Optional, Default=0) Port where the server listens (0 = random free port).
+        :param segment_size: (Optional, Default=256 KB) Size of the HLS segments.
+        :param latency: (Optional, Default=0) Seconds waited before every response.
+        :param rate: (Optional, Default=0) Max speed of every connection in bytes/s (0 = no limit).
+        """
+
+        self.video_path = video_path
+        self.SEGMENT_SIZE = segment_size
+        self.LATENCY = latency
+        self.RATE = rate
+
+        self.size = os.path.getsize(video_path)
+        self.extension = os.path.splitext(video_path)[1]
+        self.content_type = mimetypes.guess_type(video_path)[0] or "application/octet-stream"
+
+        with open(video_path, "rb") as file:
+            self.data = file.read()
+
+        # Served bytes and requests
+        self.bytes_sent = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def get_video_url(self, query="") -> str:
+        return "{}/video{}{}".format(self.base_url, self.extension, "?" + query if query else "")
+
+    def get_hls_url(self, query="") -> str:
+        return "{}/hls/player.html{}".format(self.base_url, "?" + query if query else "")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="VideoServer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, sent: int):
+        with self._lock:
+            self.bytes_sent += sent
+
+    def _get_playlist(self, query: str) -> str:
+        segments = int(math.ceil(self.size / float(self.SEGMENT_SIZE)))
+
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for index in range(segments):
+            lines.append("#EXTINF:2.0,")
+            lines.append("seg{}.ts{}".format(index, "?" + query if query else ""))
+        lines.append("#EXT-X-ENDLIST")
+
+        return "\n".join(lines) + "\n"
+
+    def _get_player(self, query: str) -> str:
+        playlist = "/hls/index.m3u8" + ("?" + query if query else "")
+
+        return (
+            "<html><head><title>Synthetic video</title></head><body>"
+            "<div id=\"player\"></div>"
+            "<script>jwplayer(\"player\").setup({{\"file\": \"{}\", \"title\": \"Synthetic video\"}});</script>"
+            "</body></html>"
+        ).format(playlist)
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self):
+                self._handle(head=True)
+
+            def do_GET(self):
+                self._handle(head=False)
+
+            def _handle(self, head):
+                with server._lock:
+                    server.requests += 1
+
+                if server.LATENCY:
+                    time.sleep(server.LATENCY)
+
+                path, _, query = self.path.partition("?")
+
+                if path == "/video" + server.extension:
+                    self._send_range(server.data, server.content_type, head)
+
+                elif path == "/hls/index.m3u8":
+                    self._send_body(server._get_playlist(query).encode(), "application/vnd.apple.mpegurl", head)
+
+                elif path == "/hls/player.html":
+                    self._send_body(server._get_player(query).encode(), "text/html; charset=utf-8", head)
+
+                elif re.match(r"^/hls/seg\d+\.ts$", path):
+                    index = int(re.findall(r"\d+", path)[0])
+                    start = index * server.SEGMENT_SIZE
+
+                    if start >= server.size:
+                        self.send_error(404)
+                        return
+
+                    self._send_body(server.data[start:start + server.SEGMENT_SIZE], "video/mp2t", head)
+
+                else:
+                    self.send_error(404)
+
+            def _send_range(self, data, content_type, head):
+                match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+
+                if match is None:
+                    self._send_body(data, content_type, head, accept_ranges=True)
+                    return
+
+                start = int(match.group(1)) if match.group(1) else max(len(data) - int(match.group(2)), 0)
+                end = int(match.group(2)) if match.group(1) and match.group(2) else len(data) - 1
+                end = min(end, len(data) - 1)
+
+                if start > end:
+                    self.send_response(416)
+                    self.send_header("Content-Range", "bytes */{}".format(len(data)))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                self.send_response(206)
+                self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end, len(data)))
+                self._send_data(data[start:end + 1], content_type, head, accept_ranges=True)
+
+            def _send_body(self, data, content_type, head, accept_ranges=False):
+                self.send_response(200)
+                self._send_data(data, content_type, head, accept_ranges)
+
+            def _send_data(self, data, content_type, head, accept_ranges=False):
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                if accept_ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+
+                if head:
+                    return
+
+                block = 64 * 1024
+                started = time.monotonic()
+
+                try:
+                    for offset in range(0, len(data), block):
+                        self.wfile.write(data[offset:offset + block])
+                        server._count(min(block, len(data) - offset))
+
+                        if server.RATE:
+                            # Wait until the connection is back under its speed limit
+                            delay = (offset + block) / float(server.RATE) - (time.monotonic() - started)
+                            if delay > 0:
+                                time.sleep(delay)
+
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,43 @@
+import collections
+import collections.abc
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# The tests import the bot modules as 'classes.<module>', like main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# python-telegram-bot 12 imports the abstract base classes from 'collections', they're only in
+# 'collections.abc' since Python 3.10
+for name in ("Callable", "Iterable", "Mapping", "MutableMapping", "Sequence"):
+    if not hasattr(collections, name):
+        setattr(collections, name, getattr(collections.abc, name))
+
+# Manual scripts (they need real accounts or a running bot), not tests
+collect_ignore = ["test_upload_large_file.py", "post_updates.py"]
+
+
+@pytest.fixture
+def http_server():
+    """
+    Starts local HTTP servers for the tests: http_server(handler_class) returns the base url of a new server.
+    """
+
+    servers = []
+
+    def start(handler_class):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+
+        return "http://127.0.0.1:{}".format(server.server_port)
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
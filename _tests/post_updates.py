@@ -0,0 +1,19 @@
+import json
+import sys
+import urllib.request
+
+
+def main():
+    # Sends recorded updates (a JSON update or a list of updates) to a bot in webhook mode
+    url, path = sys.argv[1], sys.argv[2]
+
+    with open(path, "rb") as file:
+        body = file.read()
+
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        print(json.loads(response.read().decode("utf-8")))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler
+from types import SimpleNamespace
+
+import pytest
+
+from classes.chunkeduploader import ChunkedUploader
+
+CHUNK_SIZE = 4096
+FILE_SIZE = 10 * 1024
+
+
+class UploadRefused(Exception):
+    pass
+
+
+class FakeUploader:
+    """
+    Uploader wrapper stand-in: every upload link is a new url of the test server.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.links = 0
+
+    def upload_link(self, **kwargs):
+        self.links += 1
+        return {"url": "{}/upload/{}".format(self.base_url, self.links)}
+
+    @staticmethod
+    def _check_status(response_json):
+        if response_json["status"] != 200:
+            raise UploadRefused(response_json["msg"])
+
+
+@pytest.fixture
+def server(http_server):
+    """
+    Upload server of the host: it saves the received requests. 'errors' maps a chunk offset ('whole' for a single
+    request upload) to the HTTP status codes returned before the request is accepted.
+    """
+
+    state = SimpleNamespace(requests=[], errors={}, lock=threading.Lock())
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            content_range = self.headers.get("Content-Range", "")
+            chunk = re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range)
+            commit = re.match(r"bytes \*/(\d+)", content_range)
+
+            with state.lock:
+                state.requests.append(SimpleNamespace(
+                    link=self.path, upload_id=self.headers.get("X-Upload-Id"), range=content_range, size=len(body)
+                ))
+
+                key = int(chunk.group(1)) if chunk is not None else "whole" if commit is None else None
+                errors = state.errors.get(key)
+                error = errors.pop(0) if errors else None
+
+            if error is not None:
+                self._send_json(error, {"status": error, "msg": "error", "result": None})
+            elif chunk is not None:
+                self._send_json(202, {"status": 200, "msg": "chunk received", "result": None})
+            elif commit is not None:
+                self._send_json(200, {"status": 200, "msg": "OK", "result": {"id": "f1", "size": commit.group(1)}})
+            else:
+                self._send_json(200, {"status": 200, "msg": "OK", "result": {"id": "f1", "size": str(len(body))}})
+
+        def _send_json(self, http_status, response):
+            body = json.dumps(response).encode()
+
+            self.send_response(http_status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    state.url = http_server(Handler)
+    return state
+
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    monkeypatch.setattr("classes.chunkeduploader.time", SimpleNamespace(sleep=lambda seconds: None))
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(os.urandom(FILE_SIZE))
+    return str(path)
+
+
+def create_uploader(server, **kwargs):
+    kwargs.setdefault("chunk_size", CHUNK_SIZE)
+    kwargs.setdefault("chunked", True)
+    return ChunkedUploader(FakeUploader(server.url), **kwargs)
+
+
+def chunk_ranges(server):
+    return sorted(request.range for request in server.requests if "*" not in request.range)
+
+
+def test_chunked_upload(server, video):
+    progress = []
+
+    result = create_uploader(server).upload_file(video, parallelism=2, progress=lambda *args: progress.append(args))
+
+    assert result == {"id": "f1", "size": str(FILE_SIZE)}
+    assert chunk_ranges(server) == ["bytes 0-4095/10240", "bytes 4096-8191/10240", "bytes 8192-10239/10240"]
+    assert server.requests[-1].range == "bytes */10240"
+    assert len({request.upload_id for request in server.requests}) == 1
+
+    assert max(progress) == (FILE_SIZE, FILE_SIZE)
+    assert not os.path.exists(video + ChunkedUploader.CHECKPOINT_EXTENSION)
+
+
+def test_resume_sends_only_the_missing_chunks(server, video):
+    server.errors[4096] = [400]
+
+    with pytest.raises(UploadRefused):
+        create_uploader(server, retries=1).upload_file(video, parallelism=1)
+
+    with open(video + ChunkedUploader.CHECKPOINT_EXTENSION) as f:
+        checkpoint = json.load(f)
+    assert sorted(checkpoint["done"]) == [0, 2]
+
+    server.requests.clear()
+    uploader = create_uploader(server)
+    uploader.upload_file(video)
+
+    # Same upload id, but a new upload link
+    assert [request.range for request in server.requests] == ["bytes 4096-8191/10240", "bytes */10240"]
+    assert {request.upload_id for request in server.requests} == {checkpoint["upload_id"]}
+    assert uploader.uploader.links == 1 and server.requests[0].link == "/upload/1"
+
+
+def test_failed_chunk_is_retried(server, video):
+    server.errors[0] = [500, 503]
+
+    create_uploader(server, retries=3).upload_file(video)
+
+    assert chunk_ranges(server).count("bytes 0-4095/10240") == 3
+
+
+def test_resume_disabled(server, video):
+    server.errors[4096] = [400]
+
+    with pytest.raises(UploadRefused):
+        create_uploader(server, retries=1).upload_file(video, parallelism=1)
+
+    server.requests.clear()
+    create_uploader(server).upload_file(video, resume=False)
+
+    assert len(chunk_ranges(server)) == 3
+
+
+def test_changed_file_starts_a_new_upload(server, video):
+    server.errors[4096] = [400]
+
+    with pytest.raises(UploadRefused):
+        create_uploader(server, retries=1).upload_file(video, parallelism=1)
+
+    old_id = server.requests[0].upload_id
+    os.utime(video, (0, 0))
+
+    server.requests.clear()
+    create_uploader(server).upload_file(video)
+
+    assert len(chunk_ranges(server)) == 3
+    assert old_id not in {request.upload_id for request in server.requests}
+
+
+def test_checkpoint_with_another_chunk_size_is_ignored(server, video):
+    server.errors[4096] = [400]
+
+    with pytest.raises(UploadRefused):
+        create_uploader(server, retries=1).upload_file(video, parallelism=1)
+
+    server.requests.clear()
+    create_uploader(server, chunk_size=8192).upload_file(video)
+
+    assert chunk_ranges(server) == ["bytes 0-8191/10240", "bytes 8192-10239/10240"]
+
+
+def test_whole_file_upload_retry(server, video):
+    server.errors["whole"] = [500]
+    progress = []
+    throttled = []
+
+    result = create_uploader(server, chunked=False, retries=2).upload_file(
+        video, progress=lambda *args: progress.append(args), throttle=throttled.append
+    )
+
+    assert result == {"id": "f1", "size": str(server.requests[-1].size)}
+    assert [request.range for request in server.requests] == ["", ""]
+    assert not os.path.exists(video + ChunkedUploader.CHECKPOINT_EXTENSION)
+
+    # Every attempt starts from zero and never goes over the file size
+    assert progress.count((0, FILE_SIZE)) == 2
+    assert all(sent <= total == FILE_SIZE for sent, total in progress)
+    assert progress[-1] == (FILE_SIZE, FILE_SIZE)
+
+    # The bytes sent again by the retry are not throttled twice
+    assert sum(throttled) == server.requests[-1].size
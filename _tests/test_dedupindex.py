@@ -0,0 +1,137 @@
+import hashlib
+import os
+
+import pytest
+
+from classes.dedupindex import DedupIndex
+from classes.filehasher import FileHasher
+
+RESPONSE = {"id": "f1", "name": "video.mp4", "url": "https://host/f/f1"}
+THUMBNAIL = {"data": "https://host/splash/f1.jpg", "local": False}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DedupIndex(str(tmp_path / "dedup.json"))
+
+
+def test_find_by_url_video_id_and_hash(index):
+    index.add("VeryStream", RESPONSE, THUMBNAIL, url="http://example.com/video", video_id="generic:1", sha1="abc")
+
+    for lookup in ({"url": "http://example.com/video"}, {"video_id": "generic:1"}, {"sha1": "abc"}):
+        entry = index.find("VeryStream", **lookup)
+        assert entry["response"] == RESPONSE
+        assert entry["thumbnail"] == THUMBNAIL
+
+    assert index.find("VeryStream", url="http://example.com/other") is None
+
+
+def test_other_uploader_is_not_found(index):
+    index.add("VeryStream", RESPONSE, url="http://example.com/video")
+
+    assert index.find("OpenLoad", url="http://example.com/video") is None
+
+
+def test_same_content_from_another_url(index):
+    index.add("VeryStream", RESPONSE, url="http://example.com/a", sha1="abc")
+    index.add("VeryStream", {"id": "f2"}, THUMBNAIL, url="http://mirror.com/a", sha1="abc")
+
+    # The first upload is kept, the new url and the thumbnail are added to it
+    entry = index.find("VeryStream", url="http://mirror.com/a")
+    assert entry["response"] == RESPONSE
+    assert entry["urls"] == ["http://example.com/a", "http://mirror.com/a"]
+    assert entry["thumbnail"] == THUMBNAIL
+
+
+def test_index_survives_restart(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    DedupIndex(path).add("VeryStream", RESPONSE, url="http://example.com/video", sha1="abc")
+
+    assert DedupIndex(path).find("VeryStream", sha1="abc")["response"] == RESPONSE
+
+
+def test_corrupted_index_starts_empty(tmp_path):
+    path = tmp_path / "dedup.json"
+    path.write_text("{not json")
+
+    assert DedupIndex(str(path)).find("VeryStream", sha1="abc") is None
+
+
+def test_remove(index):
+    index.add("VeryStream", RESPONSE, url="http://example.com/video", video_id="generic:1", sha1="abc")
+
+    index.remove(index.find("VeryStream", sha1="abc"))
+
+    assert index.find("VeryStream", url="http://example.com/video") is None
+    assert index.find("VeryStream", video_id="generic:1") is None
+
+
+def append(path, data):
+    with open(path, "ab") as file:
+        file.write(data)
+
+
+def test_hash_while_the_file_is_written(tmp_path):
+    path = str(tmp_path / "video.mp4.part")
+    hasher = FileHasher()
+    data = b""
+
+    for i in range(5):
+        block = os.urandom(1000 + i)
+        append(path, block)
+        data += block
+        hasher.update(path)
+
+    assert hasher.offset == len(data)
+    assert hasher.finish(path) == hashlib.sha1(data).hexdigest()
+
+
+def test_min_bytes(tmp_path):
+    path = str(tmp_path / "video.mp4")
+    hasher = FileHasher(path)
+
+    append(path, b"x" * 100)
+    hasher.update(min_bytes=1000)
+    assert hasher.offset == 0
+
+    append(path, b"x" * 1000)
+    hasher.update(min_bytes=1000)
+    assert hasher.offset == 1100
+
+
+def test_renamed_file_continues_the_hash(tmp_path):
+    part_path, path = str(tmp_path / "video.mp4.part"), str(tmp_path / "video.mp4")
+    hasher = FileHasher()
+
+    append(part_path, b"first")
+    hasher.update(part_path)
+
+    append(part_path, b"second")
+    os.rename(part_path, path)
+
+    assert hasher.finish(path) == hashlib.sha1(b"firstsecond").hexdigest()
+
+
+def test_truncated_file_is_hashed_again(tmp_path):
+    path = str(tmp_path / "video.mp4")
+    hasher = FileHasher(path)
+
+    append(path, b"old content")
+    hasher.update()
+
+    # Download restarted from the beginning
+    with open(path, "wb") as file:
+        file.write(b"new")
+
+    assert hasher.finish() == hashlib.sha1(b"new").hexdigest()
+
+
+def test_another_file_starts_a_new_hash(tmp_path):
+    first, second = str(tmp_path / "video.f1.mp4"), str(tmp_path / "video.f2.m4a")
+    hasher = FileHasher()
+
+    append(first, b"video")
+    hasher.update(first)
+
+    append(second, b"audio")
+    assert hasher.finish(second) == FileHasher.hash_file(second) == hashlib.sha1(b"audio").hexdigest()
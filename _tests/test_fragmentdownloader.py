@@ -0,0 +1,165 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from types import SimpleNamespace
+
+import pytest
+from youtube_dl import YoutubeDL
+from youtube_dl.utils import DownloadError
+
+from classes.fragmentdownloader import FragmentDownloader
+from classes.span import Span
+
+FRAGMENTS = 8
+
+
+def fragment(index):
+    return bytes([index]) * 1000
+
+
+@pytest.fixture
+def server(http_server):
+    """
+    HLS server: 'delays' maps a fragment index to the seconds waited before its response, 'missing' are the
+    fragments not found (404). 'requested' is the list of the requested fragments.
+    """
+
+    state = SimpleNamespace(delays={}, missing=set(), requested=[], requested_before_first=None,
+                            lock=threading.Lock())
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == "/index.m3u8":
+                lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0"]
+                for index in range(FRAGMENTS):
+                    lines += ["#EXTINF:2.0,", "seg{}.ts".format(index)]
+                lines.append("#EXT-X-ENDLIST")
+
+                self._send(200, "\n".join(lines).encode())
+                return
+
+            index = int(re.match(r"^/seg(\d+)\.ts$", self.path).group(1))
+
+            with state.lock:
+                state.requested.append(index)
+
+            time.sleep(state.delays.get(index, 0))
+
+            if index == 0:
+                with state.lock:
+                    state.requested_before_first = set(state.requested)
+
+            if index in state.missing:
+                self._send(404, b"not found")
+            else:
+                self._send(200, fragment(index))
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    state.url = http_server(Handler) + "/index.m3u8"
+    return state
+
+
+class RecordingFragmentDownloader(FragmentDownloader):
+    """
+    FragmentDownloader that keeps the download context, so the tests can check the destination file.
+    """
+
+    def _prepare_and_start_frag_download(self, ctx):
+        super()._prepare_and_start_frag_download(ctx)
+        self.ctx = ctx
+
+
+def download(server, tmp_path, workers=2, **params):
+    """
+    Downloads the HLS video of the server. The result has the downloaded file, the trace spans and the downloader
+    ('error' is the exception raised by the download, if any).
+    """
+
+    result = SimpleNamespace(path=tmp_path / "video.ts", spans=[], success=False, error=None)
+
+    def start_span(name, **attributes):
+        result.spans.append(Span(None, "job", name, **attributes))
+        return result.spans[-1]
+
+    params = dict({
+        "quiet": True,
+        "noprogress": True,
+        "concurrent_fragment_downloads": workers,
+        "fragment_retries": 0,
+        "trace_span": start_span
+    }, **params)
+
+    result.downloader = RecordingFragmentDownloader(YoutubeDL(params), params)
+    info_dict = {"url": server.url, "protocol": "m3u8_native", "http_headers": {}}
+
+    try:
+        result.success = result.downloader.download(str(result.path), info_dict)
+    except Exception as ex:
+        result.error = ex
+
+    return result
+
+
+def test_fragments_written_in_order(server, tmp_path):
+    # The first fragment is the slowest: the others wait in the reorder buffer
+    server.delays[0] = 0.3
+
+    result = download(server, tmp_path)
+
+    assert result.success and result.error is None
+    assert result.path.read_bytes() == b"".join(fragment(i) for i in range(FRAGMENTS))
+
+    # With 2 threads at most 4 fragments (reorder window) are downloaded before the first one is written
+    assert server.requested_before_first == {0, 1, 2, 3}
+
+
+def test_spans_of_the_batches(server, tmp_path):
+    result = download(server, tmp_path)
+
+    assert [(span.attributes["first"], span.attributes["last"], span.bytes) for span in result.spans] == [
+        (0, 3, 4000), (4, 7, 4000)
+    ]
+    assert {span.outcome for span in result.spans} == {Span.OK}
+
+
+def test_unavailable_fragment_is_skipped(server, tmp_path):
+    server.missing.add(2)
+
+    result = download(server, tmp_path, fragment_retries=1)
+
+    assert result.success
+    assert result.path.read_bytes() == b"".join(fragment(i) for i in range(FRAGMENTS) if i != 2)
+    assert server.requested.count(2) == 2
+
+
+def test_unavailable_fragment_fails_the_download(server, tmp_path):
+    server.missing.add(2)
+
+    result = download(server, tmp_path, skip_unavailable_fragments=False)
+
+    # Youtube-DL raises the error reported by the downloader
+    assert isinstance(result.error, DownloadError)
+    assert result.downloader.ctx["dest_stream"].closed
+    assert result.spans[-1].outcome == Span.ERROR
+
+
+def test_connection_error_closes_the_file(server, tmp_path):
+    # A socket timeout is not an HTTP error, it's not retried and it stops the download
+    server.delays[3] = 2
+
+    result = download(server, tmp_path, socket_timeout=0.5)
+
+    assert result.error is not None
+    assert result.downloader.ctx["dest_stream"].closed
+    assert result.spans[-1].outcome == Span.ERROR
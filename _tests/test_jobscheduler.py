@@ -0,0 +1,172 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# The jobs send their messages with python-telegram-bot (it's skipped if the installed version can't be imported)
+pytest.importorskip("telegram", exc_type=ImportError)
+
+from classes.downloadjob import DownloadJob
+from classes.jobscheduler import JobScheduler
+from classes.notifier import Notifier
+from classes.notifiergroup import NotifierGroup
+
+BOT = SimpleNamespace(send_message=lambda *args, **kwargs: None)
+
+
+class FakeManager:
+    """
+    DownloadManager stand-in: the download waits until 'release' is set (or the job is killed).
+    """
+
+    def __init__(self, url, chat_id, shared=True):
+        notifier = Notifier.from_chat_id(chat_id, BOT)
+
+        self.notifier = NotifierGroup(notifier) if shared else notifier
+        self.download_req = SimpleNamespace(url=url)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.statuses = []
+
+    def download_file(self, **kwargs):
+        self.started.set()
+
+        # Short sleeps, so the thread can be killed
+        while not self.release.is_set():
+            time.sleep(0.01)
+
+        return True
+
+    def add_subscriber(self, notifier):
+        self.notifier.add(notifier)
+
+    def remove_subscriber(self, user_id):
+        return self.notifier.remove(user_id)
+
+    def set_job_status(self, status):
+        self.statuses.append(status)
+
+    def start_span(self, name, **attributes):
+        return SimpleNamespace(finish=lambda *args: None, set=lambda **kwargs: None)
+
+
+def create_job(url, chat_id, shared=True, **download_kwargs):
+    return DownloadJob(FakeManager(url, chat_id, shared=shared), download_kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_same_video_is_coalesced():
+    scheduler = JobScheduler(workers=1)
+    leader = create_job("http://example.com/video", 1)
+    follower = create_job("http://example.com/video", 2)
+
+    scheduler.submit(leader)
+    scheduler.submit(follower)
+
+    assert follower.leader is leader
+    assert leader.get_user_ids() == [1, 2]
+    assert [job for _, _, job in scheduler._queue] == [leader]
+    assert scheduler.get_user_jobs(2) == [leader]
+
+
+def test_different_options_are_not_coalesced():
+    scheduler = JobScheduler(workers=1)
+    mp4 = create_job("http://example.com/video", 1, convert_to_mp4=True)
+    original = create_job("http://example.com/video", 2, convert_to_mp4=False)
+
+    scheduler.submit(mp4)
+    scheduler.submit(original)
+
+    assert original.leader is None
+    assert len(scheduler._queue) == 2
+
+
+def test_coalescing_disabled():
+    scheduler = JobScheduler(workers=1, coalesce=False)
+    first = create_job("http://example.com/video", 1)
+    second = create_job("http://example.com/video", 2)
+
+    scheduler.submit(first)
+    scheduler.submit(second)
+
+    assert second.leader is None
+    assert len(scheduler._queue) == 2
+
+
+def test_job_ended_is_not_a_leader():
+    scheduler = JobScheduler(workers=1)
+    scheduler.start()
+
+    first = create_job("http://example.com/video", 1)
+    scheduler.submit(first)
+    first.manager.release.set()
+    wait_for(lambda: first.status == DownloadJob.FINISHED)
+
+    second = create_job("http://example.com/video", 2)
+    scheduler.submit(second)
+
+    assert second.leader is None
+    second.manager.release.set()
+    wait_for(lambda: second.status == DownloadJob.FINISHED)
+
+
+def test_queue_position():
+    scheduler = JobScheduler(workers=1)
+    jobs = [create_job("http://example.com/{}".format(i), 1) for i in range(3)]
+
+    # No job is running: the first one is taken by the free worker
+    assert [scheduler.submit(job) for job in jobs] == [0, 1, 2]
+
+
+def test_cancel_queued_jobs():
+    scheduler = JobScheduler(workers=1)
+    mine = create_job("http://example.com/a", 1)
+    other = create_job("http://example.com/b", 2)
+
+    scheduler.submit(mine)
+    scheduler.submit(other)
+
+    assert scheduler.cancel_user_jobs(1) == [mine]
+    assert mine.status == DownloadJob.CANCELLED
+    assert [job for _, _, job in scheduler._queue] == [other]
+
+    # A cancelled job doesn't receive other users
+    again = create_job("http://example.com/a", 3)
+    scheduler.submit(again)
+    assert again.leader is None
+
+
+def test_cancel_shared_job_detaches_the_user():
+    scheduler = JobScheduler(workers=1)
+    leader = create_job("http://example.com/video", 1)
+    follower = create_job("http://example.com/video", 2)
+
+    scheduler.submit(leader)
+    scheduler.submit(follower)
+
+    assert scheduler.cancel_user_jobs(2) == []
+    assert leader.status == DownloadJob.QUEUED
+    assert leader.get_user_ids() == [1]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_cancel_running_job():
+    scheduler = JobScheduler(workers=1)
+    scheduler.start()
+
+    job = create_job("http://example.com/video", 1)
+    scheduler.submit(job)
+    assert job.manager.started.wait(5)
+
+    assert scheduler.cancel_user_jobs(1) == [job]
+    wait_for(lambda: not scheduler._running)
+
+    assert job.status == DownloadJob.CANCELLED
+    assert job.manager.statuses == ["cancelled"]
@@ -0,0 +1,92 @@
+import pytest
+
+from classes.jobstore import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+KWARGS = {"save_path": "download", "automatic_filename": True, "new_download_method": True}
+
+
+def test_new_job_is_active(store):
+    job_id = store.add(1, "http://example.com/video", "video", KWARGS)
+
+    [job] = store.get_active()
+    assert job["id"] == job_id
+    assert job["stage"] == JobStore.DOWNLOAD
+    assert job["status"] == JobStore.ACTIVE
+    assert job["download_kwargs"] == KWARGS
+    assert job["response"] is None
+
+
+def test_resume_stages(store):
+    upload = store.add(1, "http://example.com/a", None, KWARGS)
+    store.update(upload, stage=JobStore.UPLOAD, output_path="download/a", file_path="download/a.mp4")
+
+    thumbnail = store.add(2, "http://example.com/b", None, KWARGS)
+    response = {"id": "f1", "name": "b.mp4", "url": "https://host/f/f1"}
+    store.update(thumbnail, stage=JobStore.THUMBNAIL, file_path="download/b.mp4", response=response,
+                 subscribers=[2, 3])
+
+    jobs = {job["id"]: job for job in store.get_active()}
+
+    assert jobs[upload]["stage"] == JobStore.UPLOAD
+    assert jobs[upload]["file_path"] == "download/a.mp4"
+    assert jobs[thumbnail]["stage"] == JobStore.THUMBNAIL
+    assert jobs[thumbnail]["response"] == response
+    assert jobs[thumbnail]["subscribers"] == [2, 3]
+
+
+@pytest.mark.parametrize("status", [JobStore.FINISHED, JobStore.FAILED, JobStore.CANCELLED])
+def test_ended_jobs_are_not_resumed(store, status):
+    ended = store.add(1, "http://example.com/a", None, KWARGS)
+    active = store.add(1, "http://example.com/b", None, KWARGS)
+
+    store.update(ended, stage=JobStore.DONE, status=status)
+
+    assert [job["id"] for job in store.get_active()] == [active]
+
+
+def test_done_job_without_status_is_active(store):
+    # Crash after the result has been sent, before the final status: the job is marked finished on resume
+    job_id = store.add(1, "http://example.com/a", None, KWARGS)
+    store.update(job_id, stage=JobStore.DONE)
+
+    [job] = store.get_active()
+    assert job["stage"] == JobStore.DONE
+
+
+def test_state_survives_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    store = JobStore(path)
+    job_id = store.add(1, "http://example.com/a", None, KWARGS)
+    store.update(job_id, stage=JobStore.UPLOAD, file_path="download/a.mp4")
+    store.save_thumbnail(1, "https://host/thumb.jpg", local=False)
+    store.close()
+
+    store = JobStore(path)
+    [job] = store.get_active()
+    assert (job["id"], job["stage"]) == (job_id, JobStore.UPLOAD)
+    assert store.get_thumbnails() == {1: ("https://host/thumb.jpg", False)}
+    store.close()
+
+
+def test_unknown_columns_are_ignored(store):
+    job_id = store.add(1, "http://example.com/a", None, KWARGS)
+    store.update(job_id, url="http://example.com/other", chat_id=5)
+
+    [job] = store.get_active()
+    assert (job["url"], job["chat_id"]) == ("http://example.com/a", 1)
+
+
+def test_remove(store):
+    job_id = store.add(1, "http://example.com/a", None, KWARGS)
+    store.remove(job_id)
+
+    assert store.get_active() == []
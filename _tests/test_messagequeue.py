@@ -0,0 +1,181 @@
+from types import SimpleNamespace
+
+import pytest
+
+# The queue handles the errors of python-telegram-bot
+pytest.importorskip("telegram", exc_type=ImportError)
+
+from telegram.error import RetryAfter, TimedOut
+
+from classes.messagequeue import MessageQueue
+
+
+class FakeBot:
+    """
+    Telegram bot stand-in: it saves the sent messages, 'errors' are raised (once each) by the next calls.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.edited = []
+        self.errors = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(chat_id=chat_id, message_id=len(self.sent))
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self.edited.append((chat_id, message_id, text))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake time.monotonic of the queue and of its token buckets, moved forward by the tests.
+    """
+
+    clock = SimpleNamespace(now=1000.0)
+    fake_time = SimpleNamespace(monotonic=lambda: clock.now, sleep=None)
+
+    monkeypatch.setattr("classes.messagequeue.time", fake_time)
+    monkeypatch.setattr("classes.tokenbucket.time", fake_time)
+    return clock
+
+
+@pytest.fixture
+def queue(clock):
+    return MessageQueue(FakeBot(), chat_rate=1, chat_burst=3, global_rate=25)
+
+
+def send_next(queue):
+    """
+    Sends the next message like the sender thread.
+
+    :return: Seconds to wait if there isn't a message that can be sent now, otherwise None.
+    """
+
+    chat_id, message = queue._next_message()
+    if chat_id is None:
+        return message
+
+    queue._deliver(chat_id, message)
+
+
+def test_small_messages_are_merged(queue):
+    for text in ("Downloading...", "Download finished", "Uploading..."):
+        queue.send(1, text)
+
+    send_next(queue)
+
+    assert queue.bot.sent == [(1, "Downloading...\nDownload finished\nUploading...")]
+
+
+@pytest.mark.parametrize("second", [
+    {"text": "with callback", "callback": lambda message: None},
+    {"text": "<b>html</b>", "parse_mode": "HTML"},
+    {"text": "silent", "silent": True},
+    {"text": "x" * (MessageQueue.MERGE_MAX_LENGTH + 1)},
+])
+def test_messages_not_merged(queue, second):
+    queue.send(1, "first")
+    queue.send(1, **second)
+
+    send_next(queue)
+    send_next(queue)
+
+    assert queue.bot.sent == [(1, "first"), (1, second["text"])]
+
+
+def test_merged_message_fits_in_a_telegram_message(queue):
+    text = "x" * MessageQueue.MERGE_MAX_LENGTH
+    for _ in range(5):
+        queue.send(1, text)
+
+    send_next(queue)
+
+    assert len(queue.bot.sent[0][1]) <= MessageQueue.MAX_MESSAGE_LENGTH
+    assert queue.bot.sent[0][1].count(text) == 4
+
+
+def test_callback_receives_the_sent_message(queue):
+    received = []
+    queue.send(1, "hello", callback=received.append)
+
+    send_next(queue)
+
+    assert received[0].chat_id == 1
+
+
+def test_chat_rate_limit(queue, clock):
+    for i in range(5):
+        queue.send(1, "message {}".format(i), callback=lambda message: None)
+    queue.send(2, "other chat")
+
+    # Burst of 3 messages in chat 1, chat 2 is served between them (round robin)
+    for _ in range(4):
+        send_next(queue)
+
+    assert queue.bot.sent == [(1, "message 0"), (2, "other chat"), (1, "message 1"), (1, "message 2")]
+    assert send_next(queue) == pytest.approx(1)
+
+    clock.now += 1
+    send_next(queue)
+    assert queue.bot.sent[-1] == (1, "message 3")
+
+
+def test_retry_after_pauses_the_chat(queue, clock):
+    queue.bot.errors.append(RetryAfter(5))
+    queue.send(1, "first", callback=lambda message: None)
+    queue.send(1, "second", callback=lambda message: None)
+
+    send_next(queue)
+    assert queue.bot.sent == []
+
+    # The message is sent again (first) when the pause ends, other chats are not paused
+    assert send_next(queue) == pytest.approx(5)
+
+    queue.send(2, "other chat")
+    send_next(queue)
+    assert queue.bot.sent == [(2, "other chat")]
+
+    clock.now += 5
+    send_next(queue)
+    send_next(queue)
+    assert queue.bot.sent[1:] == [(1, "first"), (1, "second")]
+
+
+def test_network_errors_are_retried(queue, clock):
+    queue.bot.errors += [TimedOut()] * MessageQueue.MAX_ATTEMPTS
+    queue.send(1, "lost")
+
+    for _ in range(MessageQueue.MAX_ATTEMPTS):
+        clock.now += 1
+        send_next(queue)
+
+    # Dropped after the last attempt
+    assert queue.bot.sent == []
+    assert queue._next_message() == (None, None)
+
+
+def test_network_error_then_sent(queue):
+    queue.bot.errors.append(TimedOut())
+    queue.send(1, "hello")
+
+    send_next(queue)
+    send_next(queue)
+
+    assert queue.bot.sent == [(1, "hello")]
+
+
+def test_pending_edit_is_replaced(queue):
+    queue.edit(1, 10, "Downloading 10%")
+    queue.edit(1, 10, "Downloading 20%")
+    queue.edit(1, 11, "Other message")
+
+    send_next(queue)
+    send_next(queue)
+
+    assert queue.bot.edited == [(1, 10, "Downloading 20%"), (1, 11, "Other message")]
@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from youtube_dl import YoutubeDL
+
+from classes.metadatacache import MetadataCache
+
+
+def video_info(video_id="1", extractor="Generic", formats=None):
+    return {
+        "_type": "video",
+        "id": video_id,
+        "title": "Video " + video_id,
+        "extractor_key": extractor,
+        "duration": 100,
+        "formats": formats if formats is not None else [
+            {"format_id": "360p", "url": "http://cdn.example.com/360.mp4", "ext": "mp4", "height": 360,
+             "filesize": 1000},
+            {"format_id": "720p", "url": "http://cdn.example.com/720.mp4", "ext": "mp4", "height": 720,
+             "filesize": 5000},
+        ]
+    }
+
+
+class FakeYoutubeDL:
+    """
+    YoutubeDL stand-in: it counts the extractions, 'release' can block them.
+    """
+
+    def __init__(self, info=None):
+        self.info = info or video_info()
+        self.extractions = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def extract_info(self, url, download=True, process=True):
+        assert not download and not process
+
+        self.extractions += 1
+        self.release.wait(5)
+        return self.info
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake clock of the memory cache and of the files saved on disk, moved forward by the tests.
+    """
+
+    clock = SimpleNamespace(now=1000.0)
+    fake_time = SimpleNamespace(monotonic=lambda: clock.now, time=lambda: clock.now)
+
+    monkeypatch.setattr("classes.ttlcache.time", fake_time)
+    monkeypatch.setattr("classes.metadatacache.time", fake_time)
+    return clock
+
+
+def test_url_is_extracted_once():
+    cache = MetadataCache()
+    ydl = FakeYoutubeDL()
+
+    first = cache.extract_info(ydl, "http://example.com/video")
+    second = cache.extract_info(ydl, "http://example.com/video")
+
+    assert ydl.extractions == 1
+    assert first == second == ydl.info
+
+
+def test_cached_metadata_is_a_copy():
+    cache = MetadataCache()
+    ydl = FakeYoutubeDL()
+
+    cache.extract_info(ydl, "http://example.com/video")["formats"].clear()
+
+    assert len(cache.get("http://example.com/video")["formats"]) == 2
+
+
+def test_concurrent_extractions_are_shared():
+    cache = MetadataCache()
+    ydl = FakeYoutubeDL()
+    ydl.release.clear()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.extract_info(ydl, "http://example.com/video")))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(0.1)
+    ydl.release.set()
+
+    for thread in threads:
+        thread.join(5)
+
+    assert ydl.extractions == 1
+    assert len(results) == 3
+
+
+def test_playlists_are_not_cached():
+    cache = MetadataCache()
+    ydl = FakeYoutubeDL({"_type": "playlist", "entries": []})
+
+    cache.extract_info(ydl, "http://example.com/playlist")
+    cache.extract_info(ydl, "http://example.com/playlist")
+
+    assert ydl.extractions == 2
+
+
+def test_extractor_ttl(clock):
+    cache = MetadataCache(ttl=600, extractor_ttl={"Generic": 60})
+    cache.set("http://example.com/direct", video_info("1", "Generic"))
+    cache.set("http://youtube.com/watch?v=2", video_info("2", "Youtube"))
+
+    clock.now += 61
+
+    assert cache.get("http://example.com/direct") is None
+    assert cache.get("http://youtube.com/watch?v=2")["id"] == "2"
+
+
+def test_disk_cache(tmp_path, clock):
+    cache_dir = str(tmp_path / "metadata")
+    MetadataCache(cache_dir=cache_dir).set("http://example.com/video", video_info())
+
+    # Another process (ex: after a restart) reads the metadata from the disk
+    assert MetadataCache(cache_dir=cache_dir).get("http://example.com/video")["id"] == "1"
+
+    clock.now += 601
+    assert MetadataCache(cache_dir=cache_dir).get("http://example.com/video") is None
+    assert os.listdir(cache_dir) == []
+
+
+def test_invalidate(tmp_path):
+    cache = MetadataCache(cache_dir=str(tmp_path))
+    cache.set("http://example.com/a", video_info("a", "Generic"))
+    cache.set("http://example.com/b", video_info("b", "Generic"))
+    cache.set("http://youtube.com/watch?v=c", video_info("c", "Youtube"))
+
+    assert cache.invalidate(url="http://example.com/a") == 1
+    assert cache.invalidate(extractor="Youtube") == 1
+
+    assert cache.get("http://example.com/a") is None
+    assert cache.get("http://youtube.com/watch?v=c") is None
+    assert cache.get("http://example.com/b")["id"] == "b"
+    assert len(os.listdir(str(tmp_path))) == 1
+
+
+@pytest.mark.parametrize("video_format, size", [
+    ("best", 5000),
+    ("worst", 1000),
+    ("360p", 1000),
+])
+def test_estimate_size(video_format, size):
+    ydl = YoutubeDL({"quiet": True, "format": video_format})
+
+    assert MetadataCache.estimate_size(ydl, video_info()) == size
+
+
+def test_estimate_size_from_bitrate():
+    ydl = YoutubeDL({"quiet": True})
+    info = video_info(formats=[{"format_id": "hls", "url": "http://cdn.example.com/index.m3u8", "ext": "mp4",
+                                "tbr": 800}])
+
+    # 800 KBit/s for 100 seconds
+    assert MetadataCache.estimate_size(ydl, info) == 10000000
+
+
+def test_estimate_size_unknown():
+    ydl = YoutubeDL({"quiet": True})
+
+    assert MetadataCache.estimate_size(ydl, video_info(formats=[
+        {"format_id": "mp4", "url": "http://cdn.example.com/video.mp4", "ext": "mp4"}
+    ])) is None
+    assert MetadataCache.estimate_size(ydl, {"_type": "url", "url": "http://example.com/other"}) is None
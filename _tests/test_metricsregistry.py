@@ -0,0 +1,119 @@
+import math
+import urllib.error
+import urllib.request
+
+import pytest
+
+from classes.metricsregistry import MetricsRegistry
+from classes.metricsserver import MetricsServer
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter(registry):
+    errors = registry.counter("errors_total", "Errors by type", labels=("type",))
+    errors.labels("TimeoutError").inc()
+    errors.labels("TimeoutError").inc()
+    errors.labels("OSError").inc(3)
+
+    assert registry.render() == "\n".join([
+        "# HELP errors_total Errors by type",
+        "# TYPE errors_total counter",
+        'errors_total{type="OSError"} 3',
+        'errors_total{type="TimeoutError"} 2',
+    ]) + "\n"
+
+
+def test_gauge_without_labels(registry):
+    queue = registry.gauge("queue_depth", "Queued jobs")
+    queue.set(5)
+    queue.inc()
+    queue.dec(2)
+
+    assert registry.render().splitlines()[-1] == "queue_depth 4"
+
+
+def test_gauge_function(registry):
+    running = registry.gauge("running_jobs", "Running jobs")
+    running.set_function(lambda: 7)
+    assert registry.render().splitlines()[-1] == "running_jobs 7"
+
+    running.set_function(lambda: 1 / 0)
+    assert registry.render().splitlines()[-1] == "running_jobs NaN"
+
+
+def test_histogram(registry):
+    durations = registry.histogram("stage_seconds", "Stage durations", labels=("stage",), buckets=(1, 5, 10))
+    for value in (0.5, 1, 3, 7, 20):
+        durations.labels("upload").observe(value)
+
+    assert registry.render().splitlines()[2:] == [
+        'stage_seconds_bucket{stage="upload",le="1"} 2',
+        'stage_seconds_bucket{stage="upload",le="5"} 3',
+        'stage_seconds_bucket{stage="upload",le="10"} 4',
+        'stage_seconds_bucket{stage="upload",le="+Inf"} 5',
+        'stage_seconds_sum{stage="upload"} 31.5',
+        'stage_seconds_count{stage="upload"} 5',
+    ]
+
+
+def test_histogram_without_labels(registry):
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1,))
+    latency.observe(0.05)
+
+    assert registry.render().splitlines()[2:4] == ['latency_seconds_bucket{le="0.1"} 1',
+                                                   'latency_seconds_bucket{le="+Inf"} 1']
+
+
+def test_label_values_are_escaped(registry):
+    errors = registry.counter("errors_total", "Errors\nby \\type", labels=("type",))
+    errors.labels('a "quoted"\\value\n').inc()
+
+    lines = registry.render().splitlines()
+    assert lines[0] == "# HELP errors_total Errors\\nby \\\\type"
+    assert lines[2] == 'errors_total{type="a \\"quoted\\"\\\\value\\n"} 1'
+
+
+def test_wrong_labels(registry):
+    errors = registry.counter("errors_total", "Errors", labels=("type",))
+
+    with pytest.raises(ValueError):
+        errors.labels("a", "b")
+
+    with pytest.raises(AttributeError):
+        errors.inc()
+
+
+def test_duplicated_metric(registry):
+    registry.counter("errors_total", "Errors")
+
+    with pytest.raises(ValueError):
+        registry.gauge("errors_total", "Errors")
+
+
+@pytest.mark.parametrize("value, text", [(3.0, "3"), (0.25, "0.25"), (math.inf, "+Inf"), (-math.inf, "-Inf"),
+                                         (math.nan, "NaN")])
+def test_format_value(value, text):
+    assert MetricsRegistry.format_value(value) == text
+
+
+def test_metrics_server(registry):
+    registry.counter("jobs_total", "Jobs").inc()
+    server = MetricsServer(registry, port=0)
+    server.start()
+
+    try:
+        url = "http://127.0.0.1:{}".format(server._server.server_port)
+
+        with urllib.request.urlopen(url + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"] == MetricsServer.CONTENT_TYPE
+            assert response.read().decode() == registry.render()
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/other", timeout=5)
+
+    finally:
+        server.stop()
@@ -0,0 +1,241 @@
+import cv2
+import numpy as np
+import pytest
+
+from classes.previewgenerator import PreviewGenerator
+
+WIDTH, HEIGHT, FPS, FRAMES = 160, 90, 10, 80
+
+
+def write_video(path, frame_value):
+    """
+    Writes a small MJPG video: frame_value(index) is the gray level of the frame number 'index'.
+
+    :return: Path of the video.
+    """
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, (WIDTH, HEIGHT))
+    assert writer.isOpened()
+
+    try:
+        for index in range(FRAMES):
+            writer.write(np.full((HEIGHT, WIDTH, 3), frame_value(index), dtype=np.uint8))
+    finally:
+        writer.release()
+
+    return str(path)
+
+
+def frame_number(frame):
+    # Inverse of the gray levels of the 'video' fixture
+    return int(round(frame.mean() / 3))
+
+
+@pytest.fixture
+def video(tmp_path):
+    """
+    Video whose frame number can be read from its gray level (frame number * 3).
+    """
+
+    return write_video(tmp_path / "video.avi", lambda index: index * 3)
+
+
+def read_frame(generator, video_path, position):
+    cap = cv2.VideoCapture(video_path)
+
+    try:
+        return generator._read_frame(cap, video_path, position, cap.get(cv2.CAP_PROP_FPS))
+    finally:
+        cap.release()
+
+
+@pytest.mark.parametrize("seek_mode", [PreviewGenerator.SEEK_FRAME, PreviewGenerator.SEEK_TIMESTAMP])
+def test_preview_grid(video, tmp_path, seek_mode):
+    generator = PreviewGenerator(seek_mode=seek_mode)
+    progress = []
+
+    result = generator.generate_preview(video, str(tmp_path / "previews"), lambda done, total: progress.append(done))
+
+    preview = cv2.imread(result["path"])
+    width = int(WIDTH * PreviewGenerator.SCALE_PERCENT / 100)
+    height = int(HEIGHT * PreviewGenerator.SCALE_PERCENT / 100)
+
+    assert preview.shape == (3 * height, 3 * width, 3)
+    assert progress == list(range(1, 10))
+    assert result["seconds"] >= 0
+
+
+def test_frame_seek_is_exact(video):
+    generator = PreviewGenerator(seek_mode=PreviewGenerator.SEEK_FRAME)
+
+    for position in (0, 37, 70):
+        assert frame_number(read_frame(generator, video, position)) == position
+
+
+def test_timestamp_seek(video):
+    generator = PreviewGenerator(seek_mode=PreviewGenerator.SEEK_TIMESTAMP)
+
+    # The timestamp seek can be a few frames off
+    for position in (0, 37, 70):
+        assert frame_number(read_frame(generator, video, position)) == pytest.approx(position, abs=2)
+
+
+def test_keyframe_seek_without_ffmpeg(monkeypatch):
+    monkeypatch.setattr("classes.previewgenerator.shutil.which", lambda name: None)
+
+    assert PreviewGenerator(seek_mode=PreviewGenerator.SEEK_KEYFRAME).seek_mode == PreviewGenerator.SEEK_TIMESTAMP
+
+
+def test_failed_keyframe_seek_uses_the_timestamp(video, monkeypatch):
+    monkeypatch.setattr("classes.previewgenerator.shutil.which", lambda name: "/usr/bin/" + name)
+    generator = PreviewGenerator(seek_mode=PreviewGenerator.SEEK_KEYFRAME)
+    requested = []
+
+    def get_keyframe(video_path, seconds):
+        requested.append(seconds)
+        return None
+
+    monkeypatch.setattr(generator, "_get_keyframe", get_keyframe)
+
+    assert generator.seek_mode == PreviewGenerator.SEEK_KEYFRAME
+    assert frame_number(read_frame(generator, video, 40)) == pytest.approx(40, abs=2)
+    assert requested == [pytest.approx(40 / FPS)]
+
+
+def test_keyframe_decoding_error(video, monkeypatch):
+    def run(command, **kwargs):
+        raise FileNotFoundError(command[0])
+
+    monkeypatch.setattr("classes.previewgenerator.subprocess.run", run)
+
+    assert PreviewGenerator._get_keyframe(video, 1.0) is None
+
+
+def test_parallel_extraction(video):
+    serial = PreviewGenerator()
+    parallel = PreviewGenerator(workers=2)
+    positions = [0, 10, 20, 30, 40, 50, 60, 70, 1000]
+
+    cap = cv2.VideoCapture(video)
+    expected = [serial._get_frame(cap, video, position, FPS) for position in positions]
+    cap.release()
+
+    try:
+        images = parallel._get_frames_parallel(video, positions, FPS, expected[0].shape)
+    finally:
+        parallel.shutdown()
+
+    # The frames after the end of the video can't be read
+    assert images[-1] is None
+    for image, frame in zip(images[:-1], expected[:-1]):
+        assert np.array_equal(image, frame)
+
+
+def test_parallel_extraction_without_shared_memory(video, monkeypatch):
+    monkeypatch.setattr("classes.previewgenerator.shared_memory", None)
+    generator = PreviewGenerator(workers=2)
+
+    try:
+        images = generator._get_frames_parallel(video, [5, 25, 45], FPS, (27, 48, 3))
+    finally:
+        generator.shutdown()
+
+    assert [frame_number(image) for image in images] == [5, 25, 45]
+
+
+def test_parallel_preview(video, tmp_path):
+    generator = PreviewGenerator(workers=2)
+    progress = []
+
+    try:
+        serial = cv2.imread(PreviewGenerator().generate_preview(video, str(tmp_path / "serial"))["path"])
+        result = generator.generate_preview(video, str(tmp_path / "parallel"),
+                                            lambda done, total: progress.append(done))
+    finally:
+        generator.shutdown()
+
+    assert np.array_equal(cv2.imread(result["path"]), serial)
+    assert progress == [9]
+    assert generator._pool is None
+
+
+@pytest.fixture
+def video_with_blank_frames(tmp_path):
+    """
+    Video with 40 black frames (ex: an intro), then 4 scenes of 10 frames with different horizontal gradients.
+    """
+
+    def frame_value(index):
+        if index < 40:
+            return 0
+
+        scene = (index - 40) // 10
+        return np.linspace(20 + scene * 30, 120 + scene * 30, WIDTH)[:, None]
+
+    return write_video(tmp_path / "blank.avi", frame_value)
+
+
+def select_scene_frames(generator, video_path):
+    cap = cv2.VideoCapture(video_path)
+
+    try:
+        return generator._select_scene_frames(cap, video_path, FRAMES, FPS, 9)
+    finally:
+        cap.release()
+
+
+def test_scene_selection_skips_blank_frames(video_with_blank_frames):
+    generator = PreviewGenerator(selection=PreviewGenerator.SELECTION_SCENE)
+
+    positions = select_scene_frames(generator, video_with_blank_frames)
+
+    assert len(positions) == 9
+    assert positions == sorted(positions)
+    assert all(position >= 40 for position in positions)
+
+    # Every scene is in the preview
+    assert {(position - 40) // 10 for position in positions} == {0, 1, 2, 3}
+
+
+def test_scene_selection_budget(video_with_blank_frames):
+    generator = PreviewGenerator(selection=PreviewGenerator.SELECTION_SCENE, selection_budget=-1)
+
+    # No candidates sampled: the frames are chosen uniformly
+    assert select_scene_frames(generator, video_with_blank_frames) == [i * int(FRAMES / 9) for i in range(9)]
+
+
+def test_scene_preview(video_with_blank_frames, tmp_path):
+    generator = PreviewGenerator(selection=PreviewGenerator.SELECTION_SCENE)
+
+    preview = cv2.imread(generator.generate_preview(video_with_blank_frames, str(tmp_path))["path"])
+
+    # None of the 9 frames of the grid is black
+    height, width = preview.shape[0] // 3, preview.shape[1] // 3
+    for row in range(3):
+        for column in range(3):
+            assert preview[row * height:(row + 1) * height, column * width:(column + 1) * width].mean() > 16
+
+
+def test_choose_distinct_discards_blank_samples():
+    pattern = np.tile(np.arange(0, 200, 4, dtype=np.uint8), 2)
+    samples = np.array([
+        np.zeros(100),          # black
+        np.full(100, 255),      # white
+        np.full(100, 128),      # flat
+        pattern,
+    ], dtype=np.uint8)
+
+    assert PreviewGenerator.choose_distinct(samples, 3) == [3]
+
+
+def test_choose_distinct_samples():
+    dark = np.tile(np.arange(20, 70, 1, dtype=np.uint8), 2)
+    bright = np.tile(np.arange(150, 200, 1, dtype=np.uint8), 2)
+    wide = np.tile(np.arange(20, 220, 4, dtype=np.uint8), 2)
+    samples = np.array([dark, dark, wide, dark, bright, bright], dtype=np.uint8)
+
+    chosen = PreviewGenerator.choose_distinct(samples, 3)
+
+    # One sample of every kind, starting from the most detailed one
+    assert chosen[0] == 2
+    assert sorted(samples[index].mean() for index in chosen) == sorted([dark.mean(), wide.mean(), bright.mean()])
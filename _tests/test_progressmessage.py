@@ -0,0 +1,153 @@
+from types import SimpleNamespace
+
+import pytest
+
+from classes.metrics import Metrics
+from classes.metricsregistry import MetricsRegistry
+from classes.progressmessage import ProgressMessage
+
+
+class FakeNotifier:
+    """
+    Notifier stand-in: the sent message is confirmed only when the test calls 'deliver' (like the MessageQueue).
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.edits = []
+        self._pending = []
+
+    def send_editable(self, text, callback):
+        self.sent.append(text)
+        self._pending.append(callback)
+
+    def edit_message(self, message_id, text):
+        self.edits.append((message_id, text))
+
+    def deliver(self):
+        for callback in self._pending:
+            callback(SimpleNamespace(message_id=42))
+        self._pending = []
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake time.monotonic of the ProgressMessage, moved forward by the tests.
+    """
+
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr("classes.progressmessage.time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def stage_duration(monkeypatch):
+    histogram = MetricsRegistry().histogram("stage_duration", "Stage duration", labels=("stage",))
+    monkeypatch.setattr(Metrics, "STAGE_DURATION", histogram)
+    return histogram
+
+
+@pytest.fixture
+def progress(clock, stage_duration):
+    return ProgressMessage(FakeNotifier(), interval=3)
+
+
+def test_single_message_is_edited(progress, clock):
+    progress.set_stage(ProgressMessage.DOWNLOAD)
+    progress.notifier.deliver()
+
+    clock.now += 3
+    progress.update(512 * 1024, 1024 * 1024)
+
+    assert len(progress.notifier.sent) == 1
+    assert progress.notifier.edits == [(42, progress.render())]
+    assert progress.render().startswith("⬇️ Downloading 50.0%")
+
+
+def test_edits_are_rate_limited(progress, clock):
+    progress.set_stage(ProgressMessage.DOWNLOAD)
+    progress.notifier.deliver()
+
+    for i in range(1, 10):
+        clock.now += 1
+        progress.update(i * 1024, 10 * 1024)
+
+    # One edit every 3 seconds
+    assert len(progress.notifier.edits) == 3
+
+
+def test_stage_change_is_shown_immediately(progress, clock):
+    progress.set_stage(ProgressMessage.DOWNLOAD)
+    progress.notifier.deliver()
+
+    clock.now += 0.5
+    progress.set_stage(ProgressMessage.UPLOAD)
+
+    assert progress.notifier.edits == [(42, "⬆️ Uploading")]
+
+
+def test_updates_while_the_first_message_is_queued(progress, clock):
+    progress.set_stage(ProgressMessage.DOWNLOAD)
+
+    clock.now += 5
+    progress.update(100, 1000)
+    progress.set_stage(ProgressMessage.UPLOAD)
+
+    # Nothing is sent until the first message has an id, then the latest state is shown
+    assert progress.notifier.sent == ["⬇️ Downloading"]
+    assert progress.notifier.edits == []
+
+    progress.notifier.deliver()
+    assert progress.notifier.edits == [(42, "⬆️ Uploading")]
+
+
+def test_unchanged_text_is_not_edited(progress, clock):
+    progress.set_stage(ProgressMessage.DOWNLOAD)
+    progress.notifier.deliver()
+
+    progress.set_stage(ProgressMessage.DOWNLOAD)
+
+    assert progress.notifier.edits == []
+
+
+def test_speed_and_eta(progress, clock):
+    progress.set_stage(ProgressMessage.UPLOAD)
+
+    clock.now += 10
+    progress.update(10 * 1024 * 1024, 30 * 1024 * 1024)
+
+    assert progress.speed == pytest.approx(1024 * 1024)
+    assert progress.eta == pytest.approx(20)
+    assert progress.render() == "\n".join([
+        "⬆️ Uploading 33.3%", "📦 10.0 MB / 30.0 MB", "🚀 1.0 MB/s", "⏱️ ETA 00:20"
+    ])
+
+
+def test_stage_durations(progress, clock, stage_duration):
+    progress.set_stage(ProgressMessage.DOWNLOAD)
+
+    # Time spent in the queue
+    clock.now += 100
+    progress.reset_timer()
+
+    clock.now += 4
+    progress.set_stage(ProgressMessage.UPLOAD)
+
+    clock.now += 1
+    progress.discard_timer()
+    progress.set_stage(ProgressMessage.DONE)
+
+    assert stage_duration.labels("download")._sum == pytest.approx(4)
+    assert ("upload",) not in stage_duration._children
+
+
+@pytest.mark.parametrize("size, text", [(512, "512.0 B"), (1536, "1.5 KB"), (5 * 1024 ** 3, "5.0 GB"),
+                                        (2 * 1024 ** 4, "2.0 TB")])
+def test_format_bytes(size, text):
+    assert ProgressMessage.format_bytes(size) == text
+
+
+@pytest.mark.parametrize("seconds, text", [(5, "00:05"), (125, "02:05"), (3725, "1:02:05")])
+def test_format_seconds(seconds, text):
+    assert ProgressMessage.format_seconds(seconds) == text
@@ -0,0 +1,166 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler
+from types import SimpleNamespace
+
+import pytest
+
+from classes.segmenteddownloader import SegmentedDownloader
+
+DATA = os.urandom(64 * 1024)
+
+
+@pytest.fixture
+def server(http_server):
+    """
+    File server: 'head' (HEAD supported), 'ranges' ("all", "probe" = only the 'bytes=0-0' probe, "none") and
+    'cut' (offsets of the range requests closed after half of the bytes, once) change its behaviour.
+    """
+
+    state = SimpleNamespace(head=True, ranges="all", cut=set(), requests=[], lock=threading.Lock())
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_HEAD(self):
+            with state.lock:
+                state.requests.append(("HEAD", None))
+
+            if not state.head:
+                self.send_error(405)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(DATA)))
+            self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+
+        def do_GET(self):
+            range_header = self.headers.get("Range")
+            match = re.match(r"bytes=(\d+)-(\d+)", range_header or "")
+
+            with state.lock:
+                state.requests.append(("GET", range_header))
+
+            if match is None or state.ranges == "none" or state.ranges == "probe" and range_header != "bytes=0-0":
+                self._send(200, DATA)
+                return
+
+            start, end = int(match.group(1)), int(match.group(2))
+            body = DATA[start:end + 1]
+
+            with state.lock:
+                cut = start in state.cut
+                state.cut.discard(start)
+
+            self._send(206, body, {"Content-Range": "bytes {}-{}/{}".format(start, end, len(DATA))}, cut=cut)
+
+        def _send(self, status, body, headers=None, cut=False):
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+
+            if cut:
+                # Connection lost in the middle of the segment
+                self.wfile.write(body[:len(body) // 2])
+                self.close_connection = True
+            else:
+                self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    state.url = http_server(Handler) + "/video.mp4"
+    return state
+
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    monkeypatch.setattr("classes.segmenteddownloader.time", SimpleNamespace(sleep=lambda seconds: None))
+
+
+def download(server, tmp_path, **kwargs):
+    kwargs.setdefault("segments", 4)
+    kwargs.setdefault("min_segment_size", 4096)
+
+    path = str(tmp_path / "video.mp4")
+    progress = []
+
+    downloader = SegmentedDownloader(**kwargs)
+    downloader.CHUNK_SIZE = 1024
+    downloaded = downloader.download(server.url, path, progress=lambda *args: progress.append(args))
+
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+
+    assert downloaded == len(DATA)
+    assert max(progress) == (len(DATA), len(DATA))
+
+    return [request for request in server.requests if request[0] == "GET"]
+
+
+def test_segments(server, tmp_path):
+    requests = download(server, tmp_path)
+
+    assert sorted(requests) == [
+        ("GET", "bytes=0-16383"), ("GET", "bytes=16384-32767"), ("GET", "bytes=32768-49151"),
+        ("GET", "bytes=49152-65535")
+    ]
+
+
+def test_segments_limited_by_min_size(server, tmp_path):
+    requests = download(server, tmp_path, segments=8, min_segment_size=32 * 1024)
+
+    assert sorted(requests) == [("GET", "bytes=0-32767"), ("GET", "bytes=32768-65535")]
+
+
+def test_range_probe_without_head(server, tmp_path):
+    server.head = False
+
+    requests = download(server, tmp_path)
+
+    assert requests[0] == ("GET", "bytes=0-0")
+    assert len(requests) == 5
+
+
+def test_ranges_not_supported(server, tmp_path):
+    server.head = False
+    server.ranges = "none"
+
+    requests = download(server, tmp_path)
+
+    assert requests == [("GET", "bytes=0-0"), ("GET", None)]
+
+
+def test_refused_ranges_fall_back_to_a_single_stream(server, tmp_path):
+    # The probe succeeds, then every segment request gets the whole file (HTTP 200)
+    server.head = False
+    server.ranges = "probe"
+
+    requests = download(server, tmp_path)
+
+    assert requests[-1] == ("GET", None)
+    assert all(request[1] is not None for request in requests[:-1])
+
+
+def test_interrupted_segment_is_resumed(server, tmp_path):
+    server.cut.add(16384)
+
+    requests = download(server, tmp_path)
+
+    # The segment continues from the last written byte
+    assert ("GET", "bytes=16384-32767") in requests
+    assert ("GET", "bytes=24576-32767") in requests
+    assert len(requests) == 5
+
+
+def test_segment_fails_after_the_retries(server, tmp_path):
+    server.cut.add(16384)
+
+    with pytest.raises(IOError):
+        SegmentedDownloader(segments=4, min_segment_size=4096, retries=1).download(
+            server.url, str(tmp_path / "video.mp4")
+        )
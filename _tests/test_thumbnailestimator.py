@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from classes.thumbnailestimator import ThumbnailEstimator
+
+MB = 1024 * 1024
+
+
+def thumbnail_time(size, duration):
+    # Host model used by the tests: 5 seconds + 2 seconds per MB + 3 seconds per minute
+    return 5 + 2 * size / MB + 3 * duration / 60
+
+
+def train(estimator, host="verystream", samples=200, noise=0.0, seed=1):
+    generator = random.Random(seed)
+
+    for _ in range(samples):
+        size = generator.uniform(10, 500) * MB
+        duration = generator.uniform(60, 3600)
+        estimator.record(host, thumbnail_time(size, duration) + generator.gauss(0, noise), size, duration)
+
+
+def test_unknown_host_uses_the_default_delay():
+    estimator = ThumbnailEstimator(default_delay=15)
+
+    assert estimator.predict("verystream", 100 * MB, 600) == 15
+    assert estimator.get_error("verystream") == 15
+
+
+def test_learns_the_host_model():
+    estimator = ThumbnailEstimator(forgetting=1.0, max_delay=10000)
+    train(estimator)
+
+    coefficients = estimator.get_models()["verystream"]["coefficients"]
+    assert coefficients[1] == pytest.approx(2, rel=0.01)
+    assert coefficients[2] == pytest.approx(3, rel=0.01)
+    assert coefficients[0] + coefficients[3] == pytest.approx(5, abs=0.5)
+
+    assert estimator.predict("verystream", 200 * MB, 1200) == pytest.approx(thumbnail_time(200 * MB, 1200), rel=0.01)
+    assert estimator.get_error("verystream") < 1
+
+
+def test_error_follows_the_noise():
+    estimator = ThumbnailEstimator(max_delay=10000)
+    train(estimator, noise=10)
+
+    assert 5 < estimator.get_error("verystream") < 20
+
+
+def test_follows_a_slower_host():
+    estimator = ThumbnailEstimator(forgetting=0.9)
+    for _ in range(50):
+        estimator.record("verystream", 20, 100 * MB)
+
+    # The host becomes slower: the old samples are forgotten
+    for _ in range(50):
+        estimator.record("verystream", 60, 100 * MB)
+
+    assert estimator.predict("verystream", 100 * MB) == pytest.approx(60, abs=1)
+
+
+def test_unknown_duration():
+    estimator = ThumbnailEstimator(forgetting=1.0)
+    for size in (10, 50, 100, 200):
+        estimator.record("verystream", 5 + 2 * size, size * MB)
+
+    assert estimator.predict("verystream", 150 * MB) == pytest.approx(305, rel=0.01)
+
+
+def test_prediction_limits():
+    estimator = ThumbnailEstimator(min_delay=1, max_delay=600)
+    for _ in range(20):
+        estimator.record("verystream", 300, 100 * MB)
+
+    assert estimator.predict("verystream", 0) >= 1
+    assert estimator.predict("verystream", 10000 * MB) == 600
+
+
+def test_hosts_are_separated():
+    estimator = ThumbnailEstimator()
+    for _ in range(20):
+        estimator.record("verystream", 10, 100 * MB)
+        estimator.record("openload", 100, 100 * MB)
+
+    assert estimator.predict("verystream", 100 * MB) == pytest.approx(10, abs=1)
+    assert estimator.predict("openload", 100 * MB) == pytest.approx(100, abs=1)
+
+
+def test_models_survive_restart(tmp_path):
+    path = str(tmp_path / "thumbnails.json")
+    estimator = ThumbnailEstimator(path, max_delay=10000)
+    train(estimator, samples=20)
+
+    loaded = ThumbnailEstimator(path, max_delay=10000)
+
+    assert loaded.get_models() == estimator.get_models()
+    assert loaded.predict("verystream", 100 * MB, 600) == estimator.predict("verystream", 100 * MB, 600)
+
+
+def test_corrupted_file_starts_empty(tmp_path):
+    path = tmp_path / "thumbnails.json"
+    path.write_text('{"verystream": {"theta": [1, 2]}}')
+
+    assert ThumbnailEstimator(str(path)).get_models() == {}
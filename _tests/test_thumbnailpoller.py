@@ -0,0 +1,187 @@
+import heapq
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from classes.thumbnailpoller import ThumbnailPoller
+
+
+class FakeUploader:
+    """
+    Uploader stand-in: the thumbnail of a video is ready from the check number 'ready_at' (None = never).
+    """
+
+    def __init__(self, clock=None, ready_at=None):
+        self.clock = clock
+        self.ready_at = ready_at
+        self.checks = []
+
+    def get_thumbnail(self, media_id):
+        self.checks.append(self.clock.now if self.clock is not None else media_id)
+
+        if self.ready_at is not None and len(self.checks) >= self.ready_at:
+            return "https://host/splash/{}.jpg".format(media_id)
+
+        return None
+
+
+class FakeEstimator:
+    def __init__(self, delay, error):
+        self.delay = delay
+        self.error = error
+        self.samples = []
+
+    def predict(self, host, size=None, duration=None):
+        return self.delay
+
+    def get_error(self, host):
+        return self.error
+
+    def record(self, host, seconds, size=None, duration=None):
+        self.samples.append((host, seconds, size, duration))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake time.monotonic of the poller, moved forward by 'run_next'.
+    """
+
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr("classes.thumbnailpoller.time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def create_poller(**kwargs):
+    """
+    :return: ThumbnailPoller without its thread: the tests run the checks with 'run_next'.
+    """
+
+    kwargs.setdefault("jitter", 0)
+    poller = ThumbnailPoller(**kwargs)
+    poller._start = lambda: None
+    return poller
+
+
+def run_next(poller, clock):
+    """
+    Moves the clock to the next due check and runs the checks due at that time (like the poller thread).
+    """
+
+    clock.now = poller._heap[0][0]
+
+    due = []
+    while poller._heap and poller._heap[0][0] <= clock.now:
+        _, poll_id = heapq.heappop(poller._heap)
+        if poll_id in poller._polls:
+            due.append((poll_id, poller._polls[poll_id]))
+
+    poller._check(due)
+
+
+def test_exponential_backoff(clock):
+    poller = create_poller(initial_delay=10, backoff=2, max_interval=60)
+    uploader = FakeUploader(clock, ready_at=6)
+    results = []
+
+    poller.poll(uploader, "f1", results.append)
+
+    while poller.get_pending():
+        run_next(poller, clock)
+
+    assert [check - 1000 for check in uploader.checks] == [10, 20, 40, 80, 140, 200]
+    assert results == ["https://host/splash/f1.jpg"]
+
+
+def test_deadline(clock):
+    poller = create_poller(initial_delay=10, backoff=2, max_interval=60, deadline=100)
+    uploader = FakeUploader(clock)
+    results = []
+
+    poller.poll(uploader, "f1", results.append)
+
+    while poller.get_pending():
+        run_next(poller, clock)
+
+    # The last check is made at the deadline
+    assert [check - 1000 for check in uploader.checks] == [10, 20, 40, 80, 100]
+    assert results == [None]
+
+
+def test_cancel(clock):
+    poller = create_poller(initial_delay=10)
+    results = []
+
+    poll_id = poller.poll(FakeUploader(clock), "f1", results.append)
+
+    assert poller.cancel(poll_id)
+    assert not poller.cancel(poll_id)
+    assert poller.get_pending() == 0
+    assert results == []
+
+
+def test_due_checks_are_made_in_one_pass(clock):
+    poller = create_poller(initial_delay=10)
+    checked = []
+
+    def get_thumbnails(polls):
+        checked.append([poll["media_id"] for poll in polls])
+        return ["https://host/splash.jpg"] * len(polls)
+
+    poller._get_thumbnails = get_thumbnails
+
+    for media_id in ("f1", "f2", "f3"):
+        poller.poll(None, media_id, lambda url: None)
+    poller.poll(None, "f4", lambda url: None, initial_delay=20)
+
+    run_next(poller, clock)
+    assert checked == [["f1", "f2", "f3"]]
+
+
+def test_estimator(clock):
+    estimator = FakeEstimator(delay=30, error=5)
+    poller = create_poller(estimator=estimator)
+    uploader = FakeUploader(clock, ready_at=2)
+
+    poller.poll(uploader, "f1", lambda url: None, host="verystream", size=1024, duration=60)
+
+    while poller.get_pending():
+        run_next(poller, clock)
+
+    # First check at the predicted time, then with an interval as big as the prediction error
+    assert [check - 1000 for check in uploader.checks] == [30, 35]
+
+    # The thumbnail has been generated between the two checks
+    assert estimator.samples == [("verystream", 32.5, 1024, 60)]
+
+
+def test_failed_callback_does_not_stop_the_poller(clock):
+    poller = create_poller(initial_delay=10)
+    results = []
+
+    def failing_callback(url):
+        raise ValueError("callback error")
+
+    poller.poll(FakeUploader(clock, ready_at=1), "f1", failing_callback)
+    poller.poll(FakeUploader(clock, ready_at=1), "f2", results.append)
+
+    run_next(poller, clock)
+
+    assert results == ["https://host/splash/f2.jpg"]
+    assert poller.get_pending() == 0
+
+
+def test_poller_thread():
+    poller = ThumbnailPoller(initial_delay=0.05, max_interval=0.05)
+    ready = threading.Event()
+    results = []
+
+    def callback(url):
+        results.append(url)
+        ready.set()
+
+    poller.poll(FakeUploader(ready_at=3), "f1", callback)
+
+    assert ready.wait(5)
+    assert results == ["https://host/splash/f1.jpg"]
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+
+from classes.tokenbucket import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake time.monotonic of the TokenBucket, moved forward by the tests.
+    """
+
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr("classes.tokenbucket.time", SimpleNamespace(monotonic=lambda: clock.now, sleep=None))
+    return clock
+
+
+def test_burst_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+
+    assert [bucket.try_consume() for _ in range(4)] == [True, True, True, False]
+
+
+def test_refill_with_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.try_consume(2)
+    assert not bucket.try_consume()
+
+    assert bucket.get_wait_time() == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert bucket.try_consume()
+    assert not bucket.try_consume()
+
+
+def test_refill_stops_at_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=5)
+    bucket.try_consume(5)
+
+    clock.now += 60
+    assert bucket.try_consume(5)
+    assert not bucket.try_consume()
+
+
+def test_request_bigger_than_capacity(clock):
+    bucket = TokenBucket(rate=100, capacity=100)
+
+    # Allowed when the bucket is full, the debt is paid by the next requests
+    assert bucket.try_consume(250)
+    assert bucket.get_wait_time(100) == pytest.approx(2.5)
+
+
+def test_no_limit(clock):
+    bucket = TokenBucket(rate=0)
+
+    assert all(bucket.try_consume(10 ** 9) for _ in range(10))
+    assert bucket.get_wait_time(10 ** 9) == 0
+
+
+def test_set_rate_keeps_tokens(clock):
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.try_consume(8)
+
+    bucket.set_rate(1, capacity=5)
+    assert bucket.tokens == pytest.approx(2)
+
+    bucket.set_rate(1, capacity=1)
+    assert bucket.tokens == pytest.approx(1)
@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+from classes.tracer import Tracer
+from classes.tracesummary import TraceSummary, main
+
+
+def span(trace, name, start, duration, outcome="ok", size=None, **attributes):
+    record = {"trace": trace, "span": name, "start": start, "end": start + duration, "duration": duration,
+              "bytes": size, "outcome": outcome}
+    record.update(attributes)
+    return record
+
+
+@pytest.fixture
+def trace_log(tmp_path):
+    spans = [span("job1", "download", 100.0, duration, size=1024 * 1024) for duration in range(1, 11)]
+    spans += [
+        span("job1", "upload", 111.0, 5.0, size=2 * 1024 * 1024),
+        span("job2", "upload", 200.0, 30.0, outcome="error", uploader="verystream"),
+        span("job2", "job", 190.0, 45.0),
+    ]
+
+    path = tmp_path / "traces.jsonl"
+    path.write_text("".join(json.dumps(record) + "\n" for record in spans))
+    return str(path)
+
+
+def test_invalid_lines_are_skipped(trace_log):
+    with open(trace_log, "a") as file:
+        file.write("{truncated line\n")
+        file.write(json.dumps({"span": "download"}) + "\n")
+        file.write("[1, 2]\n")
+
+    summary = TraceSummary()
+
+    assert summary.load(trace_log) == 13
+
+
+def test_stage_statistics(trace_log):
+    summary = TraceSummary()
+    summary.load(trace_log)
+
+    stages = summary.get_stages()
+    download = stages["download"]
+
+    assert download["count"] == 10
+    assert (download["p50"], download["p90"], download["p99"], download["max"]) == (5, 9, 10, 10)
+    assert download["bytes"] == 10 * 1024 * 1024
+    assert download["outcomes"] == {"ok": 10}
+
+    assert stages["upload"]["outcomes"] == {"ok": 1, "error": 1}
+    assert stages["upload"]["bytes"] == 2 * 1024 * 1024
+
+
+@pytest.mark.parametrize("percentile, value", [(0, 1), (10, 1), (11, 2), (50, 5), (100, 10)])
+def test_percentile_nearest_rank(percentile, value):
+    assert TraceSummary.percentile(list(range(1, 11)), percentile) == value
+
+
+def test_trace_timeline(trace_log):
+    summary = TraceSummary()
+    summary.load(trace_log)
+
+    assert [record["span"] for record in summary.get_trace("job2")] == ["job", "upload"]
+    assert summary.get_trace("missing") == []
+
+
+def test_slowest_jobs(trace_log):
+    summary = TraceSummary()
+    summary.load(trace_log)
+
+    assert summary.get_slowest(2) == [("job2", 45.0), ("job1", 16.0)]
+
+
+def test_spans_written_by_the_tracer(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    tracer = Tracer(path)
+
+    with tracer.span("job1", "download", url="http://example.com/video") as download:
+        download.add_bytes(1000)
+    tracer.span("job1", "upload").finish("error")
+    tracer.flush()
+
+    summary = TraceSummary()
+    assert summary.load(path) == 2
+
+    [first, second] = summary.get_trace("job1")
+    assert (first["span"], first["bytes"], first["url"], first["outcome"]) == (
+        "download", 1000, "http://example.com/video", "ok"
+    )
+    assert (second["span"], second["outcome"]) == ("upload", "error")
+
+
+def test_command_line(trace_log, capsys):
+    assert main([trace_log, "--slowest", "1"]) == 0
+
+    output = capsys.readouterr().out.splitlines()
+
+    # Steps in pipeline order, then the slowest job
+    assert [line.split()[0] for line in output[1:4]] == ["job", "download", "upload"]
+    assert output[-1].split() == ["job2", "45.0s"]
+
+
+def test_command_line_trace(trace_log, capsys):
+    assert main([trace_log, "--trace", "job2"]) == 0
+
+    output = capsys.readouterr().out.splitlines()
+    assert len(output) == 2
+    assert "uploader=verystream" in output[1]
+
+
+def test_command_line_without_spans(tmp_path, capsys):
+    assert main([os.path.join(str(tmp_path), "missing*.jsonl")]) == 1
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+from classes.ttlcache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake time.monotonic of the TTLCache, moved forward by the tests.
+    """
+
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr("classes.ttlcache.time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_entry_expires(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+
+    clock.now += 0.2
+    assert cache.get("a") is None
+    assert cache.get("a", "missing") == "missing"
+
+    # Expired entries are removed when they are read
+    assert len(cache) == 0
+
+
+def test_entry_ttl(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("short", 1, ttl=1)
+    cache.set("long", 2, ttl=100)
+
+    clock.now += 50
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+
+def test_no_expiration(clock):
+    cache = TTLCache(ttl=0)
+    cache.set("a", 1)
+
+    clock.now += 10 ** 6
+    assert cache.get("a") == 1
+
+
+def test_set_renews_expiration(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+
+    clock.now += 8
+    cache.set("a", 2)
+
+    clock.now += 8
+    assert cache.get("a") == 2
+
+
+def test_least_recently_used_evicted(clock):
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # 'a' becomes the most recently used entry
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_remove_if(clock):
+    cache = TTLCache(ttl=10)
+    for i in range(5):
+        cache.set(i, i * 10)
+
+    assert cache.remove_if(lambda key, value: value >= 30) == 2
+    assert sorted(key for key, _, _ in cache.items()) == [0, 1, 2]
@@ -0,0 +1,82 @@
+import json
+import queue
+import urllib.error
+import urllib.request
+
+import pytest
+
+pytest.importorskip("telegram", exc_type=ImportError)
+
+from classes.webhookserver import WebhookServer
+
+
+def update(update_id):
+    return {"update_id": update_id}
+
+
+@pytest.fixture
+def webhook():
+    return WebhookServer(None, queue.Queue(), "secret", port=0)
+
+
+def queued_ids(webhook):
+    ids = []
+    while not webhook.UPDATE_QUEUE.empty():
+        ids.append(webhook.UPDATE_QUEUE.get_nowait().update_id)
+    return ids
+
+
+def test_single_update(webhook):
+    assert webhook.dispatch(update(1)) == 1
+    assert queued_ids(webhook) == [1]
+    assert webhook.received == 1
+
+
+def test_bulk_updates(webhook):
+    assert webhook.dispatch([update(1), update(2), update(3)]) == 3
+    assert queued_ids(webhook) == [1, 2, 3]
+    assert webhook.received == 3
+
+
+@pytest.mark.parametrize("data", [
+    [update(1), {"message": {}}],
+    [update(1), "not an update"],
+    [update(1), None],
+    "update",
+    {"message": {}},
+])
+def test_invalid_bulk_is_rejected_as_a_whole(webhook, data):
+    with pytest.raises(ValueError):
+        webhook.dispatch(data)
+
+    assert queued_ids(webhook) == []
+    assert webhook.received == 0
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read().decode())
+    except urllib.error.HTTPError as ex:
+        return ex.code, None
+
+
+def test_http_server(webhook):
+    webhook.MAX_BODY_SIZE = 1024
+    webhook.start()
+
+    try:
+        url = "http://127.0.0.1:{}".format(webhook._server.server_port)
+
+        assert post(url + "/secret", json.dumps([update(1), update(2)]).encode()) == (200, {"ok": True, "updates": 2})
+        assert post(url + "/other", json.dumps(update(3)).encode())[0] == 404
+        assert post(url + "/secret", b"{not json")[0] == 400
+        assert post(url + "/secret", json.dumps([update(4), {}]).encode())[0] == 400
+        assert post(url + "/secret", json.dumps([update(i) for i in range(200)]).encode())[0] == 413
+
+        assert queued_ids(webhook) == [1, 2]
+
+    finally:
+        webhook.stop()
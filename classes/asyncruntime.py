@@ -0,0 +1,131 @@
+import asyncio
+import threading
+
+
+class AsyncRuntime:
+    """
+    This class runs a single asyncio event loop in a background thread with a pooled HTTP client (aiohttp).
+    When it's started, all the small network requests of the bot (URL checks, thumbnail downloads and
+    uploader API calls) are multiplexed on this loop instead of using a blocking connection each.
+
+    The synchronous code (Telegram handlers and download workers) waits the results using 'run'.
+    """
+
+    # Runtime used by the bot (None = async mode disabled)
+    CURRENT = None
+
+    def __init__(self, max_connections=20, timeout=30):
+        """
+        Parametrized constructor method.
+
+        :param max_connections: (Optional, Default=20) Max number of open connections of the HTTP client.
+        :param timeout: (Optional, Default=30) Timeout in seconds of every HTTP request.
+        """
+
+        self.MAX_CONNECTIONS = max_connections
+        self.TIMEOUT = timeout
+
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the event loop thread and creates the HTTP client. This runtime will be used by all the classes
+        that support the async mode ('AsyncRuntime.CURRENT').
+        """
+
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("The async mode requires aiohttp, install it with 'pip3 install aiohttp'")
+
+        self._thread = threading.Thread(target=self.loop.run_forever, name="AsyncRuntime")
+        self._thread.daemon = True
+        self._thread.start()
+
+        async def create_session():
+            return aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.MAX_CONNECTIONS),
+                timeout=aiohttp.ClientTimeout(total=self.TIMEOUT)
+            )
+
+        self.session = self.run(create_session())
+        AsyncRuntime.CURRENT = self
+
+        print("[AsyncRuntime] Event loop started (max {} connections)".format(self.MAX_CONNECTIONS))
+
+    def stop(self):
+        """
+        Closes the HTTP client and stops the event loop.
+        """
+
+        if AsyncRuntime.CURRENT is self:
+            AsyncRuntime.CURRENT = None
+
+        if self.session is not None:
+            self.run(self.session.close())
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def submit(self, coroutine):
+        """
+        Schedules a coroutine on the event loop.
+
+        :param coroutine: Coroutine to run.
+        :return: concurrent.futures.Future object with the coroutine result.
+        """
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, timeout=None):
+        """
+        Runs a coroutine on the event loop and waits its result (used by the synchronous code).
+
+        :param coroutine: Coroutine to run.
+        :param timeout: (Optional, Default=None) Max number of seconds to wait.
+        :return: Coroutine result.
+        """
+
+        return self.submit(coroutine).result(timeout)
+
+    async def fetch(self, url: str, method="GET", allow_redirects=True, **kwargs):
+        """
+        Sends an HTTP request using the pooled client.
+
+        :param url: Requested url.
+        :param method: (Optional, Default=GET) HTTP method.
+        :param allow_redirects: (Optional, Default=True) If it's true the redirects are followed.
+        :return: (status code, body as bytes) tuple.
+        """
+
+        async with self.session.request(method, url, allow_redirects=allow_redirects, **kwargs) as response:
+            return response.status, await response.read()
+
+    async def fetch_status(self, url: str, method="GET", allow_redirects=True, **kwargs) -> int:
+        """
+        Sends an HTTP request using the pooled client without reading the response body.
+
+        :param url: Requested url.
+        :param method: (Optional, Default=GET) HTTP method.
+        :param allow_redirects: (Optional, Default=True) If it's true the redirects are followed.
+        :param kwargs: Other arguments of the request (ex: timeout=aiohttp.ClientTimeout(...) replaces the
+        timeout of the session).
+        :return: Status code.
+        """
+
+        async with self.session.request(method, url, allow_redirects=allow_redirects, **kwargs) as response:
+            return response.status
+
+    async def get_json(self, url: str, params=None):
+        """
+        Sends an HTTP GET request and decodes the JSON response.
+
+        :param url: Requested url.
+        :param params: (Optional, Default=None) Query string parameters.
+        :return: Decoded JSON response.
+        """
+
+        async with self.session.get(url, params=params) as response:
+            return await response.json(content_type=None)
@@ -0,0 +1,120 @@
+import collections
+import threading
+import time
+
+from classes.metrics import Metrics
+from classes.tokenbucket import TokenBucket
+
+
+class BandwidthChannel:
+    """
+    This class represents a single transfer (download or upload of a job) managed by the BandwidthGovernor.
+    The channel limits the transfer to its fair share of the bandwidth and measures its live rate.
+
+    Transfers that read the data themselves call 'consume' for every block (it waits if the transfer is too
+    fast). Transfers made by other libraries (ex: Youtube-DL) call 'record' and receive their share with the
+    'on_share' callback, so they can limit themselves.
+    """
+
+    # Seconds used to measure the live rate
+    RATE_WINDOW = 5.0
+
+    def __init__(self, governor, direction: str, name: str, on_share=None):
+        """
+        Parametrized constructor method.
+
+        :param governor: BandwidthGovernor object that created the channel.
+        :param direction: BandwidthGovernor.DOWNLOAD or BandwidthGovernor.UPLOAD.
+        :param name: Name of the transfer (shown in the live rates).
+        :param on_share: (Optional, Default=None) Function called with the new share (bytes/s, 0 if there is no
+        limit) every time it changes.
+        """
+
+        self.governor = governor
+        self.direction = direction
+        self.name = name
+        self.on_share = on_share
+
+        self.share = 0
+        self.bucket = TokenBucket(0)
+
+        # Transferred bytes: (time, bytes)
+        self._samples = collections.deque()
+        self._opened = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Counter of the transferred bytes (all the transfers of the same direction)
+        self._transferred = Metrics.TRANSFERRED_BYTES.labels(direction)
+
+    def consume(self, amount: int):
+        """
+        Waits until the transfer can send (or receive) 'amount' bytes without going over its share and the
+        global limit.
+
+        :param amount: Number of bytes.
+        """
+
+        self.bucket.consume(amount)
+        self.governor.consume(self.direction, amount)
+        self.record(amount)
+
+    def record(self, amount: int):
+        """
+        Counts 'amount' transferred bytes in the live rate (without waiting).
+
+        :param amount: Number of bytes.
+        """
+
+        if amount <= 0:
+            return
+
+        now = time.monotonic()
+        self._transferred.inc(amount)
+
+        with self._lock:
+            self._samples.append((now, amount))
+            self._prune(now)
+
+    def get_rate(self) -> float:
+        """
+        :return: Live rate of the transfer (bytes/s).
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            self._prune(now)
+
+            # A new channel is measured on the time since it has been opened
+            window = max(min(self.RATE_WINDOW, now - self._opened), 0.1)
+            return sum(amount for _, amount in self._samples) / window
+
+    def set_share(self, share: float):
+        """
+        Changes the share of the transfer (called by the governor).
+
+        :param share: Max rate in bytes/s (0 if there is no limit).
+        """
+
+        self.share = share
+        self.bucket.set_rate(share, share * self.governor.BURST_SECONDS if share > 0 else None)
+
+        if self.on_share is not None:
+            self.on_share(share)
+
+    def close(self):
+        """
+        Ends the transfer: its share is given to the other transfers.
+        """
+
+        self.governor.close(self)
+
+    def _prune(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.RATE_WINDOW:
+            self._samples.popleft()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,146 @@
+import threading
+
+from classes.bandwidthchannel import BandwidthChannel
+from classes.tokenbucket import TokenBucket
+
+
+class BandwidthGovernor:
+    """
+    This class shares the bandwidth between all the downloads and uploads of the bot. Downloads and uploads have
+    separate budgets (bytes/s), every budget is enforced with a token bucket and split in equal parts between
+    the active transfers (fair share), so a job can't starve the others and the uploads can't saturate the
+    uplink.
+
+    Every transfer opens a BandwidthChannel ('open'), the share of the other transfers is updated when a
+    channel is opened or closed. A budget of 0 means no limit (the live rates are measured anyway).
+    """
+
+    # Transfer directions
+    DOWNLOAD, UPLOAD = "download", "upload"
+
+    # Max burst of a bucket (seconds of budget)
+    BURST_SECONDS = 0.5
+
+    def __init__(self, download_rate=0, upload_rate=0):
+        """
+        Parametrized constructor method.
+
+        :param download_rate: (Optional, Default=0) Download budget in bytes/s (0 = no limit).
+        :param upload_rate: (Optional, Default=0) Upload budget in bytes/s (0 = no limit).
+        """
+
+        self._lock = threading.Lock()
+
+        self._limits = {self.DOWNLOAD: download_rate, self.UPLOAD: upload_rate}
+        self._buckets = {
+            direction: TokenBucket(rate, rate * self.BURST_SECONDS if rate > 0 else None)
+            for direction, rate in self._limits.items()
+        }
+
+        # Active transfers: <direction>: list of BandwidthChannel objects
+        self._channels = {self.DOWNLOAD: [], self.UPLOAD: []}
+
+    def open(self, direction: str, name: str, on_share=None) -> BandwidthChannel:
+        """
+        Starts a new transfer.
+
+        :param direction: BandwidthGovernor.DOWNLOAD or BandwidthGovernor.UPLOAD.
+        :param name: Name of the transfer (ex: video url).
+        :param on_share: (Optional, Default=None) Function called with the share of the transfer (bytes/s, 0 if
+        there is no limit) every time it changes.
+        :return: BandwidthChannel object (close it at the end of the transfer).
+        """
+
+        channel = BandwidthChannel(self, direction, name, on_share=on_share)
+
+        with self._lock:
+            self._channels[direction].append(channel)
+
+        self._rebalance(direction)
+        return channel
+
+    def close(self, channel: BandwidthChannel):
+        """
+        Ends a transfer (see 'BandwidthChannel.close').
+
+        :param channel: Channel of the transfer.
+        """
+
+        with self._lock:
+            if channel not in self._channels[channel.direction]:
+                return
+
+            self._channels[channel.direction].remove(channel)
+
+        self._rebalance(channel.direction)
+
+    def consume(self, direction: str, amount: int):
+        """
+        Waits until 'amount' bytes can be transferred without going over the budget.
+
+        :param direction: BandwidthGovernor.DOWNLOAD or BandwidthGovernor.UPLOAD.
+        :param amount: Number of bytes.
+        """
+
+        self._buckets[direction].consume(amount)
+
+    def set_limit(self, direction: str, rate: float):
+        """
+        Changes a budget (the active transfers receive their new share immediately).
+
+        :param direction: BandwidthGovernor.DOWNLOAD or BandwidthGovernor.UPLOAD.
+        :param rate: New budget in bytes/s (0 = no limit).
+        """
+
+        with self._lock:
+            self._limits[direction] = rate
+
+        self._buckets[direction].set_rate(rate, rate * self.BURST_SECONDS if rate > 0 else None)
+        self._rebalance(direction)
+
+    def get_share(self, direction: str) -> float:
+        """
+        :param direction: BandwidthGovernor.DOWNLOAD or BandwidthGovernor.UPLOAD.
+        :return: Current share of every transfer in bytes/s (0 if there is no limit).
+        """
+
+        with self._lock:
+            return self._limits[direction] / max(len(self._channels[direction]), 1)
+
+    def get_rates(self) -> dict:
+        """
+        :return: Live rates of every direction: {<direction>: {"limit", "rate", "transfers": {<name>: rate}}}.
+        Rates are in bytes/s.
+        """
+
+        with self._lock:
+            channels = {direction: list(channels) for direction, channels in self._channels.items()}
+            limits = dict(self._limits)
+
+        rates = {}
+        for direction, active in channels.items():
+            transfers = {}
+            for channel in active:
+                transfers[channel.name] = transfers.get(channel.name, 0) + channel.get_rate()
+
+            rates[direction] = {
+                "limit": limits[direction],
+                "rate": sum(transfers.values()),
+                "transfers": transfers
+            }
+
+        return rates
+
+    def _rebalance(self, direction: str):
+        """
+        Gives the same share of the budget to all the active transfers.
+        """
+
+        share = self.get_share(direction)
+
+        with self._lock:
+            channels = list(self._channels[direction])
+
+        for channel in channels:
+            if channel.share != share:
+                channel.set_share(share)
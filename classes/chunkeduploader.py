@@ -0,0 +1,309 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
+
+
+class ChunkedUploader:
+    """
+    This class is used to upload large files on OpenLoad.co or VeryStream.com splitting them in chunks.
+
+    If the chunked uploads are enabled (the host must implement them, they can't be detected) every chunk is sent
+    with its own POST request (Content-Range + X-Upload-Id headers), more chunks at the same time. When all the
+    chunks are sent a last empty request ('Content-Range: bytes */<size>') commits the upload and returns the
+    uploaded file information. Otherwise the file is sent with a single POST request, like 'upload_large_file'.
+
+    The upload state is saved in a checkpoint file ('<file>.upload') so an interrupted upload can be resumed
+    sending only the missing chunks.
+    """
+
+    # Default size of every chunk (8 MB)
+    DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+    # Checkpoint file extension
+    CHECKPOINT_EXTENSION = ".upload"
+
+    # HTTP status codes returned by the host when a chunk is accepted but the upload is not finished yet
+    PARTIAL_STATUS_CODES = (202, 308)
+
+    def __init__(self, uploader, chunk_size=DEFAULT_CHUNK_SIZE, retries=5, timeout=60, chunked=False):
+        """
+        Parametrized constructor method.
+
+        :param uploader: OpenloadWrapper or VeryStreamWrapper object used to get the upload link.
+        :param chunk_size: (Optional, Default=8MB) Size in bytes of every chunk.
+        :param retries: (Optional, Default=5) Max number of attempts for every request.
+        :param timeout: (Optional, Default=60) Timeout in seconds of every request.
+        :param chunked: (Optional, Default=False) If it's true the file is sent in chunks (only for hosts that
+        accept the chunked upload requests), otherwise with a single request.
+        """
+
+        self.uploader = uploader
+        self.CHUNKED = chunked
+        self.CHUNK_SIZE = int(chunk_size)
+        self.RETRIES = retries
+        self.TIMEOUT = timeout
+
+        self._lock = threading.Lock()
+
+    def upload_file(self, file_path: str, parallelism=4, resume=True, progress=None, throttle=None, **kwargs) -> dict:
+        """
+        Uploads a file.
+
+        :param file_path: Path of the file to upload.
+        :param parallelism: (Optional, Default=4) Number of chunks uploaded at the same time.
+        :param resume: (Optional, Default=True) If it's true a chunked upload continues from the last checkpoint.
+        :param progress: (Optional, Default=None) Function called with (bytes sent, file size) during the upload.
+        :param throttle: (Optional, Default=None) Function called with the number of bytes that are going to be
+        sent, it can wait to limit the upload speed (ex: BandwidthChannel.consume).
+        :param kwargs: Arguments passed to 'upload_link' (folder_id, sha1, httponly).
+        :return: Uploaded file information as Dict object.
+
+        'parallelism' and 'resume' are used only by the chunked uploads: without them the file is sent with a
+        single request and a failed request sends the whole file again.
+        """
+
+        size = os.path.getsize(file_path)
+        _, file_name = os.path.split(file_path)
+
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_maxsize=parallelism))
+        session.mount("https://", HTTPAdapter(pool_maxsize=parallelism))
+
+        try:
+            if not self.CHUNKED:
+                # Nothing can be resumed: an interrupted upload sends the whole file again
+                upload_url = self.uploader.upload_link(**kwargs).get("url")
+                return self._upload_whole(session, file_path, file_name, upload_url, progress, throttle)
+
+            checkpoint = self._load_checkpoint(file_path, size) if resume else None
+
+            if checkpoint is None:
+                checkpoint = {
+                    "upload_id": uuid.uuid4().hex,
+                    "size": size,
+                    "mtime": os.path.getmtime(file_path),
+                    "chunk_size": self.CHUNK_SIZE,
+                    "done": []
+                }
+                self._save_checkpoint(file_path, checkpoint)
+            else:
+                print("[ChunkedUploader] Resuming upload of {} ({} chunks already sent)".format(
+                    file_path, len(checkpoint["done"]))
+                )
+
+            # The upload links expire: every attempt requests a new one (the upload id identifies the sent chunks)
+            upload_url = self.uploader.upload_link(**kwargs).get("url")
+
+            result = self._upload_chunks(
+                session, upload_url, file_path, file_name, checkpoint, parallelism, progress, throttle
+            )
+
+            self._remove_checkpoint(file_path)
+            return result
+
+        finally:
+            session.close()
+
+    def _upload_chunks(self, session, upload_url: str, file_path: str, file_name: str, checkpoint: dict,
+                       parallelism: int, progress=None, throttle=None) -> dict:
+        """
+        Uploads all the missing chunks (more at the same time) and commits the upload.
+        """
+
+        size = checkpoint["size"]
+        chunk_size = checkpoint["chunk_size"]
+        chunks = [i for i in range((size + chunk_size - 1) // chunk_size) if i not in checkpoint["done"]]
+
+        print("[ChunkedUploader] Uploading {} chunks of {} bytes ({} at the same time)".format(
+            len(chunks), chunk_size, parallelism)
+        )
+
+        def upload_chunk(index):
+            start = index * chunk_size
+            end = min(start + chunk_size, size) - 1
+
+            with open(file_path, 'rb') as f:
+                f.seek(start)
+                data = f.read(end - start + 1)
+
+            if throttle is not None:
+                throttle(len(data))
+
+            headers = {
+                "X-Upload-Id": checkpoint["upload_id"],
+                "Content-Range": "bytes {}-{}/{}".format(start, end, size)
+            }
+
+            response = self._post(session, upload_url, headers=headers,
+                                  files={"files": (file_name, data, "application/octet-stream")})
+
+            if response.status_code not in self.PARTIAL_STATUS_CODES:
+                self._check_response(response)
+
+            with self._lock:
+                checkpoint["done"].append(index)
+                self._save_checkpoint(file_path, checkpoint)
+                sent = sum(min(chunk_size, size - i * chunk_size) for i in checkpoint["done"])
+
+            if progress is not None:
+                progress(sent, size)
+
+        with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+            # Raises the first chunk error (after all the other chunks have finished)
+            for _ in executor.map(upload_chunk, chunks):
+                pass
+
+        # Commit the upload
+        headers = {
+            "X-Upload-Id": checkpoint["upload_id"],
+            "Content-Range": "bytes */{}".format(size)
+        }
+        return self._check_response(self._post(session, upload_url, headers=headers))
+
+    def _upload_whole(self, session, file_path: str, file_name: str, upload_url: str, progress=None,
+                      throttle=None) -> dict:
+        """
+        Uploads the file with a single request (used when the host doesn't support chunked uploads). Every
+        attempt reports its progress from zero, the bytes sent again by a retry are not passed to 'throttle'.
+        """
+
+        size = os.path.getsize(file_path)
+
+        # Bytes already passed to the throttle function by the previous attempts
+        throttled = [0]
+
+        def send():
+            read = [0]
+
+            def attempt_progress(bytes_read, _):
+                # The body is bigger than the file (multipart headers)
+                progress(min(bytes_read, size), size)
+
+            def attempt_throttle(amount):
+                read[0] += amount
+
+                if read[0] > throttled[0]:
+                    throttle(read[0] - throttled[0])
+                    throttled[0] = read[0]
+
+            if progress is not None:
+                progress(0, size)
+
+            with open(file_path, 'rb') as upload_file:
+                data = self.monitor(
+                    MultipartEncoder({"files": (file_name, upload_file, "application/octet-stream")}),
+                    progress=attempt_progress if progress is not None else None,
+                    throttle=attempt_throttle if throttle is not None else None
+                )
+
+                headers = {"Prefer": "respond-async", "Content-Type": data.content_type}
+                return session.post(upload_url, headers=headers, data=data, timeout=self.TIMEOUT)
+
+        return self._check_response(self._retry(send))
+
+    @staticmethod
+    def monitor(data: MultipartEncoder, progress=None, throttle=None):
+        """
+        Adds the progress and throttle functions to a multipart body (they are called while the body is sent).
+
+        :param data: MultipartEncoder object.
+        :param progress: (Optional, Default=None) Function called with (bytes sent, body size).
+        :param throttle: (Optional, Default=None) Function called with the number of bytes read from the body.
+        :return: MultipartEncoderMonitor object (or 'data' if there aren't functions).
+        """
+
+        if progress is None and throttle is None:
+            return data
+
+        sent = [0]
+
+        def callback(monitor):
+            if throttle is not None:
+                throttle(monitor.bytes_read - sent[0])
+                sent[0] = monitor.bytes_read
+
+            if progress is not None:
+                progress(monitor.bytes_read, monitor.len)
+
+        return MultipartEncoderMonitor(data, callback)
+
+    def _post(self, session, url, **kwargs):
+        """
+        Sends a POST request, retrying it if the connection fails or the server returns an error (5xx).
+        """
+
+        return self._retry(lambda: session.post(url, timeout=self.TIMEOUT, **kwargs))
+
+    def _retry(self, send):
+        """
+        Calls 'send' until it returns a response without server errors, waiting more time after every failure.
+        """
+
+        for attempt in range(1, self.RETRIES + 1):
+            try:
+                response = send()
+
+                if response.status_code < 500:
+                    return response
+
+                print("[ChunkedUploader] Server error {} (attempt {}/{})".format(
+                    response.status_code, attempt, self.RETRIES)
+                )
+                if attempt == self.RETRIES:
+                    return response
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as ex:
+                print("[ChunkedUploader] Connection error (attempt {}/{}):".format(attempt, self.RETRIES), str(ex))
+                if attempt == self.RETRIES:
+                    raise
+
+            time.sleep(min(2 ** attempt, 30))
+
+    def _check_response(self, response) -> dict:
+        """
+        Checks the status of the JSON response using the uploader checks.
+
+        :return: Uploaded file information.
+        """
+
+        response_json = response.json()
+        self.uploader._check_status(response_json)
+        return response_json['result']
+
+    def _load_checkpoint(self, file_path: str, size: int):
+        """
+        :return: Saved checkpoint of the file or None if there isn't a valid checkpoint (missing or file changed).
+        """
+
+        try:
+            with open(file_path + self.CHECKPOINT_EXTENSION) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if "upload_id" not in checkpoint or checkpoint.get("chunk_size") != self.CHUNK_SIZE:
+            print("[ChunkedUploader] Checkpoint not compatible, starting a new upload")
+            return None
+
+        if checkpoint.get("size") != size or checkpoint.get("mtime") != os.path.getmtime(file_path):
+            print("[ChunkedUploader] File changed since the last checkpoint, starting a new upload")
+            return None
+
+        return checkpoint
+
+    def _save_checkpoint(self, file_path: str, checkpoint: dict):
+        with open(file_path + self.CHECKPOINT_EXTENSION, 'w') as f:
+            json.dump(checkpoint, f)
+
+    def _remove_checkpoint(self, file_path: str):
+        try:
+            os.remove(file_path + self.CHECKPOINT_EXTENSION)
+        except OSError:
+            pass
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+
+from classes.urlchecker import UrlChecker
+
+
+class DedupIndex:
+    """
+    This class remembers the videos already uploaded, so a video requested again is not downloaded and uploaded
+    again: the stored uploader response and thumbnail are sent to the user immediately.
+
+    Every uploaded video is indexed by its canonical URLs, its Youtube-DL video ids ("<extractor>:<id>") and
+    the SHA-1 hash of its content (the same video downloaded from another URL is not uploaded again).
+    The index is saved in a JSON file.
+    """
+
+    def __init__(self, file_path="dedup.json"):
+        """
+        Parametrized constructor method.
+
+        :param file_path: (Optional, Default=dedup.json) JSON file where the index is saved.
+        """
+
+        self.file_path = file_path
+        self._lock = threading.Lock()
+
+        # <entry id>: entry dict (uploader, response, thumbnail, urls, video_ids, sha1, size, time)
+        self._entries = {}
+
+        # Lookups: <key>: entry id
+        self._by_url = {}
+        self._by_video_id = {}
+        self._by_sha1 = {}
+
+        self._load()
+
+    def find(self, uploader: str, url=None, video_id=None, sha1=None):
+        """
+        Searches an uploaded video.
+
+        :param uploader: Name of the uploader (the responses of another uploader are not valid).
+        :param url: (Optional, Default=None) Video url.
+        :param video_id: (Optional, Default=None) Youtube-DL video id ("<extractor>:<id>").
+        :param sha1: (Optional, Default=None) SHA-1 hash of the video file.
+        :return: Entry dict (response, thumbnail, ...) or None if the video has not been uploaded.
+        """
+
+        with self._lock:
+            lookups = (
+                (self._by_url, UrlChecker.normalize(url) if url is not None else None),
+                (self._by_video_id, video_id),
+                (self._by_sha1, sha1)
+            )
+
+            for lookup, key in lookups:
+                entry = self._entries.get(lookup.get(key)) if key is not None else None
+
+                if entry is not None and entry["uploader"] == uploader:
+                    return dict(entry)
+
+            return None
+
+    def add(self, uploader: str, response: dict, thumbnail=None, url=None, video_id=None, sha1=None, size=None):
+        """
+        Adds an uploaded video to the index (or adds the new url/id/hash to the entry of the same video).
+
+        :param uploader: Name of the uploader.
+        :param response: Uploader response (uploaded file information).
+        :param thumbnail: (Optional, Default=None) Thumbnail dict: {"data": url or local path, "local": bool}.
+        :param url: (Optional, Default=None) Video url.
+        :param video_id: (Optional, Default=None) Youtube-DL video id ("<extractor>:<id>").
+        :param sha1: (Optional, Default=None) SHA-1 hash of the video file.
+        :param size: (Optional, Default=None) Size of the video file in bytes.
+        """
+
+        url = UrlChecker.normalize(url) if url is not None else None
+
+        with self._lock:
+            # Same content or same uploaded file
+            entry_id = self._by_sha1.get(sha1) if sha1 is not None else None
+            if entry_id is None and response.get("id") is not None:
+                entry_id = "{}:{}".format(uploader, response["id"])
+
+            entry = self._entries.get(entry_id)
+
+            if entry is None or entry["uploader"] != uploader:
+                entry_id = "{}:{}".format(uploader, response.get("id") or sha1 or time.time())
+                entry = self._entries[entry_id] = {
+                    "uploader": uploader,
+                    "response": response,
+                    "thumbnail": thumbnail,
+                    "urls": [],
+                    "video_ids": [],
+                    "sha1": sha1,
+                    "size": size,
+                    "time": time.time()
+                }
+
+            if sha1 is not None and entry["sha1"] is None:
+                entry["sha1"] = sha1
+
+            if thumbnail is not None and entry["thumbnail"] is None:
+                entry["thumbnail"] = thumbnail
+
+            if url is not None and url not in entry["urls"]:
+                entry["urls"].append(url)
+
+            if video_id is not None and video_id not in entry["video_ids"]:
+                entry["video_ids"].append(video_id)
+
+            self._index(entry_id, entry)
+            self._save()
+
+    def remove(self, entry: dict):
+        """
+        Removes a video from the index (ex: the uploaded file has been deleted).
+
+        :param entry: Entry returned by 'find'.
+        """
+
+        with self._lock:
+            for entry_id, saved in list(self._entries.items()):
+                if saved["response"] == entry["response"]:
+                    del self._entries[entry_id]
+
+            self._rebuild()
+            self._save()
+
+    def _index(self, entry_id: str, entry: dict):
+        for url in entry["urls"]:
+            self._by_url[url] = entry_id
+
+        for video_id in entry["video_ids"]:
+            self._by_video_id[video_id] = entry_id
+
+        if entry["sha1"] is not None:
+            self._by_sha1[entry["sha1"]] = entry_id
+
+    def _rebuild(self):
+        self._by_url, self._by_video_id, self._by_sha1 = {}, {}, {}
+
+        for entry_id, entry in self._entries.items():
+            self._index(entry_id, entry)
+
+    def _load(self):
+        if not os.path.exists(self.file_path):
+            return
+
+        try:
+            with open(self.file_path) as file:
+                self._entries = json.load(file)
+
+            self._rebuild()
+            print("[DedupIndex] Loaded {} uploaded videos".format(len(self._entries)))
+
+        except (OSError, ValueError) as ex:
+            print("[DedupIndex] Can't read the index, starting with an empty one:", str(ex))
+            self._entries = {}
+
+    def _save(self):
+        # Write a temporary file and replace the index, so a crash never leaves a truncated index
+        temp_path = self.file_path + ".tmp"
+
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(self._entries, file)
+
+            os.replace(temp_path, self.file_path)
+
+        except (OSError, TypeError, ValueError) as ex:
+            print("[DedupIndex] Can't save the index:", str(ex))
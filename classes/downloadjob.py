@@ -0,0 +1,149 @@
+import itertools
+
+from classes.jobstore import JobStore
+from classes.metrics import Metrics
+from classes.notifiergroup import NotifierGroup
+from classes.span import Span
+from classes.urlchecker import UrlChecker
+
+
+class DownloadJob:
+    """
+    This class describes a single download job handled by the JobScheduler: the DownloadManager that will
+    process the request and the options used to start the download.
+    """
+
+    # Job status
+    QUEUED, RUNNING, FINISHED, CANCELLED = "queued", "running", "finished", "cancelled"
+
+    # Used to generate unique job ids
+    _ID_COUNTER = itertools.count(1)
+
+    def __init__(self, manager, download_kwargs: dict, priority=0):
+        """
+        Parametrized constructor method.
+
+        :param manager: DownloadManager object that will process the user request.
+        :param download_kwargs: Arguments passed to 'DownloadManager.download_file' when the job starts.
+        :param priority: (Optional, Default=0) Job priority, jobs with a lower value are started first.
+        """
+
+        self.id = next(self._ID_COUNTER)
+        self.manager = manager
+        self.download_kwargs = download_kwargs
+        self.priority = priority
+        self.status = self.QUEUED
+
+        # Thread that runs the job (set by the JobScheduler when the job starts)
+        self.thread = None
+
+        # Job that downloads the same video for this job (set by the JobScheduler when the jobs are coalesced)
+        self.leader = None
+
+    def run(self):
+        """
+        Starts the download process. This method is called by the JobScheduler worker.
+        """
+
+        span = self.manager.start_span("job", url=self.get_url())
+
+        try:
+            result = self.manager.download_file(**self.download_kwargs)
+
+            if result is not True:
+                print("[DownloadJob] Job {} failed".format(self.id))
+                if isinstance(result, str):
+                    # Error message not sent yet (ex: overwrite check)
+                    self.get_notifier().notify_error(result)
+
+                span.finish(Span.ERROR)
+                self.manager.set_job_status(JobStore.FAILED)
+                return
+
+            self.manager.set_job_status(JobStore.FINISHED)
+            span.finish()
+
+        except SystemExit:
+            # Killed by the JobScheduler ('/stop')
+            self.manager.set_job_status(JobStore.CANCELLED)
+            span.finish("cancelled")
+            raise
+
+        except Exception as ex:
+            Metrics.count_error(ex)
+            span.set(error=type(ex).__name__)
+            span.finish(Span.ERROR)
+            print("[DownloadJob] Job {} failed with an error of type {}:".format(self.id, type(ex).__name__), str(ex))
+            self.get_notifier().notify_error("Detected an error while processing the download: " + str(ex))
+            self.manager.set_job_status(JobStore.FAILED)
+
+    def get_notifier(self):
+        """
+        :return: Notifier object of the user that requested the download.
+        """
+
+        return self.manager.notifier
+
+    def get_user_id(self):
+        """
+        :return: Chat id of the user that requested the download.
+        """
+
+        return self.manager.notifier.get_chat_id()
+
+    def get_user_ids(self) -> list:
+        """
+        :return: Chat ids of all the users that receive the result of this job.
+        """
+
+        if isinstance(self.manager.notifier, NotifierGroup):
+            return self.manager.notifier.get_chat_ids()
+
+        return [self.get_user_id()]
+
+    def can_coalesce(self) -> bool:
+        """
+        :return: True if other users can receive the result of this job (requests for the same video).
+        """
+
+        return isinstance(self.manager.notifier, NotifierGroup)
+
+    def get_key(self):
+        """
+        :return: Key that identifies the requested video and the download options (jobs with the same key
+        produce the same result).
+        """
+
+        return (
+            UrlChecker.normalize(self.get_url()),
+            self.download_kwargs.get("new_download_method"),
+            self.download_kwargs.get("convert_to_mp4")
+        )
+
+    def attach(self, job):
+        """
+        Adds the users of another job for the same video to this job: they will receive the same messages,
+        upload result and thumbnail.
+
+        :param job: DownloadJob object that will not be executed.
+        """
+
+        job.leader = self
+        self.manager.add_subscriber(job.get_notifier())
+
+    def detach(self, user_id) -> bool:
+        """
+        Removes a user from this job (the job continues for the other users).
+
+        :param user_id: Chat id of the user.
+        :return: True if the user has been removed, False if it's the only user of the job.
+        """
+
+        return self.manager.remove_subscriber(user_id)
+
+    def get_url(self):
+        """
+        :return: Url of the requested resource.
+        """
+
+        return self.manager.download_req.url
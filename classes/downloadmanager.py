@@ -1,20 +1,34 @@
 import datetime
 import os
+import sqlite3
+import threading
 import urllib.parse
-import urllib.request
 from io import BytesIO
 
-import kthread
 import requests
 import youtube_dl
 from openload.api_exceptions import *
 from tqdm import tqdm
 
+from classes.asyncruntime import AsyncRuntime
+from classes.bandwidthgovernor import BandwidthGovernor
 from classes.downloadrequest import DownloadRequest
+from classes.filehasher import FileHasher
+from classes.fragmentdownloader import FragmentDownloader
+from classes.jobstore import JobStore
+from classes.metadatacache import MetadataCache
+from classes.metrics import Metrics
 from classes.notifier import Notifier
+from classes.notifiergroup import NotifierGroup
 from classes.openloadwrapper import OpenloadWrapper
 from classes.previewgenerator import PreviewGenerator
+from classes.progressmessage import ProgressMessage
+from classes.segmenteddownloader import SegmentedDownloader
+from classes.span import Span
+from classes.streamingupload import StreamingUpload
+from classes.thumbnailpoller import ThumbnailPoller
 from classes.telegrambot import TelegramBot
+from classes.tracer import Tracer
 
 
 class DownloadManager:
@@ -35,7 +49,10 @@ class DownloadManager:
     VS = None
 
     # Constructor method. It saves into an attribute the requested resource.
-    def __init__(self, download_req: DownloadRequest, notifier: Notifier, uploader, online_thumbnail=False):
+    def __init__(self, download_req: DownloadRequest, notifier: Notifier, uploader, online_thumbnail=False,
+                 pipelined_upload=False, progress_interval=3.0, preview_generator=None, metadata_cache=None,
+                 dedup_index=None, job_store=None, job_id=None, resume_state=None, download_segments=4,
+                 concurrent_fragments=4, bandwidth_governor=None, thumbnail_poller=None, tracer=None):
         """
         Parametrized constructor method.
 
@@ -43,11 +60,82 @@ class DownloadManager:
         :param notifier: Notifer object that will be used to notify the user (send messages)
         :param uploader: OpenloadWrapper or VeryStreamWrapper object that will be used to upload
         the video on Openload.co or VeryStream.com website
+        :param pipelined_upload: (Optional, Default=False) If it's true the upload starts while Youtube-DL is still
+        downloading the video (not supported with the MP4 conversion).
+        :param progress_interval: (Optional, Default=3) Min number of seconds between two updates of the
+        progress message.
+        :param preview_generator: (Optional, Default=None) PreviewGenerator (or WorkerPool) object used to generate
+        the preview when the online thumbnail is disabled (if it's None a default one will be created).
+        :param metadata_cache: (Optional, Default=None) MetadataCache object used to reuse the metadata extracted
+        by Youtube-DL (if it's None the metadata is always extracted).
+        :param dedup_index: (Optional, Default=None) DedupIndex object used to skip the videos already uploaded
+        (if it's None every video is downloaded and uploaded).
+        :param job_store: (Optional, Default=None) JobStore object where the job state is saved.
+        :param job_id: (Optional, Default=None) Id of the job in the JobStore.
+        :param resume_state: (Optional, Default=None) Saved state of a job interrupted by a restart (JobStore row),
+        the job continues from its last stage.
+        :param download_segments: (Optional, Default=4) Max number of connections used to download a file with
+        the old download method.
+        :param concurrent_fragments: (Optional, Default=4) Number of fragments of HLS/DASH videos downloaded at the
+        same time by Youtube-DL (1 to download them one at a time).
+        :param bandwidth_governor: (Optional, Default=None) BandwidthGovernor object that shares the bandwidth
+        between the jobs (if it's None the transfers are not limited).
+        :param thumbnail_poller: (Optional, Default=None) ThumbnailPoller object that waits for the online
+        thumbnails (if it's None a default one will be created).
+        :param tracer: (Optional, Default=None) Tracer object that writes the spans of the job in the trace log
+        (if it's None the job is not traced).
         """
 
         self.download_req = download_req
         self.notifier = notifier
         self.online_thumbnail = online_thumbnail
+        self.preview_generator = preview_generator if preview_generator is not None else PreviewGenerator()
+        self.pipelined_upload = pipelined_upload
+        self.metadata_cache = metadata_cache
+        self.dedup_index = dedup_index
+        self.convert_to_mp4 = False
+
+        # Hash of the downloaded file (computed while it's written) and Youtube-DL video id, used by the dedup index
+        self.hasher = FileHasher()
+        self.video_id = None
+
+        # Video duration in seconds (from the Youtube-DL metadata), used to predict the online thumbnail time
+        self.video_duration = None
+
+        # Thumbnail of the video (data, local), sent again to the users attached later
+        self.thumbnail = None
+
+        # The online thumbnail is waited in background, the job finishes when it's ready
+        self.thumbnail_poller = thumbnail_poller if thumbnail_poller is not None else ThumbnailPoller()
+        self.thumbnail_pending = False
+
+        # Saved job state
+        self.job_store = job_store
+        self.job_id = job_id
+        self.resume_state = resume_state
+
+        self.download_segments = download_segments
+        self.concurrent_fragments = concurrent_fragments
+
+        # Bandwidth channel of the running download (Youtube-DL bytes are counted by the download hook)
+        self.bandwidth_governor = bandwidth_governor
+        self.download_channel = None
+        self.hook_downloaded = 0
+
+        # Single message that shows the job progress
+        self.progress = ProgressMessage(notifier, interval=progress_interval)
+
+        # Trace of the job (the url check span is written by the wizard with the same id)
+        self.tracer = tracer
+        self.trace_id = download_req.trace_id or Tracer.new_trace_id()
+        self.download_span = None
+        self.convert_span = None
+
+        # Pipelined upload state (StreamingUpload object, upload thread and its result)
+        self.stream = None
+        self.stream_thread = None
+        self.stream_response = None
+        self.stream_error = None
 
         if isinstance(uploader, OpenloadWrapper):
             print("[DownloadManager] Detected OpenLoad uploader")
@@ -59,6 +147,9 @@ class DownloadManager:
         ''' Create progress bar (used with the old download method) '''
         self.bar = None
 
+        # Path (without extension) of the file that will be downloaded, used to clean up a cancelled download
+        self.output_path = None
+
     def download_file(self, save_path, overwrite_check=False, automatic_filename=False, new_download_method=True,
                       convert_to_mp4=False):
 
@@ -84,10 +175,17 @@ class DownloadManager:
         This option is supported only using the new download method and it requires ffmpeg installed on the system.
         (WARNING: This video conversion can comport bad video quality and/or video/audio dystrosions)
 
-        :return: True if the download process finished successful otherwise a string object containing the error message.
+        :return: True if the download process finished successful, False if it failed (the error has already been
+        sent to the user) otherwise a string object containing the error message.
         """
 
         try:
+            # The time spent in the job queue is not part of the download
+            self.progress.reset_timer()
+
+            if self.resume_state is not None and self._resume():
+                return True
+
             if not new_download_method:
                 self.notifier.notify_warning(
                     "You are using the old download method, this method does\
@@ -110,17 +208,36 @@ class DownloadManager:
                 ''' Normalize the name (only numbers and letters) '''
                 filename = self._normalize_filename(filename) + self._get_file_extension(self.download_req.url)
 
-                ''' Build path '''
-                full_path = os.path.join(save_path, filename)
+                ''' Build path (a resumed job uses the same path) '''
+                full_path = self._get_resumed_path() or os.path.join(save_path, filename)
+                filename = os.path.basename(full_path)
+                self.output_path = full_path
+                self._record(output_path=full_path)
 
-                ''' Check for overwrite if it's enabled '''
-                if overwrite_check:
+                ''' Check for overwrite if it's enabled (a resumed job overwrites its own file) '''
+                if overwrite_check and self.resume_state is None:
                     print("[!] Starting overwrite check")
                     if not self.overwrite_check(save_path, filename):
                         return "[Overwrite] Error, with this filename you will overwrite a file"
 
-                # Connects to the site and download the media
-                urllib.request.urlretrieve(self.download_req.url, full_path, self.download_progress)
+                if self._send_duplicate(url=self.download_req.url):
+                    return True
+
+                # Connects to the site and download the media (more connections if the server supports ranges)
+                self.download_channel = self._open_channel(BandwidthGovernor.DOWNLOAD)
+                downloader = SegmentedDownloader(
+                    segments=self.download_segments,
+                    throttle=self.download_channel.consume if self.download_channel is not None else None
+                )
+
+                try:
+                    with self.start_span("download", method="segmented") as span:
+                        self.TOT_DOWNLOADED = downloader.download(
+                            self.download_req.url, full_path, progress=self.download_progress
+                        )
+                        span.add_bytes(self.TOT_DOWNLOADED)
+                finally:
+                    self._close_channel(self.download_channel)
 
                 # Uploads the video on OpenLoad
                 self._handle_download_finished(full_path, self.TOT_DOWNLOADED)
@@ -136,30 +253,22 @@ class DownloadManager:
                 You are using the new download system witch supports a lot of websites,\
                 <a href='https://ytdl-org.github.io/youtube-dl/supportedsites.html'>view the full list </a>.")
 
-                print("[DownloadManager] Starting download in another thread")
+                if self._send_duplicate(url=self.download_req.url):
+                    return True
 
-                download_process = kthread.KThread(
-                    target=self._download,
-                    args=(save_path, self.download_req, automatic_filename, convert_to_mp4,)
-                )
-
-                # download_process.daemon = True
-                download_process.start()
-
-                print("[DownloadManager] Download started in another thread: {}".format(download_process))
-
-                # Add process to the list of processes
-                TelegramBot.DOWNLOAD_PROCESSES[TelegramBot.get_user_id(self.notifier.get_session())] = download_process
-
-                # self._download(save_path, self.download_req, automatic_filename, convert_to_mp4=convert_to_mp4)
+                # The JobScheduler already runs this method in a worker thread
+                if not self._download(save_path, self.download_req, automatic_filename, convert_to_mp4=convert_to_mp4):
+                    return False
 
             # self.wait_download_to_finish()
             return True
 
         except FileNotFoundException as f:
             # If the directory where is going to save the file doesn't exists
+            Metrics.count_error(f)
             print("[Downloader] Error of type {} while downloading file:".format(type(f).__name__), str(f))
             self.notifier.notify_error("Detected an error while downloading the resource: " + str(f))
+            return False
 
     def _download(self, save_path: str, download_request: DownloadRequest, automatic_filename: bool,
                   convert_to_mp4=False):
@@ -178,20 +287,40 @@ class DownloadManager:
         videos to mp4 format, otherwise the video file will not be converted after the download.
         This option is supported only using the new download method and it requires ffmpeg installed on the system.
         (WARNING: This video conversion can comport bad video quality and/or video/audio dystrosions)
+
+        :return: True if the video has been downloaded (or it was already uploaded), False if Youtube-DL failed.
         """
 
+        self.convert_to_mp4 = convert_to_mp4
+
         # Base downloader options
         ydl_opts = {
             'progress_hooks': [self.download_hook],
             'logger': DownloaderLogger(self.notifier),
         }
 
-        if automatic_filename:
+        if self.concurrent_fragments > 1:
+            # HLS/DASH fragments are downloaded by more threads
+            FragmentDownloader.register()
+            ydl_opts.update({
+                'concurrent_fragment_downloads': self.concurrent_fragments,
+                # The fragment batches are written in the trace of the job
+                'trace_span': self.start_span,
+            })
+
+        if self._get_resumed_path() is not None:
+            # Same output template of the interrupted job, Youtube-DL continues the '.part' file
+            full_path = self._get_resumed_path()
+            self.output_path = full_path + "."
+            ydl_opts.update({'outtmpl': full_path + ".%(ext)s"})
+
+        elif automatic_filename:
             ''' It will save the file with a unique filename based on the computer time (date and hour) '''
             filename = datetime.datetime.now().strftime("%m%d%Y-%H%M%S")
 
             # Add output format
             full_path = os.path.join(save_path, filename)
+            self.output_path = full_path + "."
             ydl_opts.update({'outtmpl': full_path + ".%(ext)s"})
 
         else:
@@ -201,8 +330,11 @@ class DownloadManager:
 
             # Add output format
             full_path = os.path.join(save_path, download_request.filename)
+            self.output_path = full_path + "."
             ydl_opts.update({'outtmpl': full_path + ".%(ext)s"})
 
+        self._record(output_path=full_path)
+
         if convert_to_mp4:
             self.notifier.notify_error(
                 "MP4 conversion has a bug. It will upload on OpenLoad and then will convert the video...\
@@ -214,23 +346,115 @@ class DownloadManager:
                 'preferedformat': 'mp4',
             }]})
 
+            if self.pipelined_upload:
+                self.notifier.notify_warning("Pipelined upload is not supported with the MP4 conversion, disabled.")
+                self.pipelined_upload = False
+
+        if self.pipelined_upload:
+            self.notifier.notify_warning(
+                "Pipelined upload enabled: downloading the best single-file format, it can have a lower quality\
+                than the best video and audio streams merged."
+            )
+
+            # The uploader reads the file while it's written: Youtube-DL has to write directly the final file
+            # (no '.part' file to rename) and must not merge or fix it after the download.
+            ydl_opts.update({
+                'format': 'best',
+                'nopart': True,
+                'fixup': 'never',
+            })
+
         # Start download
         print("[Youtube-DL] generated config:")
         print(ydl_opts)
 
         try:
             with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([download_request.url])
+                # Youtube-DL reads the rate limit before every block, so the share is applied immediately
+                self.download_channel = self._open_channel(
+                    BandwidthGovernor.DOWNLOAD,
+                    on_share=lambda share: ydl.params.update({'ratelimit': share or None})
+                )
+
+                if self.metadata_cache is not None:
+                    if not self._download_cached(ydl, download_request.url):
+                        # Already uploaded: the previous upload has been sent, nothing has been downloaded
+                        return True
+                else:
+                    # The extraction is part of the download
+                    self.download_span = self.start_span("download", method="youtube-dl", extract=True)
+                    ydl.download([download_request.url])
+
+                if self.convert_span is not None:
+                    self.convert_span.finish()
 
                 self.DOWNLOAD_FINISHED = True
                 print("[Downloader] File named {} saved correctly".format(full_path))
                 self.notifier.notify_success("File downloaded correctly with Youtube-DL!.")
+                return True
 
         except youtube_dl.utils.DownloadError as err:
-            print("[Youtube-DL] Error detected: " + err.exc_info)
+            Metrics.count_error(err)
+            print("[Youtube-DL] Error detected: " + str(err.exc_info))
+
+            for span in (self.download_span, self.convert_span):
+                if span is not None:
+                    span.set(error=type(err).__name__)
+                    span.finish(Span.ERROR)
 
-        # Remove index from download process
-        del TelegramBot.DOWNLOAD_PROCESSES[TelegramBot.get_user_id(self.notifier.get_session())]
+            # Interrupt the pipelined upload (if started)
+            if self.stream is not None:
+                self.stream.abort()
+
+            # The error has already been sent to the user by the DownloaderLogger
+            return False
+
+        finally:
+            self._close_channel(self.download_channel)
+
+    def _download_cached(self, ydl, url: str) -> bool:
+        """
+        This method downloads a video using the cached metadata (extracted only if it's not cached).
+        If the download with cached metadata fails (ex: expired video links) the metadata is extracted again.
+
+        :param ydl: YoutubeDL object used for the download.
+        :param url: Video url.
+        :return: True if the video has been downloaded, False if it has been skipped (already uploaded).
+        """
+
+        cached = self.metadata_cache.get(url)
+
+        with self.start_span("extract", cached=cached is not None):
+            info = cached if cached is not None else self.metadata_cache.extract_info(ydl, url)
+
+        self.video_duration = info.get("duration")
+
+        # The extraction is measured by the MetadataCache
+        self.progress.reset_timer()
+        self.download_span = self.start_span("download", method="youtube-dl")
+
+        if info.get("extractor_key") and info.get("id"):
+            self.video_id = "{}:{}".format(info["extractor_key"], info["id"])
+
+            if self._send_duplicate(video_id=self.video_id):
+                return False
+
+        size = MetadataCache.estimate_size(ydl, info)
+        if size is not None:
+            self.notifier.notify_information("Estimated video size: {}".format(ProgressMessage.format_bytes(size)))
+
+        try:
+            ydl.process_ie_result(info, download=True)
+
+        except youtube_dl.utils.DownloadError:
+            if cached is None:
+                raise
+
+            print("[DownloadManager] Download with cached metadata failed, extracting the metadata again")
+            self.metadata_cache.invalidate(url)
+            ydl.process_ie_result(self.metadata_cache.extract_info(ydl, url), download=True)
+
+        return True
 
     def download_hook(self, d):
         """
@@ -242,172 +466,579 @@ class DownloadManager:
         if d["status"] == 'finished':
             print("Finished downloading video. Now converting...")
             self.notifier.notify_information("Converting video...")
-            self._handle_download_finished(d['filename'], d["total_bytes"])
+
+            if self.convert_to_mp4:
+                self.progress.set_stage(ProgressMessage.CONVERT)
+
+            # The download share is given to the other jobs during the upload
+            self._close_channel(self.download_channel)
+
+            if self.download_span is not None:
+                self.download_span.finish()
+
+            if self.stream is not None:
+                self._handle_download_finished(d['filename'], d.get("total_bytes"), response=self._finish_stream())
+            else:
+                self._handle_download_finished(d['filename'], d.get("total_bytes"))
+
+            if self.convert_to_mp4:
+                # Youtube-DL converts the video after this hook
+                self.convert_span = self.start_span("convert", format="mp4")
 
         elif d["status"] == 'downloading':
             print(d['filename'], d['_percent_str'], d['_eta_str'])
 
+            self.progress.update(
+                d.get('downloaded_bytes'),
+                d.get('total_bytes') or d.get('total_bytes_estimate'),
+                d.get('speed'),
+                d.get('eta')
+            )
+
+            if self.pipelined_upload and self.stream is None:
+                self._start_stream(d.get('tmpfilename') or d['filename'])
+
+            # Count the downloaded bytes in the live rate (a new file of the same video starts from 0)
+            downloaded = d.get('downloaded_bytes') or 0
+            if self.download_channel is not None:
+                self.download_channel.record(downloaded - self.hook_downloaded)
+            if self.download_span is not None and downloaded > self.hook_downloaded:
+                self.download_span.add_bytes(downloaded - self.hook_downloaded)
+            self.hook_downloaded = downloaded
+
+            # Hash the downloaded bytes for the dedup index (read at most once every block, while they are still
+            # cached by the OS)
+            if self.dedup_index is not None:
+                self.hasher.update(d.get('tmpfilename') or d['filename'], min_bytes=FileHasher.BLOCK_SIZE)
+
         elif d['status'] == 'error':
             print("[Download Hook] Detected an error")
+
+            if self.stream is not None:
+                self.stream.abort()
         else:
             print("[Download Hook] Unknown download status")
 
-    def download_progress(self, block_size, total_size):
+    def download_progress(self, downloaded, total_size):
         """
-        Download hook for the old download method. It shows a progress bar using "tqdm" library.
+        Download hook for the old download method (SegmentedDownloader progress). It shows a progress bar using
+        "tqdm" library and updates the progress message.
 
-        :param block_size: Downloaded bytes.
-        :param total_size: Total size of the file.
+        :param downloaded: Number of bytes downloaded (all the segments).
+        :param total_size: Total size of the file (None if the server doesn't send it).
         """
 
         if self.bar is None:
             self.bar = tqdm(total=total_size, unit="b", unit_scale=True, dynamic_ncols=True)
 
         # Update progress bar
-        self.bar.update(block_size)
+        self.bar.update(downloaded - self.TOT_DOWNLOADED)
         self.bar.refresh()
+        self.TOT_DOWNLOADED = downloaded
+
+        # Notify user (the segments are written at their offsets in a preallocated file, so the file is hashed
+        # after the download)
+        self.progress.update(downloaded, total_size)
+
+    def _start_stream(self, file_path: str):
+        """
+        This method starts the pipelined upload: the file is uploaded in another thread while it's downloaded.
+
+        :param file_path: File written by Youtube-DL.
+        """
+
+        print("[DownloadManager] Starting pipelined upload of {}".format(file_path))
+        self.notifier.notify_information("Uploading the video while it's downloaded...")
+
+        channel = self._open_channel(BandwidthGovernor.UPLOAD)
+        self.stream = StreamingUpload(file_path, throttle=channel.consume if channel is not None else None)
+
+        def upload():
+            span = self.start_span("upload", uploader=self._get_uploader_name(), pipelined=True)
+
+            try:
+                uploader = self.VS if self.VS is not None else self.OL
+                self.stream_response = uploader.upload_stream(self.stream, os.path.basename(file_path))
+                span.add_bytes(self.stream.bytes_read)
+                span.finish()
+            except Exception as ex:
+                Metrics.count_error(ex)
+                self.stream_error = ex
+                span.set(error=type(ex).__name__)
+                span.finish(Span.ERROR)
+            finally:
+                self._close_channel(channel)
+
+        self.stream_thread = threading.Thread(target=upload, name="PipelinedUpload")
+        self.stream_thread.daemon = True
+        self.stream_thread.start()
+
+    def _finish_stream(self):
+        """
+        This method waits the end of the pipelined upload.
+
+        :return: Uploader response or None if the pipelined upload failed (the file will be uploaded again).
+        """
+
+        self.stream.finish()
+        self.stream_thread.join()
+
+        if self.stream_error is not None:
+            print("[DownloadManager] Pipelined upload failed:", str(self.stream_error))
+            self.notifier.notify_warning("The upload during the download failed, uploading the downloaded file...")
+            return None
+
+        print("[DownloadManager] Pipelined upload finished and returned a response")
+        print(self.stream_response)
+        return self.stream_response
+
+    def _upload_file(self, file_path: str) -> dict:
+        """
+        This method uploads the downloaded video on VeryStream.com or OpenLoad.co (it depends on the uploader).
+
+        :param file_path: File to upload.
+        :return: Uploader response (uploaded file information) as Dict object.
+        """
+
+        self.progress.set_stage(ProgressMessage.UPLOAD)
+
+        # The upload speed is limited by the bandwidth governor (if set)
+        channel = self._open_channel(BandwidthGovernor.UPLOAD)
+        throttle = channel.consume if channel is not None else None
+
+        response = ""
+        try:
+            with self.start_span("upload", uploader=self._get_uploader_name()) as span:
+                if self.VS is not None:
+                    # If is set the VeryStream uploader, it will upload the video on VeryStream.com
+                    self.notifier.notify_information(
+                        "Uploading file to VeryStream.com, this will take some time "
+                        "(depends from file size and internet upload speed)"
+                    )
+
+                    response = self.VS.upload_file(file_path, progress=self.progress.update, throttle=throttle)
+                    print("[DownloadManager] Video uploaded on VeryStream.com and returned a response")
+                    print(response)
+
+                elif self.OL is not None:
+                    # Otherwise, if is set the OpenLoad uploader, it will upload the video on OpenLoad.co
+
+                    self.notifier.notify_information(
+                        "Uploading file to OpenLoad.com, this will take some time "
+                        "(depends from file size and internet upload speed)"
+                    )
+
+                    # Upload file to Openload
+                    response = self.OL.upload_file(file_path, progress=self.progress.update, throttle=throttle)
+                    print("[DownloadManager] Video uploaded on OpenLoad.co and returned a response")
+                    print(response)
 
-        # Notify user
+                span.add_bytes(os.path.getsize(file_path))
 
-        # Get current total
-        self.TOT_DOWNLOADED += block_size
-        temp = self.TOT_DOWNLOADED / total_size
-        percentage = temp * 100
+        finally:
+            self._close_channel(channel)
 
-        if percentage % 10 == 0:
-            # Notify user every 10% step
-            self.notifier.notify_information("Current download percentage: " + percentage)
+        return response
 
-    def _handle_download_finished(self, file_path: str, file_size: float):
+    def _handle_download_finished(self, file_path: str, file_size: float, response=None):
         """
         This method handles all the post-download process, so upload on OpenLoad the downloaded video
         and download the video thumbnail generated by OpenLoad.
 
         :param file_path: File downloaded, used for uploading the video on OpenLoad.co
         :param file_size: File size in bytes, used for estimate the video thumbnail generation by OpenLoad.co
+        :param response: (Optional, Default=None) Uploader response if the video has already been uploaded
+        (pipelined upload), otherwise the video will be uploaded now.
         """
 
         try:
-            response = ""
-            if self.VS is not None:
-                # If is set the VeryStream uploader, it will upload the video on VeryStream.com
-                self.notifier.notify_information(
-                    "Uploading file to VeryStream.com, this will take some time "
-                    "(depends from file size and internet upload speed)"
-                )
+            sha1 = self.hasher.finish(file_path) if self.dedup_index is not None else None
 
-                # response = self.VS.upload_file(file_path)
-                response = self.VS.upload_large_file(file_path)
-                print("[DownloadManager] Video uploaded on VeryStream.com and returned a response")
-                print(response)
+            if response is None:
+                if self._send_duplicate(sha1=sha1):
+                    os.remove(file_path)
+                    return
 
-            elif self.OL is not None:
-                # Otherwise, if is set the OpenLoad uploader, it will upload the video on OpenLoad.co
+                self._record(stage=JobStore.UPLOAD, file_path=file_path)
+                response = self._upload_file(file_path)
 
-                self.notifier.notify_information(
-                    "Uploading file to OpenLoad.com, this will take some time "
-                    "(depends from file size and internet upload speed)"
-                )
-
-                # Upload file to Openload
-                response = self.OL.upload_file(file_path)
-                print("[DownloadManager] Video uploaded on OpenLoad.co and returned a response")
-                print(response)
+            self._record(stage=JobStore.THUMBNAIL, file_path=file_path, response=response)
 
             self.notifier.notify_uploader_response(response)
+            upload_response = response
 
-            from classes.thumbnail import Thumbnail
+            # Thumbnail saved in the dedup index ({"data": url or local path, "local": bool})
+            thumbnail = None
 
             if self.online_thumbnail:
-                thumb_url = ""
-                if self.VS is not None:
-                    # Get thumbnail from VeryStrean
-                    self.notifier.notify_information("Wating VeryStream to generate a thumbnail...")
+                # The thumbnail is generated by the uploader: the ThumbnailPoller waits for it, so the worker
+                # thread is free right after the upload
+                self._poll_thumbnail(file_path, file_size, upload_response, sha1)
+                return
+
+            # Generate thumbnail using downloaded video
+            print("[DownloadManager] Generating thumbnail using video: {}".format(file_path))
+            self.progress.set_stage(ProgressMessage.PREVIEW)
+            generator = self.preview_generator
+            import cv2
+
+            try:
+                with self.start_span("preview") as span:
+                    response = generator.generate_preview(file_path, "thumbnails")
 
-                    thumb_url = self.VS.get_thumbnail_when_ready(response.get("id"), delay=60)
+                    if not response:
+                        span.finish("failed")
 
-                    # Checker
-                    while thumb_url is None:
-                        print("[DownloadManager] Invalid thumbnail (None), retry to get a thumbnail")
-                        thumb_url = self.OL.get_thumbnail_when_ready(response.get("id"), delay=5)
+                if not response:
+                    self.notifier.notify_error("Error while generating thumbnail...")
+                else:
+                    print("File path", response['path'])
 
-                    print("[DownloadManager] Got a thumbnail url from VeryStream.com:", thumb_url)
+                    self._save_thumbnail(response["path"], local=True)
+                    thumbnail = {"data": response["path"], "local": True}
 
-                else:
-                    # Get thumbnail from OpenLoad
-                    self.notifier.notify_information("Wating OpenLoad to generate a thumbnail...")
+                    self.notifier.notify_success(
+                        "I've generated a preview in {} seconds. to generate a caption use '/thumbnail' "
+                        "command.This will start a wizard, just follow the steps!".format(response["seconds"])
+                    )
+            except cv2.error as ex:
+                Metrics.count_error(ex)
+                print("[DownloadManager] Can't generate a preview.. Error message:", str(ex))
+                self.notifier.notify_error(
+                    "OpenCV cannot generate a proper thumbnail with this video... Ask the developer"
+                )
+            except (TimeoutError, RuntimeError) as ex:
+                # Raised by the WorkerPool (preview too slow or worker process died), the video is already uploaded
+                Metrics.count_error(ex)
+                print("[DownloadManager] Can't generate a preview.. Error message:", str(ex))
+                self.notifier.notify_error("I couldn't generate a thumbnail with this video in time...")
+
+            self._finish_job(file_path, upload_response, thumbnail, sha1)
+
+        except PermissionDeniedException as pde:
+            Metrics.count_error(pde)
+            self.notifier.notify_error("Permission denied detected while trying to upload data to openload:" + str(pde))
+            print("[DownloadManager] Permission denied detected while uploading video to openload: " + str(pde))
+
+    def _poll_thumbnail(self, file_path: str, file_size, response: dict, sha1=None):
+        """
+        This method waits in background for the thumbnail generated by VeryStream.com or OpenLoad.co. When the
+        thumbnail is ready (or the ThumbnailPoller stops waiting) it's sent to the user and the job is finished.
+
+        :param file_path: Uploaded file.
+        :param file_size: File size in bytes, used to predict when the thumbnail is ready.
+        :param response: Uploader response (uploaded file information).
+        :param sha1: (Optional, Default=None) SHA-1 hash of the file (saved in the dedup index).
+        """
 
-                    def get_thumbnail_estimated_generation_size(size: float):
+        uploader = self.VS if self.VS is not None else self.OL
+        site = "VeryStream.com" if self.VS is not None else "OpenLoad.co"
 
-                        if size is None:
-                            return None
-                        else:
-                            # Latest test: 4% every ~20.28s (File size: 424.46 MB) -> 4.2445 MB/s == 4450680.832 Byte/s
-                            BYTES_ANALYSED_EVERY_20_SEC = 4450681
-                            time = (size / BYTES_ANALYSED_EVERY_20_SEC) * 20
-                            return time
+        self.notifier.notify_information("Wating {} to generate a thumbnail...".format(site))
 
-                    estimated_time = get_thumbnail_estimated_generation_size(file_size)
+        # The first check is made when the thumbnail should be ready (learned from the previous videos)
+        host = self._get_uploader_name()
+        estimated_time = self.thumbnail_poller.predict(host, file_size, self.video_duration)
 
-                    if estimated_time is None:
-                        self.notifier.notify_warning("Can't estimate a thumbnail generation time...")
-                    else:
-                        self.notifier.notify_warning(
-                            "Estimated time for thumbnail generation {} seconds".format(estimated_time))
+        self.notifier.notify_information(
+            "Estimated time for thumbnail generation: {}".format(ProgressMessage.format_seconds(estimated_time))
+        )
 
-                    # thumb_url = self.OL.get_thumbnail_when_ready(response.get("id"), delay=estimated_time)
-                    thumb_url = self.OL.get_thumbnail_when_ready(response.get("id"), delay=60)
+        self.progress.set_stage(ProgressMessage.THUMBNAIL)
+        self.thumbnail_pending = True
 
-                    # Checker
-                    while thumb_url is None:
-                        print("[DownloadManager] Invalid thumbnail (None), retry to get a thumbnail")
-                        thumb_url = self.OL.get_thumbnail_when_ready(response.get("id"), delay=5)
+        span = self.start_span("thumbnail", uploader=host, estimated=round(estimated_time, 1))
 
-                    print("[DownloadManager] Got a thumbnail url from OpenLoad.co:", thumb_url)
+        def on_thumbnail(thumb_url):
+            thumbnail = None
+            span.finish(Span.OK if thumb_url is not None else "timeout")
 
-                TelegramBot.THUMBNAILS[TelegramBot.get_user_id(self.notifier.get_session())] = Thumbnail(thumb_url)
+            if thumb_url is None:
+                self.notifier.notify_warning("{} didn't generate the thumbnail in time, I stopped waiting.".format(site))
+            else:
+                print("[DownloadManager] Got a thumbnail url from {}:".format(site), thumb_url)
+
+                self._save_thumbnail(thumb_url, local=False)
+                thumbnail = {"data": thumb_url, "local": False}
 
                 self.notifier.notify_success(
                     "I found the thumbnail, to generate a caption use '/thumbnail' command. "
                     "This will start a wizard, just follow the steps!"
                 )
 
-            else:
+            self._finish_job(file_path, response, thumbnail, sha1)
 
-                # Generate thumbnail using downloaded video
-                print("[DownloadManager] Generating thumbnail using video: {}".format(file_path))
-                generator = PreviewGenerator()
-                import cv2
+            # The job thread has already returned: the job is finished here
+            self.thumbnail_pending = False
+            self.set_job_status(JobStore.FINISHED)
 
-                try:
-                    response = generator.generate_preview(file_path, "thumbnails")
+        self.thumbnail_poller.poll(
+            uploader, response.get("id"), on_thumbnail,
+            initial_delay=estimated_time, host=host, size=file_size, duration=self.video_duration
+        )
 
-                    if not response:
-                        self.notifier.notify_error("Error while generating thumbnail...")
-                    else:
-                        print("File path", response['path'])
+    def _finish_job(self, file_path: str, response: dict, thumbnail=None, sha1=None):
+        """
+        This method saves the uploaded video in the dedup index and deletes the downloaded file.
 
-                        TelegramBot.THUMBNAILS[TelegramBot.get_user_id(self.notifier.get_session())] = Thumbnail(
-                            response["path"],
-                            local=True
-                        )
+        :param file_path: Uploaded file.
+        :param response: Uploader response (uploaded file information).
+        :param thumbnail: (Optional, Default=None) Thumbnail dict: {"data": url or local path, "local": bool}.
+        :param sha1: (Optional, Default=None) SHA-1 hash of the file.
+        """
 
-                        self.notifier.notify_success(
-                            "I've generated a preview in {} seconds. to generate a caption use '/thumbnail' "
-                            "command.This will start a wizard, just follow the steps!".format(response["seconds"])
-                        )
-                except cv2.error as ex:
-                    print("[DownloadManager] Can't generate a preview.. Error message:", str(ex))
-                    self.notifier.notify_error(
-                        "OpenCV cannot generate a proper thumbnail with this video... Ask the developer"
-                    )
+        if self.dedup_index is not None:
+            self.dedup_index.add(
+                self._get_uploader_name(),
+                response,
+                thumbnail=thumbnail,
+                url=self.download_req.url,
+                video_id=self.video_id,
+                sha1=sha1,
+                size=os.path.getsize(file_path)
+            )
 
-            # Delete file after download
-            os.remove(file_path)
+        self._record(stage=JobStore.DONE)
 
-        except PermissionDeniedException as pde:
-            self.notifier.notify_error("Permission denied detected while trying to upload data to openload:" + str(pde))
-            print("[DownloadManager] Permission denied detected while uploading video to openload: " + str(pde))
+        # Delete file after download
+        os.remove(file_path)
+
+        self.progress.set_stage(ProgressMessage.DONE)
+
+    def _send_duplicate(self, url=None, video_id=None, sha1=None) -> bool:
+        """
+        This method checks if the video has already been uploaded. If it has, the stored uploader response and
+        thumbnail are sent to the user and the new url/id/hash is added to the index.
+
+        :param url: (Optional, Default=None) Video url.
+        :param video_id: (Optional, Default=None) Youtube-DL video id ("<extractor>:<id>").
+        :param sha1: (Optional, Default=None) SHA-1 hash of the downloaded file.
+        :return: True if the video has already been uploaded (nothing else has to be done), otherwise False.
+        """
+
+        if self.dedup_index is None or (url is None and video_id is None and sha1 is None):
+            return False
+
+        entry = self.dedup_index.find(self._get_uploader_name(), url=url, video_id=video_id, sha1=sha1)
+
+        if entry is None:
+            return False
+
+        print("[DownloadManager] Video already uploaded:", entry["response"].get("url"))
+        self.notifier.notify_information("This video has already been uploaded, I'm sending you the same file.")
+        self.notifier.notify_uploader_response(entry["response"])
+
+        thumbnail = entry["thumbnail"]
+        if thumbnail is not None and (not thumbnail["local"] or os.path.exists(thumbnail["data"])):
+            self._save_thumbnail(thumbnail["data"], local=thumbnail["local"])
+
+            self.notifier.notify_success(
+                "I found the thumbnail, to generate a caption use '/thumbnail' command. "
+                "This will start a wizard, just follow the steps!"
+            )
+
+        # Remember this url/id too
+        self.dedup_index.add(self._get_uploader_name(), entry["response"], url=self.download_req.url,
+                             video_id=self.video_id, sha1=entry["sha1"])
+
+        if sha1 is None:
+            # Nothing has been downloaded
+            self.progress.discard_timer()
+
+        self.DOWNLOAD_FINISHED = True
+        self.progress.set_stage(ProgressMessage.DONE)
+        return True
+
+    def add_subscriber(self, notifier: Notifier):
+        """
+        Adds a user that requested the same video: it receives the same messages, upload result and thumbnail.
+        The notifier of this download must be a NotifierGroup.
+
+        :param notifier: Notifier of the user.
+        """
+
+        if not self.notifier.add(notifier):
+            notifier.notify_warning("You are already downloading this video.")
+            return
+
+        self._record(subscribers=self.notifier.get_chat_ids())
+
+        notifier.notify_information(
+            "Another user is already downloading this video, you will receive the same progress and result."
+        )
+
+        # The uploader response and the progress message are replayed by the NotifierGroup, the thumbnail is
+        # replayed here (the user joined after the end of the job)
+        if self.thumbnail is not None:
+            self._save_thumbnail(*self.thumbnail)
+
+            notifier.notify_success(
+                "I found the thumbnail, to generate a caption use '/thumbnail' command. "
+                "This will start a wizard, just follow the steps!"
+            )
+
+    def _save_thumbnail(self, data, local=False):
+        """
+        Saves the video thumbnail for all the users that requested the video (used by the '/thumbnail' wizard).
+
+        :param data: Thumbnail url or local path.
+        :param local: (Optional, Default=False) True if 'data' is a local path.
+        """
+
+        from classes.thumbnail import Thumbnail
+
+        self.thumbnail = (data, local)
+
+        if isinstance(self.notifier, NotifierGroup):
+            sessions = self.notifier.get_sessions()
+        else:
+            sessions = [self.notifier.get_session()]
+
+        for session in sessions:
+            TelegramBot.THUMBNAILS[TelegramBot.get_user_id(session)] = Thumbnail(data, local=local)
+
+            if self.job_store is not None:
+                self.job_store.save_thumbnail(TelegramBot.get_user_id(session), data, local)
+
+    def remove_subscriber(self, user_id) -> bool:
+        """
+        Removes a user that receives the messages of this download (the download continues for the other users).
+
+        :param user_id: Chat id of the user.
+        :return: True if the user has been removed, False if it's the only user.
+        """
+
+        if not isinstance(self.notifier, NotifierGroup) or not self.notifier.remove(user_id):
+            return False
+
+        self._record(subscribers=self.notifier.get_chat_ids())
+        return True
+
+    def set_job_status(self, status: str):
+        """
+        Saves the final status of the job (JobStore.FINISHED, FAILED or CANCELLED), so it's not resumed.
+
+        :param status: Job status.
+        """
+
+        if status == JobStore.FINISHED and self.thumbnail_pending:
+            # Finished by the ThumbnailPoller callback
+            return
+
+        Metrics.JOBS.labels(status).inc()
+        self._record(status=status)
+
+    def start_span(self, name: str, **attributes) -> Span:
+        """
+        Starts a span in the trace of this job (it's not written if the tracing is disabled).
+
+        :param name: Name of the step (ex: upload).
+        :param attributes: (Optional) Other fields saved in the span.
+        :return: Span object (use it as context manager or call 'finish').
+        """
+
+        return Span(self.tracer, self.trace_id, name, **attributes)
+
+    def _open_channel(self, direction: str, on_share=None):
+        """
+        Opens a bandwidth channel for a transfer of this job.
+
+        :param direction: BandwidthGovernor.DOWNLOAD or BandwidthGovernor.UPLOAD.
+        :param on_share: (Optional, Default=None) Function called when the share of the transfer changes.
+        :return: BandwidthChannel object or None if there isn't a BandwidthGovernor.
+        """
+
+        if self.bandwidth_governor is None:
+            return None
+
+        return self.bandwidth_governor.open(direction, self.download_req.url, on_share=on_share)
+
+    @staticmethod
+    def _close_channel(channel):
+        if channel is not None:
+            channel.close()
+
+    def _record(self, **fields):
+        """
+        Saves the job state in the JobStore (if enabled).
+        """
+
+        if self.job_store is None or self.job_id is None:
+            return
+
+        try:
+            self.job_store.update(self.job_id, **fields)
+        except sqlite3.Error as ex:
+            print("[DownloadManager] Can't save the job state:", str(ex))
+
+    def _get_resumed_path(self):
+        """
+        :return: Output path of the interrupted job or None if this job is not resumed.
+        """
+
+        if self.resume_state is None:
+            return None
+
+        return self.resume_state.get("output_path")
+
+    def _resume(self) -> bool:
+        """
+        This method resumes a job interrupted after the download: the upload continues from its checkpoint and the
+        thumbnail is requested again.
+
+        :return: True if the job has been resumed (or it was already done), False if it has to be downloaded again
+        (the download continues from the '.part' file).
+        """
+
+        stage = self.resume_state["stage"]
+        file_path = self.resume_state.get("file_path")
+
+        if stage == JobStore.DONE:
+            # Interrupted after sending the result, before saving the final status: the DownloadJob saves it
+            print("[DownloadManager] Job {} was already done, marked as finished".format(self.job_id))
+            return True
+
+        if stage not in (JobStore.UPLOAD, JobStore.THUMBNAIL) or not file_path or not os.path.exists(file_path):
+            return False
+
+        print("[DownloadManager] Resuming job {} from the {} stage".format(self.job_id, stage))
+        self.output_path = file_path
+
+        # The download has been done before the restart
+        self.progress.discard_timer()
+
+        response = self.resume_state.get("response") if stage == JobStore.THUMBNAIL else None
+        self._handle_download_finished(file_path, os.path.getsize(file_path), response=response)
+
+        return True
+
+    def _get_uploader_name(self) -> str:
+        """
+        :return: Name of the uploader used by this download (verystream or openload).
+        """
+
+        return "verystream" if self.VS is not None else "openload"
+
+    def cleanup(self):
+        """
+        This method removes all the files (video parts, temporary files, ...) generated by this download.
+        It's used when the download job is cancelled.
+        """
+
+        if self.output_path is None:
+            return
+
+        folder, prefix = os.path.split(self.output_path)
+
+        for the_file in os.listdir(folder or "."):
+            file_path = os.path.join(folder, the_file)
+
+            try:
+                if the_file.startswith(prefix) and os.path.isfile(file_path):
+                    print("[DownloadManager] Found {}, i'm deleting it..".format(file_path))
+                    os.unlink(file_path)
+            except OSError as e:
+                print(e)
 
     @staticmethod
     def download_image_stream(url: str) -> BytesIO:
@@ -415,9 +1046,19 @@ class DownloadManager:
         This method allows the user to download a file into the RAM (get an array of bytes)
         :param url: Resource to download
         :return: BytesIO object that contains all the downloaded data
+        :raises requests.exceptions.HTTPError: If the server answers with an error (4xx or 5xx status code).
         """
 
+        if AsyncRuntime.CURRENT is not None:
+            status, content = AsyncRuntime.CURRENT.run(AsyncRuntime.CURRENT.fetch(url))
+
+            if status >= 400:
+                raise requests.exceptions.HTTPError("HTTP {} while downloading {}".format(status, url))
+
+            return BytesIO(content)
+
         r = requests.get(url)
+        r.raise_for_status()
         return BytesIO(r.content)
 
     @staticmethod
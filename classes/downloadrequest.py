@@ -1,8 +1,11 @@
 class DownloadRequest:
     
-    def __init__(self, url, filename):
+    def __init__(self, url, filename, trace_id=None):
         self.url = url
         self.filename = filename
 
+        # Id of the job in the trace log (set when the url is checked)
+        self.trace_id = trace_id
+
     def get_dict(self):
         return {"url": self.url, "filename": self.filename}
@@ -0,0 +1,89 @@
+import hashlib
+import os
+
+
+class FileHasher:
+    """
+    This class computes the SHA-1 hash of a file while it's written: every 'update' call hashes only the bytes
+    written since the previous call, so when the download finishes the hash is ready without reading the whole
+    file again.
+    """
+
+    # Bytes read at once
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, file_path=None):
+        """
+        Parametrized constructor method.
+
+        :param file_path: (Optional, Default=None) File to hash (it can be set later with 'update').
+        """
+
+        self.file_path = file_path
+        self.offset = 0
+        self._sha1 = hashlib.sha1()
+
+    def update(self, file_path=None, min_bytes=0):
+        """
+        Hashes the bytes written since the last call.
+
+        :param file_path: (Optional, Default=None) Current path of the file (ex: the '.part' file renamed at
+        the end of the download). If it's a different file the hash starts again.
+        :param min_bytes: (Optional, Default=0) The file is read only if at least 'min_bytes' new bytes have
+        been written (used by the download hooks, called for every small block).
+        """
+
+        if file_path is not None and file_path != self.file_path:
+            if self.file_path is not None and os.path.exists(self.file_path):
+                # Another file is being written: start again
+                self._reset()
+
+            self.file_path = file_path
+
+        try:
+            size = os.path.getsize(self.file_path)
+        except (OSError, TypeError):
+            return
+
+        if size < self.offset:
+            # The file has been truncated (ex: the download restarted from the beginning)
+            self._reset()
+
+        if size == self.offset or size - self.offset < min_bytes:
+            return
+
+        with open(self.file_path, "rb") as file:
+            file.seek(self.offset)
+
+            while self.offset < size:
+                block = file.read(min(self.BLOCK_SIZE, size - self.offset))
+
+                if not block:
+                    break
+
+                self._sha1.update(block)
+                self.offset += len(block)
+
+    def finish(self, file_path=None) -> str:
+        """
+        Hashes the last bytes of the file.
+
+        :param file_path: (Optional, Default=None) Final path of the file.
+        :return: SHA-1 hash as hexadecimal string.
+        """
+
+        self.update(file_path)
+        return self._sha1.hexdigest()
+
+    def _reset(self):
+        self.offset = 0
+        self._sha1 = hashlib.sha1()
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """
+        :param file_path: File to hash.
+        :return: SHA-1 hash of the whole file as hexadecimal string.
+        """
+
+        return FileHasher(file_path).finish()
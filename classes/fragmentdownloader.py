@@ -0,0 +1,317 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import youtube_dl.downloader
+from youtube_dl.compat import compat_urllib_error, compat_urlparse
+from youtube_dl.downloader.dash import DashSegmentsFD
+from youtube_dl.downloader.fragment import FragmentFD
+from youtube_dl.downloader.hls import HlsFD
+from youtube_dl.utils import sanitized_Request, update_url_query
+
+
+class FragmentDownloader(FragmentFD):
+    """
+    Youtube-DL downloader for fragmented formats (HLS and DASH). Youtube-DL downloads the fragments one at a
+    time, so the download speed is limited by the latency of every request. This downloader fetches the
+    fragments with a pool of threads and writes them in order through a small reorder buffer (at most
+    'workers * 2' fragments are downloaded ahead of the file), so the '.part' file is always written
+    sequentially (resume with the '.ytdl' file and pipelined upload keep working).
+
+    The progress is reported with the same dict used by Youtube-DL (download hooks are not changed).
+    The number of threads is set with the 'concurrent_fragment_downloads' Youtube-DL option. With 1 thread or
+    with manifests not supported (encrypted fragments, initialization fragments, live streams) the download is
+    handled by the original Youtube-DL downloader.
+
+    If the 'trace_span' option is set (function that starts a Span, see DownloadManager.start_span) every batch
+    of written fragments is saved in the trace of the job.
+    """
+
+    FD_NAME = "fragments"
+
+    # Original Youtube-DL downloaders: <protocol>: downloader class
+    DELEGATES = {
+        "m3u8_native": HlsFD,
+        "http_dash_segments": DashSegmentsFD,
+    }
+
+    # HLS tags not supported (handled by the Youtube-DL downloader)
+    UNSUPPORTED_HLS = re.compile(r"#EXT-X-KEY:METHOD=(?!NONE)|#EXT-X-MAP:")
+
+    _register_lock = threading.Lock()
+
+    @classmethod
+    def register(cls):
+        """
+        Registers this downloader in Youtube-DL for the HLS (native) and DASH protocols.
+        """
+
+        with cls._register_lock:
+            for protocol in cls.DELEGATES:
+                youtube_dl.downloader.PROTOCOL_MAP[protocol] = cls
+
+    def real_download(self, filename, info_dict):
+        workers = self.params.get("concurrent_fragment_downloads", 1)
+        protocol = info_dict.get("protocol")
+
+        if workers <= 1 or protocol not in self.DELEGATES or info_dict.get("is_live"):
+            return self._delegate(filename, info_dict)
+
+        if protocol == "m3u8_native":
+            fragments = self._get_hls_fragments(info_dict)
+        else:
+            fragments = self._get_dash_fragments(info_dict)
+
+        if fragments is None:
+            return self._delegate(filename, info_dict)
+
+        if self.params.get("test", False):
+            fragments = fragments[:1]
+
+        ctx = {
+            "filename": filename,
+            "total_frags": len(fragments),
+        }
+
+        self._prepare_and_start_frag_download(ctx)
+        self.to_screen("[%s] Downloading fragments with %d threads" % (self.FD_NAME, workers))
+
+        if not self._download_fragments(ctx, fragments, info_dict, workers):
+            return False
+
+        self._finish_frag_download(ctx)
+        return True
+
+    def _delegate(self, filename, info_dict):
+        """
+        Downloads the file with the original Youtube-DL downloader.
+        """
+
+        fd = self.DELEGATES.get(info_dict.get("protocol"), HlsFD)(self.ydl, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+
+        return fd.real_download(filename, info_dict)
+
+    def _get_hls_fragments(self, info_dict):
+        """
+        :return: List of the fragments (url, headers, fatal) of a HLS manifest or None if it's not supported.
+        """
+
+        urlh = self.ydl.urlopen(self._prepare_url(info_dict, info_dict["url"]))
+        man_url = urlh.geturl()
+        manifest = urlh.read().decode("utf-8", "ignore")
+
+        if self.UNSUPPORTED_HLS.search(manifest):
+            return None
+
+        extra_query = None
+        if info_dict.get("extra_param_to_segment_url"):
+            extra_query = compat_urlparse.parse_qs(info_dict["extra_param_to_segment_url"])
+
+        fragments = []
+        byte_range = {}
+        ad_frag_next = False
+
+        for line in manifest.splitlines():
+            line = line.strip()
+
+            if not line:
+                continue
+
+            if line.startswith("#EXT-X-BYTERANGE"):
+                splitted_byte_range = line[17:].split("@")
+                sub_range_start = int(splitted_byte_range[1]) if len(splitted_byte_range) == 2 else byte_range["end"]
+                byte_range = {
+                    "start": sub_range_start,
+                    "end": sub_range_start + int(splitted_byte_range[0]),
+                }
+
+            elif self._is_ad_fragment_start(line):
+                ad_frag_next = True
+
+            elif self._is_ad_fragment_end(line):
+                ad_frag_next = False
+
+            elif not line.startswith("#") and not ad_frag_next:
+                frag_url = line if re.match(r"^https?://", line) else compat_urlparse.urljoin(man_url, line)
+                if extra_query:
+                    frag_url = update_url_query(frag_url, extra_query)
+
+                headers = dict(info_dict.get("http_headers") or {})
+                if byte_range:
+                    headers["Range"] = "bytes=%d-%d" % (byte_range["start"], byte_range["end"] - 1)
+
+                fragments.append((frag_url, headers, False))
+
+        return fragments
+
+    @staticmethod
+    def _get_dash_fragments(info_dict):
+        """
+        :return: List of the fragments (url, headers, fatal) of a DASH format.
+        """
+
+        fragments = []
+        for i, fragment in enumerate(info_dict["fragments"]):
+            frag_url = fragment.get("url") or compat_urlparse.urljoin(info_dict["fragment_base_url"], fragment["path"])
+
+            # The first fragment contains the headers of the file
+            fragments.append((frag_url, info_dict.get("http_headers"), i == 0))
+
+        return fragments
+
+    @staticmethod
+    def _is_ad_fragment_start(line):
+        return (line.startswith("#ANVATO-SEGMENT-INFO") and "type=ad" in line
+                or line.startswith("#UPLYNK-SEGMENT") and line.endswith(",ad"))
+
+    @staticmethod
+    def _is_ad_fragment_end(line):
+        return (line.startswith("#ANVATO-SEGMENT-INFO") and "type=master" in line
+                or line.startswith("#UPLYNK-SEGMENT") and line.endswith(",segment"))
+
+    def _download_fragments(self, ctx, fragments: list, info_dict: dict, workers: int) -> bool:
+        """
+        Downloads the fragments with a pool of threads and appends them in order to the destination file.
+        Only this thread writes the file and calls the progress hooks. If the download fails (or raises an
+        exception) the destination file is closed.
+
+        :return: True if all the fragments have been downloaded, otherwise False.
+        """
+
+        resume_len = ctx["complete_frags_downloaded_bytes"]
+        total = len(fragments)
+        window = workers * 2
+
+        # Fragments downloaded but not written yet: <index>: content (None if skipped)
+        buffered = {}
+        pending = {}
+        next_write = next_submit = ctx["fragment_index"]
+        written = 0
+        completed = False
+
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Fragment")
+
+        # Span of the fragments written since the last batch (a batch is as big as the reorder window)
+        start_span = self.params.get("trace_span")
+        span = start_span("fragments", first=next_write) if start_span is not None else None
+
+        try:
+            while next_write < total:
+                # Keep the threads busy, but never download too far ahead of the file
+                while next_submit < total and next_submit - next_write < window:
+                    future = executor.submit(self._fetch_fragment, next_submit, fragments[next_submit], info_dict)
+                    pending[future] = next_submit
+                    next_submit += 1
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    index = pending.pop(future)
+                    success, content = future.result()
+
+                    if not success:
+                        if span is not None:
+                            span.set(last=index)
+                        return False
+
+                    buffered[index] = content
+
+                # Write the fragments that are next in the file
+                while next_write in buffered:
+                    content = buffered.pop(next_write)
+
+                    if content:
+                        ctx["dest_stream"].write(content)
+                        ctx["dest_stream"].flush()
+                        written += len(content)
+
+                        if span is not None:
+                            span.add_bytes(len(content))
+
+                    next_write += 1
+                    ctx["fragment_index"] = next_write
+                    ctx["complete_frags_downloaded_bytes"] = resume_len + written
+
+                    if span is not None and (next_write - span.attributes["first"] >= window or next_write == total):
+                        span.set(last=next_write - 1)
+                        span.finish()
+                        span = start_span("fragments", first=next_write) if next_write < total else None
+
+                    if not ctx["live"] and ctx["tmpfilename"] != "-":
+                        self._write_ytdl_file(ctx)
+
+                self._report_fragments(ctx, resume_len, total)
+                self.slow_down(ctx["started"], None, written)
+
+            completed = True
+            return True
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+            executor.shutdown(wait=False)
+
+            if not completed:
+                ctx["dest_stream"].close()
+
+                if span is not None:
+                    span.finish("error")
+
+    def _fetch_fragment(self, index: int, fragment: tuple, info_dict: dict):
+        """
+        Downloads a fragment (runs on the pool threads).
+
+        :return: (success, content). The content is None if the fragment has been skipped.
+        """
+
+        frag_url, headers, fatal = fragment
+        fragment_retries = self.params.get("fragment_retries", 0)
+        fatal = fatal or not self.params.get("skip_unavailable_fragments", True)
+
+        count = 0
+        while count <= fragment_retries:
+            try:
+                request = sanitized_Request(frag_url, None, headers) if headers else frag_url
+                return True, self.ydl.urlopen(request).read()
+
+            except compat_urllib_error.HTTPError as err:
+                count += 1
+                if count <= fragment_retries:
+                    self.report_retry_fragment(err, index + 1, count, fragment_retries)
+
+        if not fatal:
+            self.report_skip_fragment(index + 1)
+            return True, None
+
+        self.report_error("giving up after %s fragment retries" % fragment_retries)
+        return False, None
+
+    def _report_fragments(self, ctx, resume_len: int, total: int):
+        """
+        Calls the progress hooks (same dict of the Youtube-DL fragment downloaders).
+        """
+
+        now = time.time()
+        downloaded = ctx["complete_frags_downloaded_bytes"]
+        estimated_size = downloaded / ctx["fragment_index"] * total if ctx["fragment_index"] else None
+
+        self._hook_progress({
+            "status": "downloading",
+            "downloaded_bytes": downloaded,
+            "total_bytes_estimate": estimated_size,
+            "fragment_index": ctx["fragment_index"],
+            "fragment_count": total,
+            "filename": ctx["filename"],
+            "tmpfilename": ctx["tmpfilename"],
+            "elapsed": now - ctx["started"],
+            "speed": self.calc_speed(ctx["started"], now, downloaded - resume_len),
+            "eta": self.calc_eta(
+                ctx["started"], now,
+                estimated_size - resume_len if estimated_size is not None else None,
+                downloaded - resume_len
+            ),
+        })
@@ -0,0 +1,215 @@
+import heapq
+import itertools
+import threading
+
+import kthread
+
+from classes.downloadjob import DownloadJob
+from classes.metrics import Metrics
+
+
+class JobScheduler:
+    """
+    This class is used to run the download jobs of all the users with a fixed number of workers.
+    The jobs are saved in a priority queue (FIFO between jobs with the same priority), so when all the workers
+    are busy the new jobs will wait their turn.
+
+    When a job requests a video that is already queued or running (same URL and options), it's not executed:
+    its user is attached to the existing job and receives the same progress and result (single-flight).
+    """
+
+    def __init__(self, workers=2, max_jobs_per_user=3, coalesce=True):
+        """
+        Parametrized constructor method.
+
+        :param workers: (Optional, Default=2) Number of jobs that can run at the same time.
+        :param max_jobs_per_user: (Optional, Default=3) Max number of jobs (queued + running) for every user.
+        :param coalesce: (Optional, Default=True) If it's true the jobs for a video already in progress are
+        attached to the existing job.
+        """
+
+        self.WORKERS = max(1, int(workers))
+        self.MAX_JOBS_PER_USER = max(1, int(max_jobs_per_user))
+        self.COALESCE = coalesce
+
+        # Jobs that can receive other users: <job key>: job
+        self._in_flight = {}
+
+        # Heap of (priority, sequence number, job)
+        self._queue = []
+        self._sequence = itertools.count()
+
+        # Jobs currently processed by a worker
+        self._running = []
+
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """
+        Starts all the worker threads.
+        """
+
+        for i in range(self.WORKERS):
+            worker = threading.Thread(target=self._worker, name="JobWorker-{}".format(i))
+            worker.daemon = True
+            worker.start()
+            self._threads.append(worker)
+
+        # The gauges are read only when the metrics are collected
+        Metrics.QUEUE_DEPTH.set_function(lambda: len(self._queue))
+        Metrics.RUNNING_JOBS.set_function(lambda: len(self._running))
+
+        print("[JobScheduler] Started {} workers".format(self.WORKERS))
+
+    def can_submit(self, user_id) -> bool:
+        """
+        Checks if the user can add another job to the queue.
+
+        :param user_id: User id to check.
+        :return: True if the user has not reached the max number of jobs, otherwise False.
+        """
+
+        return len(self.get_user_jobs(user_id)) < self.MAX_JOBS_PER_USER
+
+    def submit(self, job: DownloadJob) -> int:
+        """
+        Adds a job to the queue.
+
+        :param job: DownloadJob object to execute.
+        :return: Position of the job in the queue (0 if a worker is free and the job will start immediately).
+        If the job has been attached to a job for the same video ('job.leader'), the position of that job.
+        """
+
+        with self._condition:
+            leader = self._in_flight.get(job.get_key()) if self.COALESCE and job.can_coalesce() else None
+
+            if leader is not None and leader.status in (DownloadJob.QUEUED, DownloadJob.RUNNING):
+                # Attached with the lock: the leader status can't change before the user is subscribed (the
+                # messages already sent by the leader are replayed to the new user)
+                print("[JobScheduler] Job {} attached to job {} (same video)".format(job.id, leader.id))
+                leader.attach(job)
+                return self._get_position(leader)
+
+            if self.COALESCE and job.can_coalesce():
+                self._in_flight[job.get_key()] = job
+
+            heapq.heappush(self._queue, (job.priority, next(self._sequence), job))
+            print("[JobScheduler] Queued job {} ({} queued, {} running)".format(
+                job.id, len(self._queue), len(self._running))
+            )
+
+            position = self._get_position(job)
+            self._condition.notify()
+
+        return position
+
+    def get_position(self, job: DownloadJob) -> int:
+        """
+        :param job: Queued job.
+        :return: Position of the job in the queue (starting from 1) or 0 if the job is not waiting
+        (already started or about to be taken by a free worker).
+        """
+
+        with self._condition:
+            return self._get_position(job)
+
+    def _get_position(self, job: DownloadJob) -> int:
+        # Workers that are free will take the first jobs in the queue
+        free_workers = max(0, self.WORKERS - len(self._running))
+
+        for index, (_, _, queued) in enumerate(sorted(self._queue, key=lambda item: item[:2]), start=1):
+            if queued is job:
+                return max(0, index - free_workers)
+
+        return 0
+
+    def get_user_jobs(self, user_id) -> list:
+        """
+        :param user_id: User id that identifies the jobs owner.
+        :return: List of all the running and queued jobs of the user (running jobs first).
+        """
+
+        with self._condition:
+            queued = [item[2] for item in sorted(self._queue, key=lambda item: item[:2])]
+            return [job for job in self._running + queued if user_id in job.get_user_ids()]
+
+    def detach_user(self, user_id) -> list:
+        """
+        Removes a user from the jobs shared with other users (the jobs continue for the other users).
+
+        :param user_id: User id to remove.
+        :return: List of the jobs the user has been removed from.
+        """
+
+        shared = [job for job in self.get_user_jobs(user_id) if len(job.get_user_ids()) > 1]
+        detached = [job for job in shared if job.detach(user_id)]
+
+        for job in detached:
+            print("[JobScheduler] User {} detached from job {}".format(user_id, job.id))
+
+        return detached
+
+    def cancel_user_jobs(self, user_id) -> list:
+        """
+        Removes all the queued jobs of a user and kills all of its running jobs.
+
+        :param user_id: User id that identifies the jobs owner.
+        :return: List of the cancelled jobs.
+        """
+
+        # The jobs shared with other users continue
+        self.detach_user(user_id)
+
+        with self._condition:
+            cancelled = [item[2] for item in self._queue if item[2].get_user_id() == user_id]
+            self._queue = [item for item in self._queue if item[2].get_user_id() != user_id]
+            heapq.heapify(self._queue)
+
+            running = [job for job in self._running if job.get_user_id() == user_id]
+
+            for job in cancelled + running:
+                job.status = DownloadJob.CANCELLED
+                self._forget(job)
+
+        for job in running:
+            print("[JobScheduler] Killing running job {}".format(job.id))
+            job.thread.terminate()
+
+        return cancelled + running
+
+    def _worker(self):
+        """
+        Worker loop: takes the first job from the queue and runs it in a killable thread.
+        """
+
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+
+                _, _, job = heapq.heappop(self._queue)
+                job.status = DownloadJob.RUNNING
+                job.thread = kthread.KThread(target=job.run, name="DownloadJob-{}".format(job.id))
+                self._running.append(job)
+
+            print("[JobScheduler] Starting job {} on {}".format(job.id, threading.current_thread().name))
+            job.thread.start()
+            job.thread.join()
+
+            with self._condition:
+                self._running.remove(job)
+                self._forget(job)
+
+                if job.status == DownloadJob.RUNNING:
+                    job.status = DownloadJob.FINISHED
+
+            print("[JobScheduler] Job {} {}".format(job.id, job.status))
+
+    def _forget(self, job: DownloadJob):
+        """
+        Removes a job from the jobs that can receive other users (called with the lock).
+        """
+
+        if self._in_flight.get(job.get_key()) is job:
+            del self._in_flight[job.get_key()]
@@ -0,0 +1,175 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class JobStore:
+    """
+    This class saves the state of the download jobs in a SQLite database (write-ahead log journal), so the jobs
+    interrupted by a restart or a crash can be resumed: the download continues from the '.part' file, the upload
+    continues from its checkpoint and the thumbnail is requested again.
+
+    Every job goes through these stages: download -> upload -> thumbnail -> done.
+    """
+
+    # Job stages
+    DOWNLOAD, UPLOAD, THUMBNAIL, DONE = "download", "upload", "thumbnail", "done"
+
+    # Job status
+    ACTIVE, FINISHED, FAILED, CANCELLED = "active", "finished", "failed", "cancelled"
+
+    # Columns that can be updated (JSON columns are encoded automatically)
+    COLUMNS = ("stage", "status", "output_path", "file_path", "response", "subscribers")
+    JSON_COLUMNS = ("download_kwargs", "response", "subscribers")
+
+    def __init__(self, db_path="jobs.db"):
+        """
+        Parametrized constructor method.
+
+        :param db_path: (Optional, Default=jobs.db) Path of the SQLite database.
+        """
+
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        # A single connection shared by all the threads (protected by the lock)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    filename TEXT,
+                    download_kwargs TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    output_path TEXT,
+                    file_path TEXT,
+                    response TEXT,
+                    subscribers TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    chat_id INTEGER PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    local INTEGER NOT NULL
+                )
+            """)
+
+    def add(self, chat_id, url: str, filename, download_kwargs: dict) -> int:
+        """
+        Saves a new job.
+
+        :param chat_id: Chat id of the user that requested the download.
+        :param url: Video url.
+        :param filename: Filename chosen by the user (None with the automatic filename).
+        :param download_kwargs: Arguments passed to 'DownloadManager.download_file'.
+        :return: Id of the saved job.
+        """
+
+        now = time.time()
+
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO jobs (chat_id, url, filename, download_kwargs, stage, status, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, url, filename, json.dumps(download_kwargs), self.DOWNLOAD, self.ACTIVE, now, now)
+            )
+
+            return cursor.lastrowid
+
+    def update(self, job_id: int, **fields):
+        """
+        Updates some columns of a job (stage, status, output_path, file_path, response, subscribers).
+
+        :param job_id: Id of the job.
+        """
+
+        columns = [column for column in fields if column in self.COLUMNS]
+
+        if not columns:
+            return
+
+        values = [
+            json.dumps(fields[column]) if column in self.JSON_COLUMNS else fields[column]
+            for column in columns
+        ]
+
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET {}, updated = ? WHERE id = ?".format(", ".join(c + " = ?" for c in columns)),
+                values + [time.time(), job_id]
+            )
+
+    def remove(self, job_id: int):
+        """
+        Deletes a job (ex: job attached to another job for the same video).
+
+        :param job_id: Id of the job.
+        """
+
+        with self._lock:
+            self._connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def get_active(self) -> list:
+        """
+        :return: List of the jobs not finished yet (dict objects, oldest first).
+        """
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id", (self.ACTIVE,)
+            ).fetchall()
+
+        jobs = []
+        for row in rows:
+            job = dict(row)
+
+            for column in self.JSON_COLUMNS:
+                job[column] = json.loads(job[column]) if job[column] is not None else None
+
+            jobs.append(job)
+
+        return jobs
+
+    def save_thumbnail(self, chat_id, data: str, local: bool):
+        """
+        Saves the latest thumbnail of a user (used by the '/thumbnail' wizard after a restart).
+
+        :param chat_id: Chat id of the user.
+        :param data: Thumbnail url or local path.
+        :param local: True if 'data' is a local path.
+        """
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO thumbnails (chat_id, data, local) VALUES (?, ?, ?)",
+                (chat_id, data, int(local))
+            )
+
+    def get_thumbnails(self) -> dict:
+        """
+        :return: Latest thumbnail of every user: <chat id>: (data, local).
+        """
+
+        with self._lock:
+            rows = self._connection.execute("SELECT chat_id, data, local FROM thumbnails").fetchall()
+
+        return {row["chat_id"]: (row["data"], bool(row["local"])) for row in rows}
+
+    def close(self):
+        """
+        Closes the database.
+        """
+
+        with self._lock:
+            self._connection.close()
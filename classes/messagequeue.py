@@ -0,0 +1,273 @@
+import threading
+import time
+from collections import deque, OrderedDict
+
+from telegram.error import RetryAfter, TimedOut, NetworkError, BadRequest
+
+from classes.metrics import Metrics
+from classes.tokenbucket import TokenBucket
+
+
+class MessageQueue:
+    """
+    This class sends the bot messages from a single background thread, so the threads that notify the user
+    (for example the download workers) never wait for Telegram.
+
+    Every chat has its own token bucket and all the chats share a global one, so the bot respects the Telegram
+    flood limits (about 1 message per second in the same chat and 30 messages per second overall). Consecutive
+    small messages for the same chat are merged into a single message, and when Telegram answers with
+    'RetryAfter' the chat is paused for the requested time.
+    """
+
+    # Max length of a Telegram message
+    MAX_MESSAGE_LENGTH = 4096
+
+    # Only messages shorter than this are merged together
+    MERGE_MAX_LENGTH = 1000
+
+    # Max number of attempts for every message (network errors)
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, bot, chat_rate=1.0, chat_burst=3, global_rate=25.0):
+        """
+        Parametrized constructor method.
+
+        :param bot: Telegram.Bot object used to send the messages.
+        :param chat_rate: (Optional, Default=1) Max number of messages per second in the same chat.
+        :param chat_burst: (Optional, Default=3) Max number of messages sent at once in the same chat.
+        :param global_rate: (Optional, Default=25) Max number of messages per second in all the chats.
+        """
+
+        self.bot = bot
+        self.CHAT_RATE = chat_rate
+        self.CHAT_BURST = chat_burst
+
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+
+        # Pending messages: <chat_id>: deque of message dicts
+        self._chats = OrderedDict()
+
+        # Chat buckets: <chat_id>: TokenBucket
+        self._buckets = {}
+
+        # Chats paused by a 'RetryAfter' error: <chat_id>: time when the chat can send again
+        self._paused_until = {}
+
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the sender thread.
+        """
+
+        self._thread = threading.Thread(target=self._sender, name="MessageQueue")
+        self._thread.daemon = True
+        self._thread.start()
+
+        print("[MessageQueue] Started sender thread")
+
+    def send(self, chat_id, text, parse_mode=None, silent=False, callback=None):
+        """
+        Adds a message to the queue.
+
+        :param chat_id: Chat that will receive the message.
+        :param text: Message text.
+        :param parse_mode: (Optional, Default=None) Telegram parse mode.
+        :param silent: (Optional, Default=False) If it's True the message is sent without notification sound.
+        :param callback: (Optional, Default=None) Function called with the sent Telegram.Message object.
+        Messages with a callback are never merged.
+        """
+
+        self._put(chat_id, {
+            "text": text,
+            "parse_mode": parse_mode,
+            "silent": silent,
+            "callback": callback,
+            "attempts": 0
+        })
+
+    def edit(self, chat_id, message_id, text, parse_mode=None):
+        """
+        Adds a message edit to the queue. If there's already a pending edit of the same message it will be
+        replaced, so only the latest text is sent.
+
+        :param chat_id: Chat of the message.
+        :param message_id: Id of the message to edit.
+        :param text: New message text.
+        :param parse_mode: (Optional, Default=None) Telegram parse mode.
+        """
+
+        with self._condition:
+            for message in self._chats.get(chat_id, ()):
+                if message.get("edit") == message_id:
+                    message["text"] = text
+                    message["parse_mode"] = parse_mode
+                    return
+
+        self._put(chat_id, {
+            "text": text,
+            "parse_mode": parse_mode,
+            "silent": True,
+            "callback": None,
+            "edit": message_id,
+            "attempts": 0
+        })
+
+    def _put(self, chat_id, message: dict, first=False):
+        with self._condition:
+            queue = self._chats.setdefault(chat_id, deque())
+
+            if first:
+                queue.appendleft(message)
+            else:
+                queue.append(message)
+
+            if chat_id not in self._buckets:
+                self._buckets[chat_id] = TokenBucket(self.CHAT_RATE, self.CHAT_BURST)
+
+            self._condition.notify()
+
+    def _sender(self):
+        """
+        Sender loop: sends the first message of the first chat that can send, then moves the chat at the end
+        of the list (round robin between the chats).
+        """
+
+        while True:
+            with self._condition:
+                chat_id, message = self._next_message()
+
+                while chat_id is None:
+                    self._condition.wait(message)
+                    chat_id, message = self._next_message()
+
+            self._deliver(chat_id, message)
+
+    def _next_message(self):
+        """
+        :return: (chat_id, message) of the next message to send or (None, seconds to wait).
+        """
+
+        now = time.monotonic()
+        wait = None
+
+        for chat_id in list(self._chats):
+            queue = self._chats[chat_id]
+
+            if not queue:
+                del self._chats[chat_id]
+                continue
+
+            paused = self._paused_until.get(chat_id, 0) - now
+            chat_wait = max(paused, self._buckets[chat_id].get_wait_time())
+
+            if chat_wait <= 0:
+                global_wait = self._global_bucket.get_wait_time()
+
+                if global_wait > 0:
+                    return None, global_wait
+
+                self._buckets[chat_id].try_consume()
+                self._global_bucket.try_consume()
+
+                # Round robin
+                self._chats.move_to_end(chat_id)
+                return chat_id, self._merge(queue)
+
+            wait = chat_wait if wait is None else min(wait, chat_wait)
+
+        return None, wait
+
+    def _merge(self, queue: deque) -> dict:
+        """
+        Takes the first message of the queue and merges it with the following small messages.
+
+        :param queue: Pending messages of a chat.
+        :return: Message to send.
+        """
+
+        message = queue.popleft()
+
+        if message["callback"] is not None or message.get("edit") is not None \
+                or len(message["text"]) > self.MERGE_MAX_LENGTH:
+            return message
+
+        message = dict(message)
+        merged = 1
+
+        while queue:
+            following = queue[0]
+
+            mergeable = following["callback"] is None \
+                and following.get("edit") is None \
+                and following["parse_mode"] == message["parse_mode"] \
+                and following["silent"] == message["silent"] \
+                and len(following["text"]) <= self.MERGE_MAX_LENGTH \
+                and len(message["text"]) + len(following["text"]) + 1 <= self.MAX_MESSAGE_LENGTH
+
+            if not mergeable:
+                break
+
+            message["text"] += "\n" + queue.popleft()["text"]
+            merged += 1
+
+        if merged > 1:
+            print("[MessageQueue] Merged {} messages".format(merged))
+
+        return message
+
+    def _deliver(self, chat_id, message: dict):
+        """
+        Sends a message to Telegram handling the flood and network errors.
+        """
+
+        try:
+            if message.get("edit") is not None:
+                with Metrics.TELEGRAM_LATENCY.labels("edit_message_text").time():
+                    self.bot.edit_message_text(
+                        message["text"],
+                        chat_id=chat_id,
+                        message_id=message["edit"],
+                        parse_mode=message["parse_mode"]
+                    )
+                return
+
+            with Metrics.TELEGRAM_LATENCY.labels("send_message").time():
+                sent = self.bot.send_message(
+                    chat_id,
+                    message["text"],
+                    parse_mode=message["parse_mode"],
+                    disable_notification=message["silent"]
+                )
+
+            if message["callback"] is not None:
+                message["callback"](sent)
+
+        except RetryAfter as ex:
+            Metrics.count_error(ex)
+            print("[MessageQueue] Flood limit reached in chat {}, waiting {} seconds".format(chat_id, ex.retry_after))
+
+            with self._condition:
+                self._paused_until[chat_id] = time.monotonic() + ex.retry_after
+
+            self._put(chat_id, message, first=True)
+
+        except (TimedOut, NetworkError) as ex:
+            Metrics.count_error(ex)
+
+            if isinstance(ex, BadRequest):
+                print("[MessageQueue] Message refused by Telegram:", str(ex))
+                return
+
+            message["attempts"] += 1
+
+            if message["attempts"] < self.MAX_ATTEMPTS:
+                print("[MessageQueue] Network error, retrying to send the message:", str(ex))
+                self._put(chat_id, message, first=True)
+            else:
+                print("[MessageQueue] Can't send the message after {} attempts:".format(self.MAX_ATTEMPTS), str(ex))
+
+        except Exception as ex:
+            Metrics.count_error(ex)
+            print("[MessageQueue] Error of type {} while sending a message:".format(type(ex).__name__), str(ex))
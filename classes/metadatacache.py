@@ -0,0 +1,262 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+
+import youtube_dl
+
+from classes.metrics import Metrics
+from classes.ttlcache import TTLCache
+from classes.urlchecker import UrlChecker
+
+
+class MetadataCache:
+    """
+    This class caches the metadata extracted by Youtube-DL ('extract_info' without download and without
+    processing), so the same URL is extracted only once: the format selection, the size estimation and the
+    download reuse the cached metadata.
+
+    The metadata is saved in memory (LRU) and optionally on disk (one JSON file for every URL). Every entry
+    expires after a TTL that can be changed for every extractor (the direct video links of some sites expire
+    after a few minutes).
+    """
+
+    def __init__(self, max_size=256, ttl=600, cache_dir=None, extractor_ttl=None, worker_pool=None):
+        """
+        Parametrized constructor method.
+
+        :param max_size: (Optional, Default=256) Max number of URLs saved in memory.
+        :param ttl: (Optional, Default=600) Seconds after which the metadata of a URL expires.
+        :param cache_dir: (Optional, Default=None) Folder where the metadata is saved on disk (None = memory only).
+        :param extractor_ttl: (Optional, Default=None) TTL for some extractors, dict <extractor key>: seconds
+        (ex: {"Generic": 60}).
+        :param worker_pool: (Optional, Default=None) WorkerPool object, if it's set the metadata is extracted in
+        its worker processes.
+        """
+
+        self.TTL = ttl
+        self.WORKER_POOL = worker_pool
+        self.CACHE_DIR = cache_dir
+        self.EXTRACTOR_TTL = extractor_ttl or {}
+
+        self._memory = TTLCache(max_size=max_size, ttl=ttl)
+
+        # URLs being extracted: <key>: threading.Event set at the end of the extraction
+        self._extracting = {}
+        self._lock = threading.Lock()
+
+        if cache_dir is not None and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get(self, url: str):
+        """
+        :param url: Video url.
+        :return: Copy of the cached metadata or None if it's missing or expired.
+        """
+
+        key = UrlChecker.normalize(url)
+        info = self._memory.get(key)
+
+        if info is None and self.CACHE_DIR is not None:
+            info = self._load(key)
+
+        return copy.deepcopy(info) if info is not None else None
+
+    def set(self, url: str, info: dict):
+        """
+        Saves the metadata of a URL (only single videos are cached, playlists can contain lazy entries).
+
+        :param url: Video url.
+        :param info: Metadata returned by 'extract_info(url, download=False, process=False)'.
+        """
+
+        if info.get("_type", "video") != "video":
+            return
+
+        key = UrlChecker.normalize(url)
+        ttl = self.EXTRACTOR_TTL.get(info.get("extractor_key"), self.TTL)
+        info = copy.deepcopy(info)
+
+        self._memory.set(key, info, ttl=ttl)
+
+        if self.CACHE_DIR is not None:
+            self._save(key, info, ttl)
+
+    def extract_info(self, ydl, url: str) -> dict:
+        """
+        Returns the metadata of a URL, it's extracted with Youtube-DL only if it's not cached. If the same URL
+        is already being extracted (ex: prefetch) it waits that extraction.
+
+        :param ydl: YoutubeDL object used for the extraction.
+        :param url: Video url.
+        :return: Metadata (copy, it can be processed by 'ydl.process_ie_result').
+        """
+
+        key = UrlChecker.normalize(url)
+
+        while True:
+            info = self.get(url)
+
+            if info is not None:
+                print("[MetadataCache] Using cached metadata of", url)
+                return info
+
+            with self._lock:
+                event = self._extracting.get(key)
+
+                if event is None:
+                    event = self._extracting[key] = threading.Event()
+                    break
+
+            event.wait()
+
+        try:
+            start = time.monotonic()
+            if self.WORKER_POOL is not None:
+                info = self.WORKER_POOL.extract_info(url)
+            else:
+                info = ydl.extract_info(url, download=False, process=False)
+
+            elapsed = time.monotonic() - start
+
+            print("[MetadataCache] Metadata of {} extracted in {:.2f} seconds".format(url, elapsed))
+            Metrics.STAGE_DURATION.labels("extract").observe(elapsed)
+
+            self.set(url, info)
+            return info
+
+        finally:
+            with self._lock:
+                del self._extracting[key]
+
+            event.set()
+
+    def prefetch(self, url: str):
+        """
+        Extracts the metadata of a URL in a background thread (used while the user completes the download
+        wizard). Errors are ignored, the download will extract the metadata again.
+
+        :param url: Video url.
+        """
+
+        def extract():
+            try:
+                with youtube_dl.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+                    self.extract_info(ydl, url)
+            except Exception as ex:
+                print("[MetadataCache] Prefetch of {} failed:".format(url), str(ex))
+
+        thread = threading.Thread(target=extract, name="MetadataPrefetch")
+        thread.daemon = True
+        thread.start()
+
+    def invalidate(self, url=None, extractor=None) -> int:
+        """
+        Removes cached metadata.
+
+        :param url: (Optional, Default=None) Url to remove.
+        :param extractor: (Optional, Default=None) Extractor key (ex: "Youtube"), all its URLs are removed.
+        :return: Number of removed entries (memory).
+        """
+
+        removed = 0
+
+        if url is not None:
+            key = UrlChecker.normalize(url)
+            removed += self._memory.remove_if(lambda k, _: k == key)
+
+            if self.CACHE_DIR is not None:
+                self._remove_file(key)
+
+        if extractor is not None:
+            removed += self._memory.remove_if(lambda _, info: info.get("extractor_key") == extractor)
+
+            if self.CACHE_DIR is not None:
+                for file_name in os.listdir(self.CACHE_DIR):
+                    entry = self._read_file(os.path.join(self.CACHE_DIR, file_name))
+
+                    if entry is not None and entry["info"].get("extractor_key") == extractor:
+                        self._remove_file(entry["key"])
+
+        return removed
+
+    @staticmethod
+    def estimate_size(ydl, info: dict):
+        """
+        Estimates the size of the video that will be downloaded (format selected by the YoutubeDL options).
+
+        :param ydl: YoutubeDL object used for the download.
+        :param info: Metadata returned by 'extract_info'.
+        :return: Estimated size in bytes or None if it can't be estimated.
+        """
+
+        # Only the formats already extracted are used: processing a url (or playlist) result would extract it
+        if info.get("_type", "video") != "video" or not info.get("formats"):
+            return None
+
+        try:
+            processed = ydl.process_video_result(copy.deepcopy(info), download=False)
+        except youtube_dl.utils.DownloadError:
+            return None
+
+        if processed is None:
+            return None
+
+        size = 0
+        for video_format in processed.get("requested_formats") or [processed]:
+            format_size = video_format.get("filesize") or video_format.get("filesize_approx")
+
+            if not format_size and video_format.get("tbr") and processed.get("duration"):
+                # Total bitrate in KBit/s
+                format_size = video_format["tbr"] * 1000 / 8 * processed["duration"]
+
+            if not format_size:
+                return None
+
+            size += format_size
+
+        return int(size)
+
+    def _get_file_path(self, key: str) -> str:
+        return os.path.join(self.CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def _save(self, key: str, info: dict, ttl: float):
+        try:
+            with open(self._get_file_path(key), "w") as file:
+                json.dump({"key": key, "expires": time.time() + ttl, "info": info}, file)
+
+        except (OSError, TypeError, ValueError) as ex:
+            print("[MetadataCache] Can't save the metadata on disk:", str(ex))
+            self._remove_file(key)
+
+    def _load(self, key: str):
+        entry = self._read_file(self._get_file_path(key))
+
+        if entry is None or entry.get("key") != key:
+            return None
+
+        remaining = entry["expires"] - time.time()
+
+        if remaining <= 0:
+            self._remove_file(key)
+            return None
+
+        self._memory.set(key, entry["info"], ttl=remaining)
+        return entry["info"]
+
+    @staticmethod
+    def _read_file(file_path: str):
+        try:
+            with open(file_path) as file:
+                return json.load(file)
+
+        except (OSError, ValueError):
+            return None
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._get_file_path(key))
+        except OSError:
+            pass
@@ -0,0 +1,59 @@
+from classes.metricsregistry import MetricsRegistry
+
+
+class Metrics:
+    """
+    This class contains the metrics of the bot, exported by the MetricsServer ('/metrics').
+
+    The labels have only a few values (stage names, directions, exception types), so updating a metric is cheap
+    and the number of exported series doesn't grow with the users or the videos.
+    """
+
+    REGISTRY = MetricsRegistry()
+
+    # Stage duration buckets (seconds): from a fast metadata extraction to a long upload
+    STAGE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+    # Telegram request buckets (seconds)
+    TELEGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    QUEUE_DEPTH = REGISTRY.gauge(
+        "rimesegate_queue_depth", "Download jobs waiting for a worker"
+    )
+
+    RUNNING_JOBS = REGISTRY.gauge(
+        "rimesegate_running_jobs", "Download jobs processed by a worker"
+    )
+
+    JOBS = REGISTRY.counter(
+        "rimesegate_jobs_total", "Download jobs ended, by final status", labels=("status",)
+    )
+
+    STAGE_DURATION = REGISTRY.histogram(
+        "rimesegate_stage_duration_seconds",
+        "Duration of the job stages (extract, download, convert, upload, thumbnail, preview)",
+        labels=("stage",), buckets=STAGE_BUCKETS
+    )
+
+    TRANSFERRED_BYTES = REGISTRY.counter(
+        "rimesegate_transferred_bytes_total", "Bytes downloaded and uploaded by the jobs", labels=("direction",)
+    )
+
+    TELEGRAM_LATENCY = REGISTRY.histogram(
+        "rimesegate_telegram_request_seconds", "Duration of the Telegram requests sent by the message queue",
+        labels=("method",), buckets=TELEGRAM_BUCKETS
+    )
+
+    ERRORS = REGISTRY.counter(
+        "rimesegate_errors_total", "Errors detected, by exception type", labels=("type",)
+    )
+
+    @classmethod
+    def count_error(cls, error: Exception):
+        """
+        Counts an error in the errors metric (the exception class is the label).
+
+        :param error: Detected exception.
+        """
+
+        cls.ERRORS.labels(type(error).__name__).inc()
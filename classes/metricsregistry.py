@@ -0,0 +1,301 @@
+import bisect
+import math
+import threading
+import time
+
+
+class Counter:
+    """
+    Value that can only grow (ex: transferred bytes, errors).
+    """
+
+    TYPE = "counter"
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        """
+        :param amount: (Optional, Default=1) Value added to the counter (must be positive).
+        """
+
+        with self._lock:
+            self._value += amount
+
+    def collect(self, name: str, labels: str) -> list:
+        return ["{}{} {}".format(name, labels, MetricsRegistry.format_value(self._value))]
+
+
+class Gauge:
+    """
+    Value that can go up and down (ex: queue depth). The value can be read from a function when the metrics are
+    collected, so nothing is done while the bot is working.
+    """
+
+    TYPE = "gauge"
+
+    def __init__(self):
+        self._value = 0.0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function):
+        """
+        :param function: Function without arguments that returns the current value (called at every collection).
+        """
+
+        self._function = function
+
+    def collect(self, name: str, labels: str) -> list:
+        value = self._value
+
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as ex:
+                print("[MetricsRegistry] Can't read the value of {}:".format(name), str(ex))
+                value = math.nan
+
+        return ["{}{} {}".format(name, labels, MetricsRegistry.format_value(value))]
+
+
+class Histogram:
+    """
+    Distribution of the observed values (ex: durations) in fixed buckets, with their sum and count.
+    """
+
+    TYPE = "histogram"
+
+    # Default buckets (seconds)
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: (Optional, Default=DEFAULT_BUCKETS) Upper bounds of the buckets (sorted).
+        """
+
+        self.BUCKETS = tuple(buckets)
+
+        # Last bucket: +Inf
+        self._counts = [0] * (len(self.BUCKETS) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.BUCKETS, value)
+
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        """
+        :return: Context manager that observes the duration of its block.
+        """
+
+        return _Timer(self)
+
+    def collect(self, name: str, labels: str) -> list:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        lines = []
+        cumulative = 0
+        bounds = [MetricsRegistry.format_value(bound) for bound in self.BUCKETS] + ["+Inf"]
+
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            bucket_labels = labels[:-1] + ',le="{}"}}'.format(bound) if labels else '{{le="{}"}}'.format(bound)
+            lines.append("{}_bucket{} {}".format(name, bucket_labels, cumulative))
+
+        lines.append("{}_sum{} {}".format(name, labels, MetricsRegistry.format_value(total)))
+        lines.append("{}_count{} {}".format(name, labels, cumulative))
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.monotonic() - self.start)
+
+
+class Metric:
+    """
+    Named metric with a child (Counter, Gauge or Histogram) for every combination of label values.
+    """
+
+    def __init__(self, name: str, description: str, factory, metric_type: str, labels=()):
+        self.name = name
+        self.description = description
+        self.TYPE = metric_type
+        self.LABELS = tuple(labels)
+
+        self._factory = factory
+
+        # <tuple of label values>: child metric
+        self._children = {}
+        self._lock = threading.Lock()
+
+        if not self.LABELS:
+            self._children[()] = factory()
+
+    def labels(self, *values):
+        """
+        Returns the child of some label values (created the first time). Keep the number of different values
+        low (ex: stage names, exception types, never urls or user ids): every child is kept forever.
+
+        :param values: One value for every label, in the order used to create the metric.
+        :return: Counter, Gauge or Histogram object.
+        """
+
+        child = self._children.get(values)
+
+        if child is None:
+            if len(values) != len(self.LABELS):
+                raise ValueError("{} expects the labels {}".format(self.name, self.LABELS))
+
+            with self._lock:
+                child = self._children.get(values)
+
+                if child is None:
+                    child = self._children[values] = self._factory()
+
+        return child
+
+    def __getattr__(self, attribute):
+        # Metrics without labels are used directly (ex: gauge.set(1))
+        if attribute.startswith("_") or self.LABELS:
+            raise AttributeError(attribute)
+
+        return getattr(self._children[()], attribute)
+
+    def collect(self) -> list:
+        """
+        :return: Lines of the metric in the Prometheus text format.
+        """
+
+        lines = [
+            "# HELP {} {}".format(self.name, self.description.replace("\\", "\\\\").replace("\n", "\\n")),
+            "# TYPE {} {}".format(self.name, self.TYPE)
+        ]
+
+        with self._lock:
+            children = [(tuple(str(value) for value in values), child) for values, child in self._children.items()]
+
+        for values, child in sorted(children, key=lambda item: item[0]):
+            labels = ""
+            if values:
+                labels = "{" + ",".join(
+                    '{}="{}"'.format(label, MetricsRegistry.escape(value)) for label, value in zip(self.LABELS, values)
+                ) + "}"
+
+            lines.extend(child.collect(self.name, labels))
+
+        return lines
+
+
+class MetricsRegistry:
+    """
+    This class keeps the metrics of the bot (counters, gauges and histograms) and exports them in the Prometheus
+    text format (see MetricsServer).
+
+    Updating a metric only takes a dict lookup and a lock, so the metrics can be updated in the hot paths
+    (ex: every downloaded block) as long as their labels have few values.
+    """
+
+    def __init__(self):
+        # <name>: Metric object (in creation order)
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labels=()) -> Metric:
+        """
+        :param name: Metric name (ex: rimesegate_errors_total).
+        :param description: Metric description.
+        :param labels: (Optional, Default=()) Label names.
+        :return: Metric object ('labels(...).inc()' or 'inc()' without labels).
+        """
+
+        return self._add(Metric(name, description, Counter, Counter.TYPE, labels))
+
+    def gauge(self, name: str, description: str, labels=()) -> Metric:
+        """
+        :param name: Metric name.
+        :param description: Metric description.
+        :param labels: (Optional, Default=()) Label names.
+        :return: Metric object ('labels(...).set()' or 'set()' without labels).
+        """
+
+        return self._add(Metric(name, description, Gauge, Gauge.TYPE, labels))
+
+    def histogram(self, name: str, description: str, labels=(), buckets=Histogram.DEFAULT_BUCKETS) -> Metric:
+        """
+        :param name: Metric name.
+        :param description: Metric description.
+        :param labels: (Optional, Default=()) Label names.
+        :param buckets: (Optional, Default=Histogram.DEFAULT_BUCKETS) Upper bounds of the buckets.
+        :return: Metric object ('labels(...).observe()' or 'observe()' without labels).
+        """
+
+        return self._add(Metric(name, description, lambda: Histogram(buckets), Histogram.TYPE, labels))
+
+    def _add(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError("Metric {} already registered".format(metric.name))
+
+            self._metrics[metric.name] = metric
+
+        return metric
+
+    def render(self) -> str:
+        """
+        :return: All the metrics in the Prometheus text format.
+        """
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def format_value(value) -> str:
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+
+        if math.isnan(value):
+            return "NaN"
+
+        if float(value).is_integer():
+            return str(int(value))
+
+        return repr(float(value))
+
+    @staticmethod
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
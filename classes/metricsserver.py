@@ -0,0 +1,73 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from classes.metricsregistry import MetricsRegistry
+
+
+class MetricsServer:
+    """
+    This class exports the metrics of a MetricsRegistry on a local HTTP server (GET '/metrics', Prometheus text
+    format). The server runs in a background thread.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, registry: MetricsRegistry, host="127.0.0.1", port=9464):
+        """
+        Parametrized constructor method.
+
+        :param registry: MetricsRegistry object with the exported metrics.
+        :param host: (Optional, Default=127.0.0.1) Address where the server listens.
+        :param port: (Optional, Default=9464) Port where the server listens.
+        """
+
+        self.registry = registry
+        self.HOST = host
+        self.PORT = port
+
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the server thread.
+        """
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = registry.render().encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", MetricsServer.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                # The scrapes are not logged
+                pass
+
+        self._server = ThreadingHTTPServer((self.HOST, self.PORT), Handler)
+        self._server.daemon_threads = True
+
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer")
+        self._thread.daemon = True
+        self._thread.start()
+
+        print("[MetricsServer] Metrics available on http://{}:{}/metrics".format(self.HOST, self._server.server_port))
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,3 +1,6 @@
+from functools import partial
+from types import SimpleNamespace
+
 from telegram import ParseMode
 
 
@@ -24,6 +27,9 @@ class Notifier:
     MODEL_EMOJI = "👧"
     CATEGORY_EMOJI = "🗃️"
 
+    # Shared MessageQueue used to send the messages in background (None = messages are sent immediately)
+    MESSAGE_QUEUE = None
+
     def __init__(self, update, bot, send_video_timeout=80):
         """
         Parametrized constructor method.
@@ -37,6 +43,20 @@ class Notifier:
         self.bot = bot
         self.VIDEO_TIMEOUT = send_video_timeout
 
+    @classmethod
+    def from_chat_id(cls, chat_id, bot, send_video_timeout=80):
+        """
+        Creates a Notifier without a Telegram update (ex: jobs resumed after a restart).
+
+        :param chat_id: Chat id of the user.
+        :param bot: Telegram.ext.Bot object used to send the messages.
+        :param send_video_timeout: (Optional, Default=80) Timeout in seconds used for sending the videos.
+        :return: Notifier object.
+        """
+
+        message = SimpleNamespace(chat_id=chat_id, reply_text=partial(bot.send_message, chat_id))
+        return cls(SimpleNamespace(message=message), bot, send_video_timeout)
+
     def _notify(self, message, silent=False):
         """
         This private method is the base for all the message notifiers, it send a message to a specific
@@ -47,7 +67,38 @@ class Notifier:
         message is receives, otherwise the notification will be send in "silent mode" (no notification sound)
         """
 
-        self.update.message.reply_text(message, parse_mode=ParseMode.HTML, disable_notification=silent)
+        if self.MESSAGE_QUEUE is not None:
+            self.MESSAGE_QUEUE.send(self.get_chat_id(), message, parse_mode=ParseMode.HTML, silent=silent)
+        else:
+            self.update.message.reply_text(message, parse_mode=ParseMode.HTML, disable_notification=silent)
+
+    def send_editable(self, message, callback):
+        """
+        Sends a message that will be edited later (see 'edit_message').
+
+        :param message: Message to send to the user.
+        :param callback: Function called with the sent Telegram.Message object (it contains the message id).
+        """
+
+        if self.MESSAGE_QUEUE is not None:
+            self.MESSAGE_QUEUE.send(self.get_chat_id(), message, parse_mode=ParseMode.HTML, silent=True,
+                                    callback=callback)
+        else:
+            callback(self.update.message.reply_text(message, parse_mode=ParseMode.HTML, disable_notification=True))
+
+    def edit_message(self, message_id, message):
+        """
+        Replaces the text of a message already sent to the user.
+
+        :param message_id: Id of the message to edit.
+        :param message: New message text.
+        """
+
+        if self.MESSAGE_QUEUE is not None:
+            self.MESSAGE_QUEUE.edit(self.get_chat_id(), message_id, message, parse_mode=ParseMode.HTML)
+        else:
+            self.bot.edit_message_text(message, chat_id=self.get_chat_id(), message_id=message_id,
+                                       parse_mode=ParseMode.HTML)
 
     def notify_error(self, message):
         """
@@ -177,3 +228,10 @@ class Notifier:
 
     def get_session(self):
         return self.update
+
+    def get_chat_id(self):
+        """
+        :return: Chat id of the user that receives the messages.
+        """
+
+        return self.update.message.chat_id
@@ -0,0 +1,160 @@
+import itertools
+import threading
+from types import SimpleNamespace
+
+from classes.notifier import Notifier
+
+
+class NotifierGroup(Notifier):
+    """
+    This class sends the same notifications to a group of users. It's used when more users requested the same
+    video: the download job is shared and every message is sent to all the users.
+
+    Every user has its own copy of the editable messages (ex: progress message), the group translates its
+    message ids to the message ids of every chat. A user added later receives the latest text of the editable
+    messages and the uploader response (if the video has already been uploaded).
+    """
+
+    # Used to generate the group message ids
+    _ID_COUNTER = itertools.count(1)
+
+    def __init__(self, notifier: Notifier):
+        """
+        Parametrized constructor method.
+
+        :param notifier: Notifier of the user that requested the video first (owner of the group).
+        """
+
+        super().__init__(notifier.update, notifier.bot, notifier.VIDEO_TIMEOUT)
+
+        self._notifiers = [notifier]
+        self._lock = threading.Lock()
+
+        # Editable messages: <group message id>: latest text
+        self._texts = {}
+
+        # Message ids of every chat: <group message id>: {<chat id>: message id}
+        self._message_ids = {}
+
+        # Uploader response sent to the group (sent again to the users added later)
+        self._uploader_response = None
+
+    def add(self, notifier: Notifier):
+        """
+        Adds a user to the group.
+
+        :param notifier: Notifier of the user.
+        :return: True if the user has been added, False if it's already in the group.
+        """
+
+        with self._lock:
+            if any(added.get_chat_id() == notifier.get_chat_id() for added in self._notifiers):
+                return False
+
+            self._notifiers.append(notifier)
+            texts = dict(self._texts)
+            uploader_response = self._uploader_response
+
+        for group_id, text in texts.items():
+            self._send_copy(notifier, group_id, text)
+
+        if uploader_response is not None:
+            notifier.notify_uploader_response(uploader_response)
+
+        return True
+
+    def remove(self, chat_id) -> bool:
+        """
+        Removes a user from the group (the owner can't be removed if it's the only user).
+
+        :param chat_id: Chat id of the user.
+        :return: True if the user has been removed, otherwise False.
+        """
+
+        with self._lock:
+            remaining = [notifier for notifier in self._notifiers if notifier.get_chat_id() != chat_id]
+
+            if not remaining or len(remaining) == len(self._notifiers):
+                return False
+
+            self._notifiers = remaining
+
+            # The first remaining user becomes the owner
+            self.update = remaining[0].update
+            return True
+
+    def get_notifiers(self) -> list:
+        """
+        :return: List of the Notifier objects of the users in the group.
+        """
+
+        with self._lock:
+            return list(self._notifiers)
+
+    def get_sessions(self) -> list:
+        """
+        :return: List of the Telegram.ext.Update objects of the users in the group.
+        """
+
+        return [notifier.get_session() for notifier in self.get_notifiers()]
+
+    def get_chat_ids(self) -> list:
+        """
+        :return: List of the chat ids of the users in the group.
+        """
+
+        return [notifier.get_chat_id() for notifier in self.get_notifiers()]
+
+    def _notify(self, message, silent=False):
+        for notifier in self.get_notifiers():
+            notifier._notify(message, silent=silent)
+
+    def notify_uploader_response(self, response: dict):
+        with self._lock:
+            self._uploader_response = response
+
+        super().notify_uploader_response(response)
+
+    def send_editable(self, message, callback):
+        """
+        Sends an editable message to all the users. The callback receives an object with the group message id.
+        """
+
+        group_id = next(self._ID_COUNTER)
+
+        with self._lock:
+            self._texts[group_id] = message
+            self._message_ids[group_id] = {}
+
+        for notifier in self.get_notifiers():
+            self._send_copy(notifier, group_id, message)
+
+        callback(SimpleNamespace(message_id=group_id))
+
+    def edit_message(self, message_id, message):
+        with self._lock:
+            self._texts[message_id] = message
+            sent = dict(self._message_ids.get(message_id, {}))
+
+        for notifier in self.get_notifiers():
+            chat_message_id = sent.get(notifier.get_chat_id())
+
+            # Messages still in the queue are updated when they are sent (see '_send_copy')
+            if chat_message_id is not None:
+                notifier.edit_message(chat_message_id, message)
+
+    def _send_copy(self, notifier: Notifier, group_id, message):
+        """
+        Sends the copy of an editable message to a user.
+        """
+
+        def on_sent(sent):
+            with self._lock:
+                self._message_ids[group_id][notifier.get_chat_id()] = sent.message_id
+                latest = self._texts[group_id]
+
+            # The message has been edited while it was in the queue
+            if latest != message:
+                notifier.edit_message(sent.message_id, latest)
+
+        notifier.send_editable(message, on_sent)
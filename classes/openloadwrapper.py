@@ -1,34 +1,48 @@
 import os
 import requests
-import time
 from openload import OpenLoad
-from openload.api_exceptions import FileNotFoundException
 from requests_toolbelt.multipart import encoder
 
+from classes.chunkeduploader import ChunkedUploader
+from classes.uploaderapi import UploaderApi
 
-class OpenloadWrapper(OpenLoad):
+
+class OpenloadWrapper(UploaderApi, OpenLoad):
     """
     This class is more than an "extender" than a "wrapper". In fact this class extends OpenLoad class adding two more methods.
+    The methods shared with the VeryStreamWrapper are in the UploaderApi class.
     """
 
+    NAME = "OpenloadWrapper"
+
     def failed_conversions(self):
         pass
 
-    def __init__(self, username: str, key: str):
+    def __init__(self, username: str, key: str, upload_parallelism=4,
+                 upload_chunk_size=ChunkedUploader.DEFAULT_CHUNK_SIZE, chunked_upload=False):
         """
         Parametrized constructor method.
 
         :param username: API username that will be used to login on OpenLoad.co
         :param key: API key that will be used to login on OpenLoad.co
+        :param upload_parallelism: (Optional, Default=4) Default number of chunks uploaded at the same time.
+        :param upload_chunk_size: (Optional, Default=8MB) Size in bytes of the uploaded chunks.
+        :param chunked_upload: (Optional, Default=False) If it's true the files are uploaded in chunks (the host
+        must support the chunked uploads).
         """
 
         # Call superclass constructor
-        super(OpenloadWrapper, self).__init__(username, key)
+        super(OpenloadWrapper, self).__init__(
+            username, key, upload_parallelism=upload_parallelism, upload_chunk_size=upload_chunk_size,
+            chunked_upload=chunked_upload
+        )
 
-    def upload_large_file(self, file_path, **kwargs):
+    def upload_large_file(self, file_path, throttle=None, **kwargs):
         """
         This method is used to upload large files on OpenLoad (not used yet)
         :param file_path: Path to the file to upload to OpenLoad.co
+        :param throttle: (Optional, Default=None) Function called with the number of bytes read from the file, it
+        can wait to limit the upload speed (ex: BandwidthChannel.consume).
         """
 
         response = self.upload_link(**kwargs)
@@ -36,38 +50,14 @@ class OpenloadWrapper(OpenLoad):
         upload_url = response['url']
         _, file_name = os.path.split(file_path)
         with open(file_path, 'rb') as upload_file:
-            data = encoder.MultipartEncoder({
+            data = ChunkedUploader.monitor(encoder.MultipartEncoder({
                 "files": (file_name, upload_file, "application/octet-stream"),
-            })
-        headers = {"Prefer": "respond-async", "Content-Type": data.content_type}
-        response_json = requests.post(upload_url, headers=headers, data=data).json()
-        self._check_status(response_json)
-
-        return response_json['result']
-
-    def get_thumbnail_when_ready(self, media_id, delay, threshold=0.0):
-        """
-        This method is used to get the thumbnail image url when it's ready on OpenLoad.co.
-
-        :param media_id: Media id that identifies the video.
-        :param delay: Delay between retries.
-        :param threshold: Adds a little margin to the delay, its default value is 0.25.
-        :return Url as string object where you can download the thumbnail image generated by OpenLoad.co.
-        """
+            }), throttle=throttle)
 
-        print("[OpenloadWrapper] Waiting {} seconds for thumbnail generation".format(delay))
-        time.sleep(delay + (delay * threshold))
+            # The file must be open while it's sent
+            headers = {"Prefer": "respond-async", "Content-Type": data.content_type}
+            response_json = requests.post(upload_url, headers=headers, data=data).json()
 
-        try:
-            url = self.splash_image(media_id)
-
-            if url is None or url == "None":
-                print("[OpenloadWrapper] Thumbnail request returned None. Retry...")
-                raise FileNotFoundException("None returned by OpenLoad, need to wait a bit more")
-            else:
-                print("[OpenLoadWrapper] Found a url: {} Type of: {}".format(url, type(url)))
-                return url
+        self._check_status(response_json)
 
-        except FileNotFoundException:
-            print("[OpenloadWrapper] Thumbnail not ready yet")
-            self.get_thumbnail_when_ready(media_id, delay)
+        return response_json['result']
@@ -1,11 +1,81 @@
 import cv2
 import datetime
 import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8: the frames are sent back to the parent process pickled
+    shared_memory = None
 
 
 class PreviewGenerator:
 
-    def generate_preview(self, video_path, save_path) -> dict:
+    # Seek modes
+    # frame: exact frame (OpenCV decodes from the previous keyframe, slow on long videos)
+    # timestamp: seek by timestamp (faster on most containers, can be a few frames off)
+    # keyframe: nearest keyframe before the position, only that frame is decoded (requires ffmpeg)
+    SEEK_FRAME, SEEK_TIMESTAMP, SEEK_KEYFRAME = "frame", "timestamp", "keyframe"
+
+    # Frame selection modes
+    # uniform: frames at the same distance one from another
+    # scene: the most different non-blank frames between some low resolution candidates
+    SELECTION_UNIFORM, SELECTION_SCENE = "uniform", "scene"
+
+    # Scale of the frames in the preview (percent of original size)
+    SCALE_PERCENT = 30
+
+    # Size of the low resolution candidates used by the scene selection
+    CANDIDATE_SIZE = (64, 36)
+
+    # Candidates with a mean luma outside this range or a lower luma deviation are considered blank
+    BLANK_LUMA_RANGE = (16, 240)
+    BLANK_MIN_DEVIATION = 8
+
+    def __init__(self, seek_mode=SEEK_FRAME, workers=0, selection=SELECTION_UNIFORM, selection_budget=3.0,
+                 candidates=36):
+        """
+        Parametrized constructor method.
+
+        :param seek_mode: (Optional, Default=frame) How the frames are reached in the video (frame, timestamp
+        or keyframe).
+        :param workers: (Optional, Default=0) Number of processes used to extract the frames. If it's 0 the
+        frames are extracted one after another in the calling thread.
+        :param selection: (Optional, Default=uniform) How the frames are chosen (uniform or scene).
+        :param selection_budget: (Optional, Default=3) Max number of seconds spent sampling the candidates of
+        the scene selection (the missing frames are chosen uniformly).
+        :param candidates: (Optional, Default=36) Number of candidates sampled by the scene selection.
+        """
+
+        self.workers = workers
+        self.selection = selection
+        self.selection_budget = selection_budget
+        self.candidates = candidates
+        self._pool = None
+
+        if seek_mode == self.SEEK_KEYFRAME and shutil.which("ffmpeg") is None:
+            print("[PreviewGenerator] ffmpeg not found, using the timestamp seek mode")
+            seek_mode = self.SEEK_TIMESTAMP
+
+        self.seek_mode = seek_mode
+
+    def generate_preview(self, video_path, save_path, on_frame=None) -> dict:
+        """
+        Generates a preview of 9 frames of the video (3x3 grid).
+
+        :param video_path: Path of the video.
+        :param save_path: Folder where the preview is saved.
+        :param on_frame: (Optional, Default=None) Function called with (extracted frames, total frames) while
+        the frames are extracted.
+        :return: {"path": preview path, "seconds": generation time}
+        """
+
         print("[PreviewGenerator] Generating preview")
         start = datetime.datetime.now()
 
@@ -14,11 +84,35 @@ class PreviewGenerator:
 
         # Get total frames
         tot_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
         print("[PreviewGenerator] Total frames:", tot_frames)
 
         # Get 9 frames in the video
         num_images = 9
-        images = [self._get_frame(cap, i * int(tot_frames / num_images)) for i in range(num_images)]
+
+        if self.selection == self.SELECTION_SCENE and tot_frames > num_images:
+            positions = self._select_scene_frames(cap, video_path, tot_frames, fps, num_images)
+        else:
+            positions = [i * int(tot_frames / num_images) for i in range(num_images)]
+
+        if self.workers > 0:
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) * self.SCALE_PERCENT / 100)
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) * self.SCALE_PERCENT / 100)
+            cap.release()
+
+            images = self._get_frames_parallel(video_path, positions, fps, (height, width, 3))
+
+            if on_frame is not None:
+                on_frame(len(images), num_images)
+        else:
+            images = []
+            for position in positions:
+                images.append(self._get_frame(cap, video_path, position, fps))
+
+                if on_frame is not None:
+                    on_frame(len(images), num_images)
+
+            cap.release()
 
         # Create 3 horizontal images
         h1 = cv2.hconcat(images[0:3])
@@ -41,6 +135,70 @@ class PreviewGenerator:
             "seconds": diff_seconds
         }
 
+    def shutdown(self):
+        """
+        Stops the worker processes (if started).
+        """
+
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_frames_parallel(self, video_path, positions, fps, shape):
+        """
+        Extracts the frames using the worker processes: every worker opens its own capture, extracts its share
+        of the frames and writes them (already downscaled) in a shared memory block. The parent process only
+        reads the frames from the shared memory.
+
+        :param video_path: Path of the video.
+        :param positions: Frame numbers to extract.
+        :param fps: Video frames per second.
+        :param shape: Shape of a downscaled frame (height, width, channels).
+        :return: List of frames (None if a frame can't be read).
+        """
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        # Split the frames between the workers (slot in the shared block, frame number)
+        jobs = list(enumerate(positions))
+        shares = [jobs[i::self.workers] for i in range(self.workers) if jobs[i::self.workers]]
+
+        if shared_memory is None:
+            futures = [
+                self._pool.submit(_extract_frames, video_path, None, shape, self.seek_mode, fps, share)
+                for share in shares
+            ]
+
+            images = [None] * len(positions)
+            for future in futures:
+                for slot, frame in future.result():
+                    images[slot] = frame
+
+            return images
+
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(positions) * int(np.prod(shape))))
+
+        try:
+            futures = [
+                self._pool.submit(_extract_frames, video_path, block.name, shape, self.seek_mode, fps, share)
+                for share in shares
+            ]
+
+            extracted = set()
+            for future in futures:
+                extracted.update(slot for slot, _ in future.result())
+
+            frames = np.ndarray((len(positions),) + tuple(shape), dtype=np.uint8, buffer=block.buf)
+            images = [frames[slot].copy() if slot in extracted else None for slot in range(len(positions))]
+            del frames
+
+            return images
+
+        finally:
+            block.close()
+            block.unlink()
+
     @staticmethod
     def _save_img(image, save_path):
         print("[PreviewGenerator] Saving preview in: {}".format(save_path))
@@ -59,18 +217,205 @@ class PreviewGenerator:
 
         return full_path
 
-    @staticmethod
-    def _get_frame(cap, frame_num):
+    def _select_scene_frames(self, cap, video_path, tot_frames, fps, num_images) -> list:
+        """
+        Chooses the preview frames between some low resolution candidates: blank frames (black, white or flat)
+        are discarded and the most different frames (luma histogram distance) are chosen. The candidates are
+        sampled until the time budget runs out, the missing frames are chosen uniformly.
+
+        :param cap: VideoCapture object of the video.
+        :param video_path: Path of the video.
+        :param tot_frames: Total number of frames.
+        :param fps: Video frames per second.
+        :param num_images: Number of frames to choose.
+        :return: Sorted list of frame numbers.
+        """
+
+        deadline = time.monotonic() + self.selection_budget
+
+        # Candidates evenly spaced (skipping the first and last 2% of the video: intros, credits, fades)
+        first, last = int(tot_frames * 0.02), int(tot_frames * 0.98)
+        count = max(num_images, self.candidates)
+        candidates = [first + int(i * (last - first) / count) for i in range(count)]
+
+        positions, samples = [], []
+        for position in candidates:
+            if time.monotonic() > deadline:
+                print("[PreviewGenerator] Selection budget exceeded after {} candidates".format(len(samples)))
+                break
+
+            frame = self._read_frame(cap, video_path, position, fps)
+
+            if frame is not None:
+                small = cv2.resize(frame, self.CANDIDATE_SIZE, interpolation=cv2.INTER_AREA)
+                samples.append(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).ravel())
+                positions.append(position)
+
+        chosen = self.choose_distinct(np.array(samples, dtype=np.uint8), num_images) if samples else []
+        selected = [positions[i] for i in chosen]
+
+        # Fill the missing frames uniformly
+        uniform = [i * int(tot_frames / num_images) for i in range(num_images)]
+        missing = num_images - len(selected)
+        selected += [position for position in uniform if position not in selected][:missing]
+        selected += uniform[:num_images - len(selected)]
+
+        print("[PreviewGenerator] Selected frames:", sorted(selected))
+        return sorted(selected)
+
+    @classmethod
+    def choose_distinct(cls, samples, count) -> list:
+        """
+        Chooses the most different non-blank samples (greedy farthest point on the luma histograms).
+        All the samples are processed in a single batch with NumPy.
+
+        :param samples: Array (samples, pixels) of grayscale low resolution frames.
+        :param count: Number of samples to choose.
+        :return: Indexes of the chosen samples (max 'count', less if there aren't enough non-blank samples).
+        """
+
+        mean = samples.mean(axis=1)
+        deviation = samples.std(axis=1)
+        low, high = cls.BLANK_LUMA_RANGE
+        valid = np.flatnonzero((mean > low) & (mean < high) & (deviation > cls.BLANK_MIN_DEVIATION))
+
+        if len(valid) <= count:
+            return valid.tolist()
+
+        # Normalized 16 bins luma histograms of all the samples
+        bins = 16
+        indexes = samples[valid].astype(np.int64) * bins // 256 + np.arange(len(valid))[:, None] * bins
+        histograms = np.bincount(indexes.ravel(), minlength=len(valid) * bins).reshape(len(valid), bins)
+        histograms = histograms / samples.shape[1]
+
+        # Distance between every pair of samples (L1 histogram distance + mean luma difference)
+        distances = np.abs(histograms[:, None, :] - histograms[None, :, :]).sum(axis=2)
+        distances += np.abs(mean[valid][:, None] - mean[valid][None, :]) / 255
+
+        # Start from the most detailed sample, then add the sample farthest from the chosen ones
+        chosen = [int(np.argmax(deviation[valid]))]
+        min_distance = distances[chosen[0]].copy()
+
+        while len(chosen) < count:
+            min_distance[chosen] = -1
+            following = int(np.argmax(min_distance))
+            chosen.append(following)
+            min_distance = np.minimum(min_distance, distances[following])
+
+        return [int(valid[i]) for i in chosen]
+
+    def _get_frame(self, cap, video_path, frame_num, fps):
         print("n frame: ", frame_num)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-        ret, frame = cap.read()
+
+        frame = self._read_frame(cap, video_path, frame_num, fps)
 
         if frame is not None:
-            scale_percent = 30  # percent of original size
-            width = int(frame.shape[1] * scale_percent / 100)
-            height = int(frame.shape[0] * scale_percent / 100)
-            dim = (width, height)
-            # resize image
-            return cv2.resize(frame, dim, interpolation=cv2.INTER_AREA)
+            return self._resize(frame)
+        else:
+            return frame
+
+    def _read_frame(self, cap, video_path, frame_num, fps):
+        """
+        Reads a full size frame using the selected seek mode.
+
+        :return: Frame or None if it can't be read.
+        """
+
+        if self.seek_mode == self.SEEK_KEYFRAME and fps > 0:
+            frame = self._get_keyframe(video_path, frame_num / fps)
+
+            if frame is not None:
+                return frame
+
+            print("[PreviewGenerator] Keyframe seek failed, using the timestamp seek")
+
+        if self.seek_mode != self.SEEK_FRAME and fps > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, frame_num * 1000 / fps)
         else:
-            return frame
\ No newline at end of file
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+
+        ret, frame = cap.read()
+        return frame
+
+    @staticmethod
+    def _get_keyframe(video_path, seconds):
+        """
+        Decodes only the keyframe before the requested position using ffmpeg (input seeking without
+        accurate seek, so the frames between the keyframe and the position are not decoded).
+
+        :param video_path: Path of the video.
+        :param seconds: Requested position in seconds.
+        :return: Decoded frame or None if ffmpeg failed.
+        """
+
+        command = [
+            "ffmpeg", "-loglevel", "error",
+            "-noaccurate_seek", "-ss", "{:.3f}".format(seconds), "-i", video_path,
+            "-an", "-sn", "-frames:v", "1",
+            "-f", "image2pipe", "-vcodec", "bmp", "-"
+        ]
+
+        try:
+            output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60).stdout
+        except (OSError, subprocess.TimeoutExpired) as ex:
+            print("[PreviewGenerator] ffmpeg error:", str(ex))
+            return None
+
+        if not output:
+            return None
+
+        return cv2.imdecode(np.frombuffer(output, np.uint8), cv2.IMREAD_COLOR)
+
+    def _resize(self, frame):
+        width = int(frame.shape[1] * self.SCALE_PERCENT / 100)
+        height = int(frame.shape[0] * self.SCALE_PERCENT / 100)
+        dim = (width, height)
+        # resize image
+        return cv2.resize(frame, dim, interpolation=cv2.INTER_AREA)
+
+
+def _extract_frames(video_path, block_name, shape, seek_mode, fps, jobs):
+    """
+    Worker process function: extracts some frames of a video with its own capture.
+
+    :param video_path: Path of the video.
+    :param block_name: Name of the shared memory block where the frames are written (None = frames returned).
+    :param shape: Shape of a downscaled frame (height, width, channels).
+    :param seek_mode: PreviewGenerator seek mode.
+    :param fps: Video frames per second.
+    :param jobs: List of (slot, frame number) to extract.
+    :return: List of (slot, frame) of the extracted frames (frame is None when written in the shared memory).
+    """
+
+    generator = PreviewGenerator(seek_mode=seek_mode)
+    cap = cv2.VideoCapture(video_path)
+    block = shared_memory.SharedMemory(name=block_name) if block_name is not None else None
+
+    try:
+        if block is not None:
+            frames = np.ndarray((block.size // int(np.prod(shape)),) + tuple(shape), dtype=np.uint8, buffer=block.buf)
+
+        extracted = []
+        for slot, frame_num in jobs:
+            frame = generator._get_frame(cap, video_path, frame_num, fps)
+
+            if frame is None:
+                continue
+
+            if frame.shape != tuple(shape):
+                frame = cv2.resize(frame, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+
+            if block is not None:
+                frames[slot] = frame
+                extracted.append((slot, None))
+            else:
+                extracted.append((slot, frame))
+
+        return extracted
+
+    finally:
+        cap.release()
+
+        if block is not None:
+            del frames
+            block.close()
@@ -0,0 +1,213 @@
+import threading
+import time
+
+from classes.metrics import Metrics
+
+
+class ProgressMessage:
+    """
+    This class shows the progress of a download job in a single message that is edited in place
+    (stage, percentage, downloaded bytes, speed and ETA). The message is edited at most once every
+    'interval' seconds to avoid the Telegram flood limits.
+
+    The duration of every completed stage is saved in the stage duration metric.
+    """
+
+    # Job stages
+    DOWNLOAD, CONVERT, UPLOAD, PREVIEW, DONE = "download", "convert", "upload", "preview", "done"
+
+    # Waiting for the thumbnail generated by the uploader
+    THUMBNAIL = "thumbnail"
+
+    STAGE_NAMES = {
+        DOWNLOAD: "⬇️ Downloading",
+        CONVERT: "🔄 Converting",
+        UPLOAD: "⬆️ Uploading",
+        PREVIEW: "🖼️ Generating preview",
+        THUMBNAIL: "⏳ Waiting for the thumbnail",
+        DONE: "✅ Completed",
+    }
+
+    def __init__(self, notifier, interval=3.0):
+        """
+        Parametrized constructor method.
+
+        :param notifier: Notifier object of the user that receives the message.
+        :param interval: (Optional, Default=3) Min number of seconds between two message edits.
+        """
+
+        self.notifier = notifier
+        self.INTERVAL = interval
+
+        self.stage = self.DOWNLOAD
+        self.stage_start = time.monotonic()
+        self._measured = True
+        self.downloaded_bytes = None
+        self.total_bytes = None
+        self.speed = None
+        self.eta = None
+
+        # Id of the sent message (None until Telegram returns the sent message)
+        self.message_id = None
+        self._sending = False
+        self._last_update = 0
+        self._shown_text = None
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage: str):
+        """
+        Changes the current stage (the message is updated immediately).
+
+        :param stage: New stage (DOWNLOAD, CONVERT, UPLOAD, PREVIEW, THUMBNAIL or DONE).
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            previous, elapsed, measured = self.stage, now - self.stage_start, self._measured
+
+            self.stage = stage
+            self.stage_start = now
+            self._measured = True
+            self.downloaded_bytes = self.total_bytes = self.speed = self.eta = None
+
+        if measured and previous != stage and previous != self.DONE:
+            Metrics.STAGE_DURATION.labels(previous).observe(elapsed)
+
+        self._refresh(force=True)
+
+    def reset_timer(self):
+        """
+        Starts measuring the current stage again (the time spent before, ex: in the job queue, is not counted in
+        the stage duration and in the average speed).
+        """
+
+        with self._lock:
+            self.stage_start = time.monotonic()
+
+    def discard_timer(self):
+        """
+        The duration of the current stage will not be saved in the metrics (ex: the download has been skipped
+        because the video was already uploaded).
+        """
+
+        with self._lock:
+            self._measured = False
+
+    def update(self, downloaded_bytes=None, total_bytes=None, speed=None, eta=None):
+        """
+        Updates the progress of the current stage (the message is edited only if 'interval' seconds
+        passed since the last edit).
+
+        :param downloaded_bytes: (Optional) Bytes transferred.
+        :param total_bytes: (Optional) Total bytes to transfer.
+        :param speed: (Optional) Speed in bytes per second (if missing the average speed of the stage is used).
+        :param eta: (Optional) Estimated remaining seconds (if missing it's calculated using the speed).
+        """
+
+        elapsed = time.monotonic() - self.stage_start
+
+        if speed is None and downloaded_bytes and elapsed > 0:
+            speed = downloaded_bytes / elapsed
+
+        if eta is None and speed and total_bytes and downloaded_bytes is not None:
+            eta = max(0, total_bytes - downloaded_bytes) / speed
+
+        with self._lock:
+            self.downloaded_bytes = downloaded_bytes
+            self.total_bytes = total_bytes
+            self.speed = speed
+            self.eta = eta
+
+        self._refresh()
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+
+        with self._lock:
+            if not force and now - self._last_update < self.INTERVAL:
+                return
+
+            if self.message_id is None and self._sending:
+                # The first message is still in the queue, the next update will show the latest progress
+                return
+
+            text = self.render()
+
+            if text == self._shown_text:
+                # Telegram refuses edits that don't change the message
+                return
+
+            self._last_update = now
+            self._shown_text = text
+
+            if self.message_id is None:
+                self._sending = True
+                send = True
+            else:
+                send = False
+
+        if send:
+            self.notifier.send_editable(text, self._on_sent)
+        else:
+            self.notifier.edit_message(self.message_id, text)
+
+    def _on_sent(self, message):
+        with self._lock:
+            self.message_id = message.message_id
+
+        # Show the changes done while the first message was in the queue (ex: the last stage)
+        self._refresh(force=True)
+
+    def render(self) -> str:
+        """
+        :return: Text of the progress message.
+        """
+
+        lines = [self.STAGE_NAMES.get(self.stage, self.stage)]
+
+        if self.downloaded_bytes is not None:
+            if self.total_bytes:
+                lines[0] += " {:.1f}%".format(self.downloaded_bytes * 100 / self.total_bytes)
+                lines.append("📦 {} / {}".format(self.format_bytes(self.downloaded_bytes),
+                                                 self.format_bytes(self.total_bytes)))
+            else:
+                lines.append("📦 {}".format(self.format_bytes(self.downloaded_bytes)))
+
+        if self.speed:
+            lines.append("🚀 {}/s".format(self.format_bytes(self.speed)))
+
+        if self.eta is not None:
+            lines.append("⏱️ ETA {}".format(self.format_seconds(self.eta)))
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def format_bytes(size) -> str:
+        """
+        :param size: Size in bytes.
+        :return: Human readable size (ex: 12.3 MB).
+        """
+
+        size = float(size)
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024:
+                return "{:.1f} {}".format(size, unit)
+            size /= 1024
+
+        return "{:.1f} TB".format(size)
+
+    @staticmethod
+    def format_seconds(seconds) -> str:
+        """
+        :param seconds: Number of seconds.
+        :return: Time in hh:mm:ss (or mm:ss) format.
+        """
+
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+
+        if hours:
+            return "{:d}:{:02d}:{:02d}".format(hours, minutes, seconds)
+
+        return "{:02d}:{:02d}".format(minutes, seconds)
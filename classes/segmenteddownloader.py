@@ -0,0 +1,237 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SegmentedDownloader:
+    """
+    This class downloads a file over more connections at the same time. The server is probed (HEAD request or
+    'Range: bytes=0-0' request): if it supports ranges the file is preallocated and split in segments, every
+    segment is downloaded by its own connection and written at its offset. Otherwise the file is downloaded
+    with a single stream.
+
+    Interrupted segments are retried from the last written byte. If the server answers a segment request with
+    the whole file (HTTP 200 instead of 206) the file is downloaded again with a single stream.
+    """
+
+    # Bytes read at once from every connection
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, segments=4, min_segment_size=4 * 1024 * 1024, retries=3, timeout=30, throttle=None):
+        """
+        Parametrized constructor method.
+
+        :param segments: (Optional, Default=4) Max number of connections (segments) used for a file.
+        :param min_segment_size: (Optional, Default=4MB) Min size in bytes of every segment.
+        :param retries: (Optional, Default=3) Max number of attempts for every segment.
+        :param timeout: (Optional, Default=30) Timeout in seconds of every request.
+        :param throttle: (Optional, Default=None) Function called with the size of every chunk received, it can
+        wait to limit the download speed (ex: BandwidthChannel.consume).
+        """
+
+        self.SEGMENTS = max(1, int(segments))
+        self.MIN_SEGMENT_SIZE = min_segment_size
+        self.RETRIES = retries
+        self.TIMEOUT = timeout
+        self.throttle = throttle
+
+        self._lock = threading.Lock()
+        self._aborted = threading.Event()
+        self._downloaded = 0
+
+    def download(self, url: str, file_path: str, progress=None) -> int:
+        """
+        Downloads a file.
+
+        :param url: Url of the file.
+        :param file_path: Path where the file is saved.
+        :param progress: (Optional, Default=None) Function called with (downloaded bytes, total bytes or None).
+        :return: Number of downloaded bytes.
+        """
+
+        with requests.Session() as session:
+            adapter = HTTPAdapter(pool_connections=self.SEGMENTS, pool_maxsize=self.SEGMENTS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            size, ranges = self._probe(session, url)
+            self._downloaded = 0
+
+            try:
+                if ranges and size >= 2 * self.MIN_SEGMENT_SIZE and self.SEGMENTS > 1:
+                    segments = min(self.SEGMENTS, size // self.MIN_SEGMENT_SIZE)
+                    print("[SegmentedDownloader] Downloading {} bytes with {} connections".format(size, segments))
+
+                    try:
+                        self._download_segments(session, url, file_path, size, segments, progress)
+                    except RangesRefused as ex:
+                        # The probe was wrong (ex: ranges supported only for the first bytes)
+                        print("[SegmentedDownloader] {}, downloading with a single stream".format(str(ex)))
+                        self._aborted.clear()
+                        self._downloaded = 0
+                        self._download_stream(session, url, file_path, size, progress)
+                else:
+                    print("[SegmentedDownloader] Ranges not supported or small file, downloading with a single stream")
+                    self._download_stream(session, url, file_path, size, progress)
+
+            except BaseException:
+                # Stop the other connections (ex: error or job killed)
+                self._aborted.set()
+                raise
+
+        return self._downloaded
+
+    def abort(self):
+        """
+        Stops the download (the 'download' method raises an exception).
+        """
+
+        self._aborted.set()
+
+    def _probe(self, session, url: str):
+        """
+        :return: (file size or None, True if the server supports ranges).
+        """
+
+        try:
+            response = session.head(url, allow_redirects=True, timeout=self.TIMEOUT)
+
+            if response.status_code == 200:
+                size = int(response.headers.get("Content-Length", 0)) or None
+                if size and response.headers.get("Accept-Ranges", "").lower() == "bytes":
+                    return size, True
+
+        except (requests.exceptions.RequestException, ValueError):
+            size = None
+
+        # Some servers don't answer HEAD requests or don't advertise the ranges
+        try:
+            with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.TIMEOUT) as response:
+                content_range = response.headers.get("Content-Range", "")
+
+                if response.status_code == 206 and "/" in content_range:
+                    total = content_range.rsplit("/", 1)[1]
+                    if total.isdigit():
+                        return int(total), True
+
+                if response.status_code == 200:
+                    size = int(response.headers.get("Content-Length", 0)) or size
+
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+
+        return size, False
+
+    def _download_segments(self, session, url: str, file_path: str, size: int, segments: int, progress=None):
+        # Preallocate the file, every segment is written at its offset
+        with open(file_path, "wb") as file:
+            file.truncate(size)
+
+        segment_size = size // segments
+        bounds = [
+            (i * segment_size, size - 1 if i == segments - 1 else (i + 1) * segment_size - 1)
+            for i in range(segments)
+        ]
+
+        executor = ThreadPoolExecutor(max_workers=segments, thread_name_prefix="Segment")
+
+        try:
+            futures = [
+                executor.submit(self._download_segment, session, url, file_path, start, end, size, progress)
+                for start, end in bounds
+            ]
+
+            for future in futures:
+                future.result()
+
+        except RangesRefused:
+            # The other segments must stop before the file is written again
+            self._aborted.set()
+            executor.shutdown(wait=True)
+            raise
+
+        finally:
+            executor.shutdown(wait=False)
+
+    def _download_segment(self, session, url: str, file_path: str, start: int, end: int, size: int, progress=None):
+        """
+        Downloads the bytes from 'start' to 'end' (included) and writes them at their offset.
+        """
+
+        position = start
+
+        with open(file_path, "r+b") as file:
+            for attempt in range(1, self.RETRIES + 1):
+                try:
+                    headers = {"Range": "bytes={}-{}".format(position, end)}
+
+                    with session.get(url, headers=headers, stream=True, timeout=self.TIMEOUT) as response:
+                        if response.status_code == 200:
+                            # Whole file sent, retrying the range is useless
+                            raise RangesRefused("Range request refused (HTTP 200)")
+
+                        if response.status_code != 206:
+                            raise IOError("Range request failed (HTTP {})".format(response.status_code))
+
+                        file.seek(position)
+
+                        for chunk in response.iter_content(self.CHUNK_SIZE):
+                            if self._aborted.is_set():
+                                raise IOError("Download aborted")
+
+                            chunk = chunk[:end + 1 - position]
+                            if self.throttle is not None:
+                                self.throttle(len(chunk))
+
+                            file.write(chunk)
+                            position += len(chunk)
+                            self._add_progress(len(chunk), size, progress)
+
+                            if position > end:
+                                break
+
+                    if position > end:
+                        return
+
+                    raise IOError("Connection closed at byte {}".format(position))
+
+                except (requests.exceptions.RequestException, IOError) as ex:
+                    if self._aborted.is_set() or attempt == self.RETRIES:
+                        raise
+
+                    print("[SegmentedDownloader] Segment {}-{} interrupted ({}), retrying from byte {}".format(
+                        start, end, str(ex), position)
+                    )
+                    time.sleep(attempt)
+
+    def _download_stream(self, session, url: str, file_path: str, size, progress=None):
+        with session.get(url, stream=True, timeout=self.TIMEOUT) as response:
+            response.raise_for_status()
+
+            with open(file_path, "wb") as file:
+                for chunk in response.iter_content(self.CHUNK_SIZE):
+                    if self._aborted.is_set():
+                        raise IOError("Download aborted")
+
+                    if self.throttle is not None:
+                        self.throttle(len(chunk))
+
+                    file.write(chunk)
+                    self._add_progress(len(chunk), size, progress)
+
+    def _add_progress(self, amount: int, size, progress=None):
+        # The progress function is never called by two connections at the same time
+        with self._lock:
+            self._downloaded += amount
+
+            if progress is not None:
+                progress(self._downloaded, size)
+
+
+class RangesRefused(Exception):
+    """
+    Raised when the server sends the whole file to a segment request (ranges not supported).
+    """
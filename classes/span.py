@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class Span:
+    """
+    This class represents a single step of a job (ex: upload) in the trace log: start and end time, transferred
+    bytes, outcome and some attributes. The span is written by its Tracer when it's finished.
+
+    A span without tracer does nothing, so the code can always create spans (tracing disabled).
+    """
+
+    # Outcomes
+    OK, ERROR = "ok", "error"
+
+    def __init__(self, tracer, trace_id: str, name: str, **attributes):
+        """
+        Parametrized constructor method.
+
+        :param tracer: Tracer object that writes the span (None = not written).
+        :param trace_id: Id of the job.
+        :param name: Name of the step (ex: download).
+        :param attributes: (Optional) Other fields saved in the span (ex: url).
+        """
+
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.name = name
+        self.attributes = attributes
+
+        self.start = time.time()
+        self.bytes = None
+        self.outcome = None
+
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set(self, **attributes):
+        """
+        Adds (or changes) some attributes of the span.
+        """
+
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def add_bytes(self, amount: int):
+        """
+        :param amount: Bytes transferred in this step.
+        """
+
+        with self._lock:
+            self.bytes = (self.bytes or 0) + amount
+
+    def finish(self, outcome=OK):
+        """
+        Ends the span and writes it (a span is written only once).
+
+        :param outcome: (Optional, Default=OK) Result of the step (ex: ok, error, timeout).
+        """
+
+        with self._lock:
+            if self.outcome is not None:
+                return
+
+            self.outcome = outcome
+            duration = time.monotonic() - self._started
+
+            record = {
+                "trace": self.trace_id,
+                "span": self.name,
+                "start": round(self.start, 3),
+                "end": round(self.start + duration, 3),
+                "duration": round(duration, 3),
+                "bytes": self.bytes,
+                "outcome": outcome
+            }
+            record.update(self.attributes)
+
+        if self.tracer is not None:
+            self.tracer.write(record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.set(error=exc_type.__name__)
+            self.finish(self.ERROR)
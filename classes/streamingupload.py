@@ -0,0 +1,108 @@
+import os
+import threading
+import uuid
+
+
+class StreamingUpload:
+    """
+    This class is used to upload a file while Youtube-DL is still writing it. It reads the file as it grows
+    and generates a multipart body that can be sent with a chunked HTTP request (requests library accepts
+    generators as request body).
+    """
+
+    # Size of every chunk read from the file
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, file_path: str, poll_interval=0.5, throttle=None):
+        """
+        Parametrized constructor method.
+
+        :param file_path: Path of the file that is being written by the downloader.
+        :param poll_interval: (Optional, Default=0.5) Seconds to wait when all the written data has been read.
+        :param throttle: (Optional, Default=None) Function called with the size of every chunk before it's sent,
+        it can wait to limit the upload speed (ex: BandwidthChannel.consume).
+        """
+
+        self.file_path = file_path
+        self.POLL_INTERVAL = poll_interval
+        self.throttle = throttle
+
+        # Bytes already sent to the uploader
+        self.bytes_read = 0
+
+        self._finished = threading.Event()
+        self._aborted = False
+
+    def finish(self):
+        """
+        Tells the reader that the downloader has finished writing the file, so it will stop at the end of the file.
+        """
+
+        self._finished.set()
+
+    def abort(self):
+        """
+        Tells the reader that the download failed. The upload request will be interrupted.
+        """
+
+        self._aborted = True
+        self._finished.set()
+
+    def iter_chunks(self):
+        """
+        Generator that returns the file content chunk by chunk, waiting for new data until the download finishes.
+        """
+
+        # Wait for the downloader to create the file
+        while not os.path.exists(self.file_path):
+            if self._aborted:
+                raise IOError("Download aborted before creating {}".format(self.file_path))
+
+            self._finished.wait(self.POLL_INTERVAL)
+
+        with open(self.file_path, 'rb') as f:
+            while True:
+                # Check the flag before reading, so the last read after the end of the download gets all the data
+                finished = self._finished.is_set()
+                data = f.read(self.CHUNK_SIZE)
+
+                if data:
+                    if self.throttle is not None:
+                        self.throttle(len(data))
+
+                    self.bytes_read += len(data)
+                    yield data
+                elif self._aborted:
+                    raise IOError("Download aborted, interrupting upload of {}".format(self.file_path))
+                elif finished:
+                    print("[StreamingUpload] Sent {} bytes of {}".format(self.bytes_read, self.file_path))
+                    return
+                else:
+                    self._finished.wait(self.POLL_INTERVAL)
+
+    def iter_multipart(self, field_name: str, file_name: str, boundary: str):
+        """
+        Generator that returns a multipart/form-data body with the file content.
+
+        :param field_name: Name of the form field.
+        :param file_name: Name of the uploaded file.
+        :param boundary: Multipart boundary (see 'generate_boundary').
+        """
+
+        yield (
+            "--{}\r\n"
+            "Content-Disposition: form-data; name=\"{}\"; filename=\"{}\"\r\n"
+            "Content-Type: application/octet-stream\r\n\r\n".format(boundary, field_name, file_name)
+        ).encode("utf-8")
+
+        yield from self.iter_chunks()
+
+        yield "\r\n--{}--\r\n".format(boundary).encode("utf-8")
+
+    @staticmethod
+    def generate_boundary() -> str:
+        """
+        :return: Random multipart boundary.
+        """
+
+        return uuid.uuid4().hex
@@ -1,17 +1,37 @@
 import logging
 import os
+import secrets
 import sys
 from functools import wraps
 from threading import Thread
 
 from telegram.ext import (Updater, CommandHandler, MessageHandler, Filters, ConversationHandler)
 
+from classes.asyncruntime import AsyncRuntime
+from classes.bandwidthgovernor import BandwidthGovernor
+from classes.dedupindex import DedupIndex
+from classes.downloadjob import DownloadJob
 from classes.downloadrequest import DownloadRequest
+from classes.jobscheduler import JobScheduler
+from classes.jobstore import JobStore
+from classes.messagequeue import MessageQueue
+from classes.metadatacache import MetadataCache
+from classes.metrics import Metrics
+from classes.metricsserver import MetricsServer
 from classes.notifier import Notifier
+from classes.notifiergroup import NotifierGroup
 from classes.openloadwrapper import OpenloadWrapper
+from classes.previewgenerator import PreviewGenerator
+from classes.progressmessage import ProgressMessage
+from classes.span import Span
 from classes.thumbnail import Thumbnail
+from classes.thumbnailestimator import ThumbnailEstimator
+from classes.thumbnailpoller import ThumbnailPoller
+from classes.tracer import Tracer
 from classes.urlchecker import UrlChecker
 from classes.verystreamwrapper import VeryStreamWrapper
+from classes.webhookserver import WebhookServer
+from classes.workerpool import WorkerPool
 
 LIST_OF_ADMINS = [238454100, 68736753]
 
@@ -74,9 +94,6 @@ class TelegramBot:
     # Thumbnails (<user_id>: <thumbnail_obj>)
     THUMBNAILS = {}
 
-    # Download processes (<user_id>: <download_process>)
-    DOWNLOAD_PROCESSES = {}
-
     def __init__(self, config: dict):
         """
         Parametrized constructor method.
@@ -105,16 +122,113 @@ class TelegramBot:
             self.UPLOADER = VeryStreamWrapper(
                 self.CONFIG["verystream_api_login"],
                 self.CONFIG["verystream_api_key"],
+                upload_parallelism=self.CONFIG.get("uploadParallelism", 4),
+                upload_chunk_size=self.CONFIG.get("uploadChunkSizeMB", 8) * 1024 * 1024,
+                chunked_upload=self.CONFIG.get("chunkedUploads", False),
                 timeout=self.CONFIG["videoTimeout"]
             )
         else:
             print("[TelegramBot] Selected OpenLoad uploader")
             # Create OpenLoadWrapper object
-            self.UPLOADER = OpenloadWrapper(self.CONFIG["openload_api_login"], self.CONFIG["openload_api_key"])
+            self.UPLOADER = OpenloadWrapper(
+                self.CONFIG["openload_api_login"],
+                self.CONFIG["openload_api_key"],
+                upload_parallelism=self.CONFIG.get("uploadParallelism", 4),
+                upload_chunk_size=self.CONFIG.get("uploadChunkSizeMB", 8) * 1024 * 1024,
+                chunked_upload=self.CONFIG.get("chunkedUploads", False)
+            )
+
+        # Create the preview generator shared by all the downloads
+        preview_options = {
+            "seek_mode": self.CONFIG.get("previewSeekMode", PreviewGenerator.SEEK_FRAME),
+            "selection": self.CONFIG.get("previewFrameSelection", PreviewGenerator.SELECTION_UNIFORM),
+            "selection_budget": self.CONFIG.get("previewSelectionBudgetSeconds", 3)
+        }
+        self.PREVIEW_GENERATOR = PreviewGenerator(workers=self.CONFIG.get("previewWorkers", 0), **preview_options)
+
+        # Run the metadata extractions and the previews in pre-forked worker processes, so they don't slow down
+        # the Telegram dispatcher (0 = in the job threads)
+        self.WORKER_POOL = None
+        if self.CONFIG.get("workerProcesses", 0):
+            self.WORKER_POOL = WorkerPool(
+                workers=self.CONFIG["workerProcesses"],
+                preview_options=preview_options,
+                task_timeout=self.CONFIG.get("workerTaskTimeout", 600)
+            )
+            self.PREVIEW_GENERATOR = self.WORKER_POOL
+
+        # URL checks settings (timeout and cache of the results)
+        UrlChecker.configure(
+            timeout=self.CONFIG.get("urlCheckTimeout", 5),
+            cache_ttl=self.CONFIG.get("urlCacheSeconds", 300)
+        )
+
+        # Create the cache of the metadata extracted by Youtube-DL (shared by all the downloads)
+        self.METADATA_CACHE = None
+        if self.CONFIG.get("metadataCache", True):
+            self.METADATA_CACHE = MetadataCache(
+                max_size=self.CONFIG.get("metadataCacheSize", 256),
+                ttl=self.CONFIG.get("metadataCacheSeconds", 600),
+                cache_dir=self.CONFIG.get("metadataCacheFolder"),
+                extractor_ttl=self.CONFIG.get("metadataCacheExtractorSeconds"),
+                worker_pool=self.WORKER_POOL
+            )
+
+        # Create the index of the uploaded videos (a video requested again is not downloaded again)
+        self.DEDUP_INDEX = None
+        if self.CONFIG.get("dedupUploads", False):
+            self.DEDUP_INDEX = DedupIndex(self.CONFIG.get("dedupIndexFile", "dedup.json"))
+
+        # Create the poller that waits for the thumbnails generated by the uploader (shared by all the downloads)
+        # (the time of the first check is learned from the previous thumbnails)
+        self.THUMBNAIL_POLLER = ThumbnailPoller(
+            initial_delay=self.CONFIG.get("thumbnailPollDelay", 15),
+            max_interval=self.CONFIG.get("thumbnailPollMaxInterval", 60),
+            deadline=self.CONFIG.get("thumbnailPollDeadline", 3600),
+            estimator=ThumbnailEstimator(
+                file_path=self.CONFIG.get("thumbnailModelFile", "thumbnail_model.json"),
+                default_delay=self.CONFIG.get("thumbnailPollDelay", 15)
+            )
+        )
+
+        # Create the governor that shares the bandwidth between the jobs (limits in KB/s, 0 = no limit)
+        self.BANDWIDTH_GOVERNOR = BandwidthGovernor(
+            download_rate=self.CONFIG.get("maxDownloadSpeedKB", 0) * 1024,
+            upload_rate=self.CONFIG.get("maxUploadSpeedKB", 0) * 1024
+        )
+
+        # Create the trace log of the jobs (time spent in every step, see 'python -m classes.tracesummary')
+        self.TRACER = None
+        if self.CONFIG.get("traceFile", ""):
+            self.TRACER = Tracer(
+                file_path=self.CONFIG["traceFile"],
+                max_bytes=self.CONFIG.get("traceMaxSizeMB", 10) * 1024 * 1024,
+                backup_count=self.CONFIG.get("traceBackups", 5)
+            )
+
+        # Create the scheduler that runs the download jobs of all the users
+        self.SCHEDULER = JobScheduler(
+            workers=self.CONFIG.get("maxConcurrentJobs", 2),
+            max_jobs_per_user=self.CONFIG.get("maxJobsPerUser", 3),
+            coalesce=self.CONFIG.get("coalesceRequests", True)
+        )
+
+        # Create the journal of the jobs (the jobs interrupted by a restart are resumed)
+        self.JOB_STORE = None
+        if self.CONFIG.get("resumeJobs", True):
+            self.JOB_STORE = JobStore(self.CONFIG.get("jobStoreFile", "jobs.db"))
+
+            # Restore the thumbnails of the last downloads
+            for chat_id, (data, local) in self.JOB_STORE.get_thumbnails().items():
+                self.THUMBNAILS[chat_id] = Thumbnail(data, local=local)
 
     def start_bot(self):
         """ This method is used to start the telegram bot. """
 
+        if self.WORKER_POOL is not None:
+            # The workers initialize Youtube-DL and OpenCV while the bot starts
+            self.WORKER_POOL.start()
+
         # Create the bot object
         updater = Updater(self.CONFIG["token"], use_context=True, request_kwargs={
             'read_timeout': self.CONFIG["readTimeout"],
@@ -123,6 +237,33 @@ class TelegramBot:
 
         self.BOT = updater.bot
 
+        # Send all the notifications in background respecting the Telegram flood limits
+        Notifier.MESSAGE_QUEUE = MessageQueue(
+            self.BOT,
+            chat_rate=self.CONFIG.get("messagesPerChatPerSecond", 1),
+            global_rate=self.CONFIG.get("messagesPerSecond", 25)
+        )
+        Notifier.MESSAGE_QUEUE.start()
+
+        # Start the download workers
+        self.SCHEDULER.start()
+        self._resume_jobs()
+
+        if self.CONFIG.get("asyncMode", False):
+            # Multiplex the small network requests (url checks, thumbnails, uploader API) on one event loop
+            AsyncRuntime(max_connections=self.CONFIG.get("asyncMaxConnections", 20)).start()
+
+        if self.CONFIG.get("metricsPort", 0):
+            # Export the metrics of the bot (queue, stage durations, traffic, errors) for Prometheus
+            try:
+                MetricsServer(
+                    Metrics.REGISTRY,
+                    host=self.CONFIG.get("metricsHost", "127.0.0.1"),
+                    port=self.CONFIG["metricsPort"]
+                ).start()
+            except OSError as ex:
+                print("[!] Can't start the metrics server:", str(ex))
+
         # Get the dispatcher to register handlers
         dp = updater.dispatcher
 
@@ -131,6 +272,8 @@ class TelegramBot:
             updater.stop()
             print("[!] Stopped updater")
 
+            self._stop_async_runtime()
+
             print("[!] Replacing this process with a new one...")
 
             # Replaces the old process with a new one
@@ -160,6 +303,9 @@ class TelegramBot:
         # Stop download command
         dp.add_handler(CommandHandler("stop", self.stop, filters=Filters.user(user_id=LIST_OF_ADMINS)))
 
+        # Download queue status command
+        dp.add_handler(CommandHandler("queue", self.queue, filters=Filters.user(user_id=LIST_OF_ADMINS)))
+
         # Add error handler
         dp.add_error_handler(self.error)
 
@@ -191,7 +337,11 @@ class TelegramBot:
         dp.add_handler(thumbnail_conversation_handler)
 
         # Start the bot
-        updater.start_polling()
+        if self.CONFIG.get("webhookPort", 0):
+            # Receive the updates on the local webhook server (no polling round trips)
+            self._start_webhook(updater)
+        else:
+            updater.start_polling()
 
         print("[*] Bot started")
 
@@ -199,6 +349,44 @@ class TelegramBot:
         # SIGTERM or SIGABRT. This should be used most of the time, since
         # start_polling() is non-blocking and will stop the bot gracefully.
         updater.idle()
+        self._stop_async_runtime()
+
+    @staticmethod
+    def _stop_async_runtime():
+        """ Closes the HTTP client of the async mode and stops its event loop (if it's running). """
+
+        if AsyncRuntime.CURRENT is not None:
+            AsyncRuntime.CURRENT.stop()
+
+    def _start_webhook(self, updater):
+        """
+        Starts the webhook mode: the updates are received by the embedded HTTP server and dispatched to the same
+        handlers of the polling mode. If 'webhookUrl' is set the webhook is registered on Telegram (the url must
+        reach the server, ex: through a reverse proxy with HTTPS).
+
+        :param updater: Updater object of the bot.
+        """
+
+        secret_path = self.CONFIG.get("webhookPath", "") or secrets.token_urlsafe(24)
+
+        WebhookServer(
+            self.BOT,
+            updater.update_queue,
+            secret_path,
+            host=self.CONFIG.get("webhookHost", "127.0.0.1"),
+            port=self.CONFIG["webhookPort"],
+            max_body_size=self.CONFIG.get("webhookMaxBodySizeMB", 10) * 1024 * 1024
+        ).start()
+
+        webhook_url = self.CONFIG.get("webhookUrl", "")
+        if webhook_url:
+            self.BOT.set_webhook(url=webhook_url.rstrip("/") + "/" + secret_path.strip("/"))
+            print("[*] Webhook registered on Telegram")
+
+        # Start the dispatcher like 'start_polling' does, so '/restart' and the stop signals work the same way
+        updater.running = True
+        updater.job_queue.start()
+        Thread(target=updater.dispatcher.start, name="dispatcher").start()
 
     '''
         COMMAND HANDLERS
@@ -225,48 +413,77 @@ class TelegramBot:
 
     def stop(self, update, context):
         """
-        This method handles the '/stop' command. It stops the download process!
+        This method handles the '/stop' command. It stops all the download processes of the user (running and queued)!
         """
         print("[Bot] Received cancel command from", self.get_user_id(update))
         notifier = Notifier(update, self.BOT)
 
-        if self.get_user_id(update) in self.DOWNLOAD_PROCESSES:
-            print("[Download cancel] Found download thread")
+        # Shared jobs continue for the other users
+        detached_jobs = self.SCHEDULER.detach_user(self.get_user_id(update))
+        cancelled_jobs = self.SCHEDULER.cancel_user_jobs(self.get_user_id(update))
 
-            # Stop download process
-            self.DOWNLOAD_PROCESSES[self.get_user_id(update)].terminate()
-            print("[Download cancel] Download thread killed")
+        if detached_jobs:
+            notifier.notify_success("You will not receive the updates of {} shared download(s) anymore.".format(
+                len(detached_jobs))
+            )
 
-            # Remove index from dictionary
-            del self.DOWNLOAD_PROCESSES[self.get_user_id(update)]
+        if cancelled_jobs:
+            print("[Download cancel] Cancelled {} download job(s)".format(len(cancelled_jobs)))
 
             # Wait some seconds to let the process kill properly...
             sleep_time = 2
             import time
 
-            print("[Download cancel] Removing all the data in {} folder in {} seconds..".format(
-                self.CONFIG["saveFolder"],
-                sleep_time)
-            )
+            print("[Download cancel] Removing all the downloaded data in {} seconds..".format(sleep_time))
 
             time.sleep(sleep_time)
 
-            # Delete all video parts (so only files) in download folder
-            for the_file in os.listdir(self.CONFIG["saveFolder"]):
-                file_path = os.path.join(self.CONFIG["saveFolder"], the_file)
-                try:
-                    if os.path.isfile(file_path):
-                        print("[Download cancel] Found {}, i'm deleting it..".format(file_path))
-                        os.unlink(file_path)
-                except Exception as e:
-                    print(e)
-
-            notifier.notify_success("I stopped the download process successfully!")
-        else:
+            # Delete all video parts of the cancelled jobs
+            for job in cancelled_jobs:
+                job.manager.set_job_status(JobStore.CANCELLED)
+                job.manager.cleanup()
+
+            notifier.notify_success("I stopped {} download process(es) successfully!".format(len(cancelled_jobs)))
+        elif not detached_jobs:
             notifier.notify_warning(
                 "You are not downloading any content now. You can use this command only to stop a download."
             )
 
+    def queue(self, update, context):
+        """
+        This method handles the '/queue' command. It shows to the user the status of all of his download jobs.
+        """
+
+        print("[Bot] Received queue command from", self.get_user_id(update))
+        notifier = Notifier(update, self.BOT)
+
+        jobs = self.SCHEDULER.get_user_jobs(self.get_user_id(update))
+
+        if not jobs:
+            notifier.notify_information("You don't have any download in the queue.")
+            return
+
+        lines = []
+        for job in jobs:
+            if job.status == DownloadJob.RUNNING:
+                lines.append("#{} running: {}".format(job.id, job.get_url()))
+            else:
+                lines.append("#{} queued at position {}: {}".format(
+                    job.id,
+                    self.SCHEDULER.get_position(job),
+                    job.get_url())
+                )
+
+        # Live bandwidth usage of all the jobs
+        for direction, rates in sorted(self.BANDWIDTH_GOVERNOR.get_rates().items()):
+            lines.append("Total {}: {}/s{}".format(
+                direction,
+                ProgressMessage.format_bytes(rates["rate"]),
+                " (limit {}/s)".format(ProgressMessage.format_bytes(rates["limit"])) if rates["limit"] else ""
+            ))
+
+        notifier.notify_information("\n".join(lines))
+
     def download(self, update, context):
         """
         This method handles the '/download' command. It start a conversation (3 steps)
@@ -279,7 +496,7 @@ class TelegramBot:
         # Create unique notifier for this user (every update -> different notifier)
         notifier = Notifier(update, self.BOT)
 
-        if not self.get_user_id(update) in self.DOWNLOAD_PROCESSES:
+        if self.SCHEDULER.can_submit(self.get_user_id(update)):
 
             if self.CONFIG["noDownloadWizard"]:
                 # For fast downloading change automatic filename to true
@@ -295,8 +512,8 @@ class TelegramBot:
 
             return self.SET_DOWNLOAD_URL
         else:
-            notifier.notify_error("You are downloading already a resource."
-                                  "Multiple download are currently disabled. Ask the developer for extra information.")
+            notifier.notify_error("You have already {} downloads in the queue. Wait for one of them to finish "
+                                  "or stop them with '/stop'.".format(self.SCHEDULER.MAX_JOBS_PER_USER))
 
     def check_download_url(self, update, context):
         """
@@ -310,11 +527,18 @@ class TelegramBot:
         # Get last message sent by the user
         url = update.message.text
 
-        # Check url
-        if UrlChecker.full_check(url):
+        # Check url (first span of the job trace)
+        trace_id = Tracer.new_trace_id()
+
+        with Span(self.TRACER, trace_id, "url_check") as span:
+            valid = UrlChecker.full_check(url)
+            span.finish(Span.OK if valid else "invalid")
+
+        if valid:
 
             # Save url
             self.DOWNLOAD_REQUEST.url = url
+            self.DOWNLOAD_REQUEST.trace_id = trace_id
 
             if self.CONFIG["noDownloadWizard"]:
                 print("[NoWizard] Skip to downloading")
@@ -327,6 +551,10 @@ class TelegramBot:
             else:
                 notifier.notify_success("The url is well-formatted and the website is reachable.")
 
+                # Extract the video metadata while the user completes the wizard
+                if self.METADATA_CACHE is not None and self.CONFIG["newDownloadMethod"]:
+                    self.METADATA_CACHE.prefetch(url)
+
                 # Check if automaticFilename is enabled or not in the config
                 if not self.CONFIG["automaticFilename"]:
 
@@ -419,22 +647,109 @@ class TelegramBot:
         :param request: DownloadRequest object that describes the user download request (url and filename"
         :param session: Current user session. (Telegram.ext.Update object)
         """
+        notifier = Notifier(session, self.BOT, self.CONFIG["videoTimeout"])
+
+        download_kwargs = {
+            "save_path": self.CONFIG["saveFolder"],
+            "overwrite_check": self.CONFIG["overwriteCheck"],
+            "automatic_filename": self.CONFIG["automaticFilename"],
+            "new_download_method": self.CONFIG["newDownloadMethod"],
+            "convert_to_mp4": self.CONFIG["videoToMP4"]
+        }
+
+        job_id = None
+        if self.JOB_STORE is not None:
+            job_id = self.JOB_STORE.add(notifier.get_chat_id(), request.url, request.filename, download_kwargs)
+
+        # Copy the request, the wizard reuses the same DownloadRequest object for the next downloads
+        job = self._create_job(
+            DownloadRequest(request.url, request.filename, trace_id=request.trace_id), notifier, download_kwargs, job_id
+        )
+
+        position = self.SCHEDULER.submit(job)
+
+        if job.leader is not None:
+            # Attached to the job of another user for the same video
+            if job_id is not None:
+                self.JOB_STORE.remove(job_id)
+            return
+
+        if position > 0:
+            notifier.notify_information(
+                "All the workers are busy, your download has been queued at position {}. "
+                "Use '/queue' to check its status.".format(position)
+            )
+
+    def _create_job(self, request: DownloadRequest, notifier: Notifier, download_kwargs: dict, job_id=None,
+                    resume_state=None) -> DownloadJob:
+        """
+        This method creates the download job (DownloadManager + download options) of a request.
+
+        :param request: DownloadRequest object that describes the request.
+        :param notifier: Notifier of the user that requested the download.
+        :param download_kwargs: Arguments passed to 'DownloadManager.download_file'.
+        :param job_id: (Optional, Default=None) Id of the job in the JobStore.
+        :param resume_state: (Optional, Default=None) Saved state of a job interrupted by a restart.
+        :return: DownloadJob object.
+        """
         from classes.downloadmanager import DownloadManager
 
         manager = DownloadManager(
             request,
-            notifier=Notifier(session, self.BOT, self.CONFIG["videoTimeout"]),
+            # Other users that request the same video can be added to the group
+            notifier=NotifierGroup(notifier) if self.SCHEDULER.COALESCE else notifier,
             uploader=self.UPLOADER,
             online_thumbnail=self.CONFIG["onlineThumbnail"],
+            pipelined_upload=self.CONFIG.get("pipelinedUpload", False),
+            progress_interval=self.CONFIG.get("progressUpdateSeconds", 3),
+            preview_generator=self.PREVIEW_GENERATOR,
+            metadata_cache=self.METADATA_CACHE,
+            dedup_index=self.DEDUP_INDEX,
+            job_store=self.JOB_STORE,
+            job_id=job_id,
+            resume_state=resume_state,
+            download_segments=self.CONFIG.get("downloadSegments", 4),
+            concurrent_fragments=self.CONFIG.get("concurrentFragments", 4),
+            bandwidth_governor=self.BANDWIDTH_GOVERNOR,
+            thumbnail_poller=self.THUMBNAIL_POLLER,
+            tracer=self.TRACER,
         )
 
-        manager.download_file(
-            self.CONFIG["saveFolder"],
-            overwrite_check=self.CONFIG["overwriteCheck"],
-            automatic_filename=self.CONFIG["automaticFilename"],
-            new_download_method=self.CONFIG["newDownloadMethod"],
-            convert_to_mp4=self.CONFIG["videoToMP4"]
-        )
+        return DownloadJob(manager, download_kwargs)
+
+    def _resume_jobs(self):
+        """
+        This method resumes all the jobs interrupted by the last restart (or crash) saved in the JobStore.
+        """
+
+        if self.JOB_STORE is None:
+            return
+
+        for state in self.JOB_STORE.get_active():
+            chat_ids = state["subscribers"] or [state["chat_id"]]
+            notifier = Notifier.from_chat_id(chat_ids[0], self.BOT, self.CONFIG["videoTimeout"])
+
+            print("[TelegramBot] Resuming job {} ({} stage): {}".format(state["id"], state["stage"], state["url"]))
+
+            job = self._create_job(
+                DownloadRequest(state["url"], state["filename"]),
+                notifier,
+                state["download_kwargs"],
+                job_id=state["id"],
+                resume_state=state
+            )
+
+            # Users attached to the job before the restart
+            for chat_id in chat_ids[1:]:
+                if job.can_coalesce():
+                    job.manager.notifier.add(Notifier.from_chat_id(chat_id, self.BOT, self.CONFIG["videoTimeout"]))
+
+            if state["stage"] != JobStore.DONE:
+                job.get_notifier().notify_information(
+                    "The bot has been restarted, I'm resuming the {} of {}".format(state["stage"], state["url"])
+                )
+
+            self.SCHEDULER.submit(job)
 
     def thumbnail(self, update, context):
         """
@@ -693,6 +1008,7 @@ class TelegramBot:
 
         # Log Errors caused by Updates
         self.logger.warning('Update "%s" caused error "%s"', update, context.error)
+        Metrics.count_error(context.error)
 
     @staticmethod
     def get_user_id(update):
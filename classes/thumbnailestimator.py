@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+
+class ThumbnailEstimator:
+    """
+    This class learns how long every host (OpenLoad.co, VeryStream.com) takes to generate the thumbnail of an
+    uploaded video, so the ThumbnailPoller can make its first check near the moment the thumbnail is ready.
+
+    Every host has its own linear model: seconds = a + b * size (MB) + c * duration (minutes) + d * (duration is
+    known). The model is fitted online with recursive least squares (old samples are slowly forgotten, so the
+    model follows the host load) and it's saved in a JSON file.
+    """
+
+    # Number of model features
+    FEATURES = 4
+
+    # Initial (and max) uncertainty of the coefficients
+    MAX_UNCERTAINTY = 1000.0
+
+    def __init__(self, file_path=None, default_delay=15.0, forgetting=0.98, min_delay=1.0, max_delay=600.0):
+        """
+        Parametrized constructor method.
+
+        :param file_path: (Optional, Default=None) JSON file where the models are saved (None = not saved).
+        :param default_delay: (Optional, Default=15) Seconds predicted for a host without samples.
+        :param forgetting: (Optional, Default=0.98) Weight of the old samples at every new sample (1 = never
+        forgotten).
+        :param min_delay: (Optional, Default=1) Min predicted seconds.
+        :param max_delay: (Optional, Default=600) Max predicted seconds.
+        """
+
+        self.file_path = file_path
+        self.DEFAULT_DELAY = default_delay
+        self.FORGETTING = forgetting
+        self.MIN_DELAY = min_delay
+        self.MAX_DELAY = max_delay
+
+        self._lock = threading.Lock()
+
+        # <host>: {"theta": coefficients, "p": inverse correlation matrix, "error": mean squared error, "samples"}
+        self._models = {}
+
+        self._load()
+
+    def predict(self, host: str, size=None, duration=None) -> float:
+        """
+        :param host: Uploader name (ex: openload).
+        :param size: (Optional, Default=None) Video size in bytes.
+        :param duration: (Optional, Default=None) Video duration in seconds.
+        :return: Predicted seconds between the end of the upload and the thumbnail.
+        """
+
+        with self._lock:
+            model = self._models.get(host)
+
+            if model is None:
+                return self.DEFAULT_DELAY
+
+            seconds = float(np.dot(model["theta"], self._features(size, duration)))
+
+        return min(max(seconds, self.MIN_DELAY), self.MAX_DELAY)
+
+    def get_error(self, host: str) -> float:
+        """
+        :param host: Uploader name.
+        :return: Typical prediction error of the host in seconds (root mean squared error).
+        """
+
+        with self._lock:
+            model = self._models.get(host)
+            return float(np.sqrt(model["error"])) if model is not None else self.DEFAULT_DELAY
+
+    def record(self, host: str, seconds: float, size=None, duration=None):
+        """
+        Adds a sample to the model of a host.
+
+        :param host: Uploader name.
+        :param seconds: Seconds between the end of the upload and the thumbnail.
+        :param size: (Optional, Default=None) Video size in bytes.
+        :param duration: (Optional, Default=None) Video duration in seconds.
+        """
+
+        x = self._features(size, duration)
+
+        with self._lock:
+            model = self._models.get(host)
+
+            if model is None:
+                model = self._models[host] = self._new_model()
+
+            theta, p = model["theta"], model["p"]
+
+            # Recursive least squares update
+            residual = seconds - float(np.dot(theta, x))
+            px = p.dot(x)
+            gain = px / (self.FORGETTING + x.dot(px))
+
+            model["theta"] = theta + gain * residual
+            p = (p - np.outer(gain, px)) / self.FORGETTING
+
+            # Features never seen (ex: unknown durations) would make the matrix grow forever with the forgetting:
+            # only the uncertainty of those directions is limited, the others keep following the new samples
+            eigenvalues, eigenvectors = np.linalg.eigh((p + p.T) / 2)
+            if eigenvalues.max() > self.MAX_UNCERTAINTY:
+                p = (eigenvectors * np.minimum(eigenvalues, self.MAX_UNCERTAINTY)).dot(eigenvectors.T)
+
+            model["p"] = p
+            model["error"] = 0.8 * model["error"] + 0.2 * residual ** 2
+            model["samples"] += 1
+
+            print("[ThumbnailEstimator] {}: thumbnail after {:.0f} seconds (error {:.0f} seconds, {} samples)".format(
+                host, seconds, residual, model["samples"])
+            )
+
+            self._save()
+
+    def get_models(self) -> dict:
+        """
+        :return: Models of all the hosts: {<host>: {"coefficients", "error", "samples"}}.
+        """
+
+        with self._lock:
+            return {
+                host: {
+                    "coefficients": model["theta"].tolist(),
+                    "error": float(np.sqrt(model["error"])),
+                    "samples": model["samples"]
+                }
+                for host, model in self._models.items()
+            }
+
+    def _new_model(self) -> dict:
+        # Starts from the default delay, with a low confidence (the first samples move the model a lot)
+        theta = np.zeros(self.FEATURES)
+        theta[0] = self.DEFAULT_DELAY
+
+        return {
+            "theta": theta,
+            "p": np.eye(self.FEATURES) * self.MAX_UNCERTAINTY,
+            "error": self.DEFAULT_DELAY ** 2,
+            "samples": 0
+        }
+
+    @staticmethod
+    def _features(size=None, duration=None):
+        return np.array([
+            1.0,
+            (size or 0) / (1024 * 1024),
+            (duration or 0) / 60.0,
+            1.0 if duration else 0.0
+        ])
+
+    def _load(self):
+        if self.file_path is None or not os.path.exists(self.file_path):
+            return
+
+        try:
+            with open(self.file_path) as file:
+                saved = json.load(file)
+
+            for host, model in saved.items():
+                self._models[host] = {
+                    "theta": np.array(model["theta"], dtype=float),
+                    "p": np.array(model["p"], dtype=float),
+                    "error": float(model["error"]),
+                    "samples": int(model["samples"])
+                }
+
+            print("[ThumbnailEstimator] Loaded the models of {} hosts".format(len(self._models)))
+
+        except (OSError, ValueError, KeyError) as ex:
+            print("[ThumbnailEstimator] Can't read the models, starting with empty ones:", str(ex))
+            self._models = {}
+
+    def _save(self):
+        if self.file_path is None:
+            return
+
+        saved = {
+            host: {
+                "theta": model["theta"].tolist(),
+                "p": model["p"].tolist(),
+                "error": model["error"],
+                "samples": model["samples"]
+            }
+            for host, model in self._models.items()
+        }
+
+        # Write a temporary file and replace the models, so a crash never leaves a truncated file
+        temp_path = self.file_path + ".tmp"
+
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(saved, file)
+
+            os.replace(temp_path, self.file_path)
+
+        except (OSError, TypeError, ValueError) as ex:
+            print("[ThumbnailEstimator] Can't save the models:", str(ex))
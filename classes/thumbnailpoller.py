@@ -0,0 +1,220 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from classes.asyncruntime import AsyncRuntime
+
+
+class ThumbnailPoller:
+    """
+    This class waits for the thumbnails generated by the uploader (OpenLoad.co or VeryStream.com) without
+    blocking the download workers. Every video is checked with an exponential backoff (with jitter) until its
+    thumbnail is ready or its deadline expires, then its callback is called with the thumbnail url (None if
+    the deadline expired).
+
+    All the pending checks are kept in a timer heap handled by a single thread: the checks that are due are made
+    in one pass (at the same time if the AsyncRuntime is running). The callbacks are called on the poller thread,
+    so they must not block.
+    """
+
+    def __init__(self, initial_delay=15.0, max_interval=60.0, backoff=1.5, jitter=0.2, deadline=3600.0,
+                 estimator=None):
+        """
+        Parametrized constructor method.
+
+        :param initial_delay: (Optional, Default=15) Default seconds before the first check.
+        :param max_interval: (Optional, Default=60) Max seconds between two checks of the same video.
+        :param backoff: (Optional, Default=1.5) The interval is multiplied by this value after every check.
+        :param jitter: (Optional, Default=0.2) Random variation of the intervals (0.2 = +-20%), so the checks of
+        videos uploaded together are spread.
+        :param deadline: (Optional, Default=3600) Default max seconds to wait for a thumbnail.
+        :param estimator: (Optional, Default=None) ThumbnailEstimator object used to predict when the thumbnails
+        are ready (it learns from every poll).
+        """
+
+        self.INITIAL_DELAY = initial_delay
+        self.MAX_INTERVAL = max_interval
+        self.BACKOFF = backoff
+        self.JITTER = jitter
+        self.DEADLINE = deadline
+        self.estimator = estimator
+
+        # Timer heap: (due time, poll id)
+        self._heap = []
+
+        # Pending polls: <poll id>: poll dict (uploader, media_id, callback, interval, deadline)
+        self._polls = {}
+        self._ids = itertools.count(1)
+
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def predict(self, host=None, size=None, duration=None) -> float:
+        """
+        :param host: (Optional, Default=None) Uploader name (ex: openload).
+        :param size: (Optional, Default=None) Video size in bytes.
+        :param duration: (Optional, Default=None) Video duration in seconds.
+        :return: Seconds before the first check of a video (predicted thumbnail time).
+        """
+
+        if self.estimator is None or host is None:
+            return self.INITIAL_DELAY
+
+        return self.estimator.predict(host, size, duration)
+
+    def poll(self, uploader, media_id, callback, initial_delay=None, deadline=None, host=None, size=None,
+             duration=None) -> int:
+        """
+        Starts waiting for the thumbnail of a video.
+
+        :param uploader: OpenloadWrapper or VeryStreamWrapper object (it must have the 'get_thumbnail' method).
+        :param media_id: Id of the uploaded video.
+        :param callback: Function called with the thumbnail url (None if the deadline expired).
+        :param initial_delay: (Optional, Default=predicted) Seconds before the first check.
+        :param deadline: (Optional, Default=DEADLINE) Max seconds to wait for the thumbnail.
+        :param host: (Optional, Default=None) Uploader name, used by the estimator.
+        :param size: (Optional, Default=None) Video size in bytes, used by the estimator.
+        :param duration: (Optional, Default=None) Video duration in seconds, used by the estimator.
+        :return: Id of the poll (used by 'cancel').
+        """
+
+        initial_delay = self.predict(host, size, duration) if initial_delay is None else initial_delay
+
+        # After a prediction the thumbnail should be close: start with an interval as big as the typical error
+        interval = initial_delay
+        if self.estimator is not None and host is not None:
+            interval = self.estimator.get_error(host)
+
+        interval = min(max(interval, 1.0), self.MAX_INTERVAL)
+        now = time.monotonic()
+
+        with self._condition:
+            poll_id = next(self._ids)
+            self._polls[poll_id] = {
+                "uploader": uploader,
+                "media_id": media_id,
+                "callback": callback,
+                "interval": interval,
+                "deadline": now + (self.DEADLINE if deadline is None else deadline),
+                "started": now,
+                # The thumbnail wasn't ready before this time (seconds after the start)
+                "not_ready": max(initial_delay - interval, 0.0),
+                "sample": (host, size, duration)
+            }
+
+            heapq.heappush(self._heap, (now + initial_delay, poll_id))
+            self._start()
+            self._condition.notify()
+
+        print("[ThumbnailPoller] Waiting for the thumbnail of {} (first check in {:.0f} seconds)".format(
+            media_id, initial_delay)
+        )
+        return poll_id
+
+    def cancel(self, poll_id: int) -> bool:
+        """
+        Stops waiting for a thumbnail (the callback is not called).
+
+        :param poll_id: Id returned by 'poll'.
+        :return: True if the poll has been cancelled, False if it had already finished.
+        """
+
+        with self._condition:
+            return self._polls.pop(poll_id, None) is not None
+
+    def get_pending(self) -> int:
+        """
+        :return: Number of videos that are waiting for the thumbnail.
+        """
+
+        with self._condition:
+            return len(self._polls)
+
+    def _start(self):
+        # The thread is started with the first poll (called with the condition lock)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ThumbnailPoller")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Wait for the first due check (or for a new poll)
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+
+                now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, poll_id = heapq.heappop(self._heap)
+                    if poll_id in self._polls:
+                        due.append((poll_id, self._polls[poll_id]))
+
+            if due:
+                self._check(due)
+
+    def _check(self, due: list):
+        """
+        Checks all the due videos in one pass, then calls the callbacks of the ready thumbnails and reschedules
+        the others.
+        """
+
+        urls = self._get_thumbnails([poll for _, poll in due])
+        now = time.monotonic()
+
+        for (poll_id, poll), url in zip(due, urls):
+            if url is None:
+                poll["not_ready"] = now - poll["started"]
+
+            if url is None and now < poll["deadline"]:
+                # Not ready yet: check again later (the last check is made at the deadline)
+                delay = poll["interval"] * random.uniform(1 - self.JITTER, 1 + self.JITTER)
+                poll["interval"] = min(poll["interval"] * self.BACKOFF, self.MAX_INTERVAL)
+
+                with self._condition:
+                    if poll_id in self._polls:
+                        heapq.heappush(self._heap, (min(now + delay, poll["deadline"]), poll_id))
+
+                continue
+
+            with self._condition:
+                if self._polls.pop(poll_id, None) is None:
+                    # Cancelled during the check
+                    continue
+
+            if url is None:
+                print("[ThumbnailPoller] Deadline expired for the thumbnail of", poll["media_id"])
+
+            elif self.estimator is not None and poll["sample"][0] is not None:
+                # The thumbnail has been generated between the last check and this one
+                host, size, duration = poll["sample"]
+                self.estimator.record(host, (poll["not_ready"] + now - poll["started"]) / 2, size, duration)
+
+            try:
+                poll["callback"](url)
+            except Exception as ex:
+                print("[ThumbnailPoller] Thumbnail callback of {} failed:".format(poll["media_id"]), str(ex))
+
+    @staticmethod
+    def _get_thumbnails(polls: list) -> list:
+        """
+        :return: Thumbnail url of every video (None if it's not ready yet).
+        """
+
+        if AsyncRuntime.CURRENT is not None:
+            async def get_all():
+                return await asyncio.gather(
+                    *(poll["uploader"].get_thumbnail_async(poll["media_id"]) for poll in polls)
+                )
+
+            try:
+                return AsyncRuntime.CURRENT.run(get_all())
+            except Exception as ex:
+                print("[ThumbnailPoller] Async check failed:", str(ex))
+                return [None] * len(polls)
+
+        return [poll["uploader"].get_thumbnail(poll["media_id"]) for poll in polls]
@@ -0,0 +1,88 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    This class implements a thread-safe token bucket, used to limit how many operations (or bytes) can be
+    done every second. The bucket is refilled with 'rate' tokens every second up to 'capacity' tokens.
+    """
+
+    def __init__(self, rate: float, capacity=None):
+        """
+        Parametrized constructor method.
+
+        :param rate: Tokens added every second. If it's 0 or less the bucket has no limit.
+        :param capacity: (Optional, Default=rate) Max number of tokens saved in the bucket (max burst).
+        """
+
+        self._lock = threading.Lock()
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def set_rate(self, rate: float, capacity=None):
+        """
+        Changes the bucket rate (and capacity) keeping the saved tokens.
+
+        :param rate: New rate (tokens every second).
+        :param capacity: (Optional, Default=rate) New max number of tokens.
+        """
+
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+            self.capacity = float(capacity if capacity is not None else max(rate, 1))
+            self.tokens = min(self.tokens, self.capacity)
+
+    def get_wait_time(self, amount=1.0) -> float:
+        """
+        :param amount: Number of tokens needed.
+        :return: Seconds to wait before 'amount' tokens are available (0 if they are available now).
+        """
+
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            self._refill()
+            missing = min(amount, self.capacity) - self.tokens
+            return max(0.0, missing / self.rate)
+
+    def try_consume(self, amount=1.0) -> bool:
+        """
+        Takes 'amount' tokens from the bucket if they are available.
+
+        :param amount: Number of tokens to take.
+        :return: True if the tokens have been taken, otherwise False.
+        """
+
+        if self.rate <= 0:
+            return True
+
+        with self._lock:
+            self._refill()
+
+            # Requests bigger than the bucket capacity can be done when the bucket is full
+            needed = min(amount, self.capacity)
+            if self.tokens >= needed:
+                self.tokens -= amount
+                return True
+
+            return False
+
+    def consume(self, amount=1.0):
+        """
+        Takes 'amount' tokens from the bucket, waiting until they are available.
+
+        :param amount: Number of tokens to take.
+        """
+
+        while not self.try_consume(amount):
+            time.sleep(max(self.get_wait_time(amount), 0.001))
@@ -0,0 +1,143 @@
+import atexit
+import json
+import os
+import threading
+import uuid
+from collections import deque
+
+from classes.span import Span
+
+
+class Tracer:
+    """
+    This class writes the spans of the jobs (one JSON object per line) in a trace log, so the time spent by a
+    job in every step (url check, extraction, download, conversion, upload, thumbnail, preview) can be analyzed
+    later (see TraceSummary).
+
+    The spans are buffered in memory and written by a background thread, so the jobs never wait for the disk.
+    When the log is bigger than 'max_bytes' it's rotated (traces.jsonl.1, traces.jsonl.2, ...).
+    """
+
+    def __init__(self, file_path="traces.jsonl", max_bytes=10 * 1024 * 1024, backup_count=5, flush_interval=1.0,
+                 max_buffer=10000):
+        """
+        Parametrized constructor method.
+
+        :param file_path: (Optional, Default=traces.jsonl) Trace log.
+        :param max_bytes: (Optional, Default=10 MB) Size after which the log is rotated.
+        :param backup_count: (Optional, Default=5) Number of old logs kept.
+        :param flush_interval: (Optional, Default=1) Max seconds between the end of a span and its write.
+        :param max_buffer: (Optional, Default=10000) Max number of spans waiting to be written (the newest spans
+        are dropped if the disk is too slow).
+        """
+
+        self.file_path = file_path
+        self.MAX_BYTES = max_bytes
+        self.BACKUP_COUNT = backup_count
+        self.FLUSH_INTERVAL = flush_interval
+        self.MAX_BUFFER = max_buffer
+
+        self._buffer = deque()
+        self._dropped = 0
+        self._condition = threading.Condition()
+
+        # Only one thread writes the log
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+        # The spans still in memory are written when the bot exits
+        atexit.register(self.flush)
+
+    @staticmethod
+    def new_trace_id() -> str:
+        """
+        :return: New random id for a job.
+        """
+
+        return uuid.uuid4().hex[:16]
+
+    def span(self, trace_id: str, name: str, **attributes) -> Span:
+        """
+        Starts a span (use it as context manager or call 'finish').
+
+        :param trace_id: Id of the job.
+        :param name: Name of the step.
+        :param attributes: (Optional) Other fields saved in the span.
+        :return: Span object.
+        """
+
+        return Span(self, trace_id, name, **attributes)
+
+    def write(self, record: dict):
+        """
+        Adds a finished span to the buffer (called by 'Span.finish').
+
+        :param record: Span fields.
+        """
+
+        with self._condition:
+            if len(self._buffer) >= self.MAX_BUFFER:
+                self._dropped += 1
+                return
+
+            self._buffer.append(record)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name="Tracer")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def flush(self):
+        """
+        Writes all the buffered spans now.
+        """
+
+        with self._condition:
+            records = list(self._buffer)
+            self._buffer.clear()
+            dropped, self._dropped = self._dropped, 0
+
+        if dropped:
+            print("[Tracer] Dropped {} spans, the trace log is too slow".format(dropped))
+
+        if records:
+            self._write_records(records)
+
+    def _writer(self):
+        while True:
+            with self._condition:
+                self._condition.wait(self.FLUSH_INTERVAL)
+
+            self.flush()
+
+    def _write_records(self, records: list):
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+
+        with self._write_lock:
+            try:
+                with open(self.file_path, "a", encoding="utf-8") as file:
+                    file.write(lines)
+                    size = file.tell()
+
+                if size >= self.MAX_BYTES:
+                    self._rotate()
+
+            except OSError as ex:
+                print("[Tracer] Can't write the trace log:", str(ex))
+
+    def _rotate(self):
+        """
+        Renames the logs (traces.jsonl -> traces.jsonl.1 -> traces.jsonl.2 ...), the oldest one is deleted.
+        """
+
+        if self.BACKUP_COUNT <= 0:
+            os.remove(self.file_path)
+            return
+
+        for index in range(self.BACKUP_COUNT - 1, 0, -1):
+            source = "{}.{}".format(self.file_path, index)
+
+            if os.path.exists(source):
+                os.replace(source, "{}.{}".format(self.file_path, index + 1))
+
+        os.replace(self.file_path, self.file_path + ".1")
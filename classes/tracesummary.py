@@ -0,0 +1,181 @@
+import argparse
+import glob
+import json
+import math
+import sys
+
+
+class TraceSummary:
+    """
+    This class reads the trace logs written by the Tracer and summarizes them: duration percentiles of every
+    step, transferred bytes and outcomes, or the timeline of a single job.
+
+    Usage: python -m classes.tracesummary [traces.jsonl ...] [--trace <id>] [--slowest <n>]
+    """
+
+    # Percentiles shown for every step
+    PERCENTILES = (50, 90, 99)
+
+    # Steps in pipeline order (the other steps are shown after them)
+    STEP_ORDER = ("job", "url_check", "extract", "download", "fragments", "convert", "upload", "thumbnail", "preview")
+
+    def __init__(self):
+        # All the spans read (dicts)
+        self.spans = []
+
+    def load(self, file_path: str) -> int:
+        """
+        Reads a trace log (invalid lines are skipped).
+
+        :param file_path: Trace log.
+        :return: Number of spans read.
+        """
+
+        count = 0
+
+        with open(file_path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+
+                if isinstance(span, dict) and "span" in span and "duration" in span:
+                    self.spans.append(span)
+                    count += 1
+
+        return count
+
+    def get_stages(self) -> dict:
+        """
+        :return: Statistics of every step: {<name>: {"count", "p50", "p90", "p99", "max", "bytes", "outcomes"}}.
+        """
+
+        durations = {}
+        stages = {}
+
+        for span in self.spans:
+            name = span["span"]
+            stage = stages.setdefault(name, {"bytes": 0, "outcomes": {}})
+
+            durations.setdefault(name, []).append(span["duration"])
+            stage["bytes"] += span.get("bytes") or 0
+            stage["outcomes"][span.get("outcome")] = stage["outcomes"].get(span.get("outcome"), 0) + 1
+
+        for name, values in durations.items():
+            values.sort()
+
+            stages[name]["count"] = len(values)
+            stages[name]["max"] = values[-1]
+
+            for percentile in self.PERCENTILES:
+                stages[name]["p{}".format(percentile)] = self.percentile(values, percentile)
+
+        return stages
+
+    def get_trace(self, trace_id: str) -> list:
+        """
+        :param trace_id: Id of the job (or its first characters).
+        :return: Spans of the job sorted by start time.
+        """
+
+        return sorted(
+            (span for span in self.spans if str(span.get("trace", "")).startswith(trace_id)),
+            key=lambda span: span.get("start", 0)
+        )
+
+    def get_slowest(self, count: int) -> list:
+        """
+        :param count: Number of jobs.
+        :return: Slowest jobs: list of (trace id, seconds from the first span start to the last span end).
+        """
+
+        bounds = {}
+
+        for span in self.spans:
+            start, end = bounds.get(span.get("trace"), (math.inf, -math.inf))
+            bounds[span.get("trace")] = (min(start, span.get("start", 0)), max(end, span.get("end", 0)))
+
+        jobs = [(trace_id, end - start) for trace_id, (start, end) in bounds.items()]
+        return sorted(jobs, key=lambda job: job[1], reverse=True)[:count]
+
+    @staticmethod
+    def percentile(values: list, percentile: float) -> float:
+        """
+        :param values: Sorted values.
+        :param percentile: Percentile (0-100).
+        :return: Value of the percentile (nearest rank).
+        """
+
+        rank = max(int(math.ceil(percentile / 100 * len(values))), 1)
+        return values[rank - 1]
+
+    def print_stages(self):
+        stages = self.get_stages()
+
+        print("{:<16}{:>8}{:>10}{:>10}{:>10}{:>10}{:>12}  {}".format(
+            "step", "count", "p50", "p90", "p99", "max", "MB", "outcomes"))
+
+        def order(name):
+            return (self.STEP_ORDER.index(name), name) if name in self.STEP_ORDER else (len(self.STEP_ORDER), name)
+
+        for name, stage in sorted(stages.items(), key=lambda item: order(item[0])):
+            outcomes = ", ".join("{}={}".format(outcome, count) for outcome, count in sorted(
+                stage["outcomes"].items(), key=lambda item: -item[1]))
+
+            print("{:<16}{:>8}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}{:>12.1f}  {}".format(
+                name, stage["count"], stage["p50"], stage["p90"], stage["p99"], stage["max"],
+                stage["bytes"] / (1024 * 1024), outcomes))
+
+    def print_trace(self, trace_id: str):
+        spans = self.get_trace(trace_id)
+
+        if not spans:
+            print("No spans for the job", trace_id)
+            return
+
+        first = spans[0]["start"]
+        fixed = ("trace", "span", "start", "end", "duration", "bytes", "outcome")
+
+        for span in spans:
+            extra = " ".join("{}={}".format(key, value) for key, value in span.items() if key not in fixed)
+
+            print("+{:>9.2f}s {:<16}{:>10.2f}s {:>12} {:<8} {}".format(
+                span["start"] - first, span["span"], span["duration"],
+                span["bytes"] if span.get("bytes") is not None else "-", span.get("outcome"), extra))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Summarize the trace logs of RimeSegateBot")
+    parser.add_argument("files", nargs="*", default=["traces.jsonl*"], help="Trace logs (default: traces.jsonl*)")
+    parser.add_argument("--trace", help="Show the timeline of a job (id or its first characters)")
+    parser.add_argument("--slowest", type=int, default=0, help="Show the N slowest jobs")
+    args = parser.parse_args(arguments)
+
+    summary = TraceSummary()
+    for pattern in args.files:
+        for file_path in sorted(glob.glob(pattern)) or [pattern]:
+            try:
+                summary.load(file_path)
+            except OSError as ex:
+                print("Can't read {}:".format(file_path), str(ex), file=sys.stderr)
+
+    if not summary.spans:
+        print("No spans found")
+        return 1
+
+    if args.trace:
+        summary.print_trace(args.trace)
+    else:
+        summary.print_stages()
+
+    if args.slowest:
+        print()
+        for trace_id, seconds in summary.get_slowest(args.slowest):
+            print("{}  {:.1f}s".format(trace_id, seconds))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
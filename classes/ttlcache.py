@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    This class implements a thread-safe in memory cache with LRU eviction: every entry expires after 'ttl'
+    seconds and when the cache is full the least recently used entry is removed.
+    """
+
+    def __init__(self, max_size=1024, ttl=300.0):
+        """
+        Parametrized constructor method.
+
+        :param max_size: (Optional, Default=1024) Max number of entries.
+        :param ttl: (Optional, Default=300) Seconds after which an entry expires (0 or less = never).
+        """
+
+        self.MAX_SIZE = max_size
+        self.TTL = ttl
+
+        # <key>: (expiration time, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        :param key: Entry key.
+        :param default: (Optional, Default=None) Value returned if the entry is missing or expired.
+        :return: Saved value or 'default'.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return default
+
+            if entry[0] is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """
+        Saves a value in the cache.
+
+        :param key: Entry key.
+        :param value: Value to save.
+        :param ttl: (Optional, Default=cache ttl) Seconds after which this entry expires.
+        """
+
+        ttl = self.TTL if ttl is None else ttl
+        expiration = time.monotonic() + ttl if ttl > 0 else None
+
+        with self._lock:
+            self._entries[key] = (expiration, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.MAX_SIZE:
+                self._entries.popitem(last=False)
+
+    def remove(self, key):
+        """
+        Removes an entry (if present).
+
+        :param key: Entry key.
+        """
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def remove_if(self, predicate) -> int:
+        """
+        Removes all the entries that satisfy a condition.
+
+        :param predicate: Function called with (key, value), the entry is removed if it returns True.
+        :return: Number of removed entries.
+        """
+
+        with self._lock:
+            keys = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+
+            for key in keys:
+                del self._entries[key]
+
+            return len(keys)
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+    def items(self) -> list:
+        """
+        :return: List of (key, expiration time, value) of the entries (expiration time is time.monotonic()
+        based, None = never).
+        """
+
+        with self._lock:
+            return [(key, expiration, value) for key, (expiration, value) in self._entries.items()]
+
+    def __len__(self):
+        return len(self._entries)
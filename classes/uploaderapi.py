@@ -0,0 +1,194 @@
+import requests
+
+from classes.asyncruntime import AsyncRuntime
+from classes.chunkeduploader import ChunkedUploader
+from classes.streamingupload import StreamingUpload
+
+
+class UploaderApi:
+    """
+    This class contains the methods shared by the OpenloadWrapper and the VeryStreamWrapper (the two hosts have the
+    same API): uploads, thumbnails and async API requests. It must be the first base class of a wrapper, the other
+    one is the API client of the host (OpenLoad or Verystream), which provides 'api_url', 'login', 'key',
+    'upload_link', 'splash_image', '_process_response' and '_check_status'.
+    """
+
+    # Name of the wrapper used in the logs (set by every wrapper)
+    NAME = "UploaderApi"
+
+    def __init__(self, username: str, key: str, upload_parallelism=4,
+                 upload_chunk_size=ChunkedUploader.DEFAULT_CHUNK_SIZE, chunked_upload=False, **kwargs):
+        """
+        Parametrized constructor method.
+
+        :param username: API username that will be used to login on the host.
+        :param key: API key that will be used to login on the host.
+        :param upload_parallelism: (Optional, Default=4) Default number of chunks uploaded at the same time.
+        :param upload_chunk_size: (Optional, Default=8MB) Size in bytes of the uploaded chunks.
+        :param chunked_upload: (Optional, Default=False) If it's true the files are uploaded in chunks (the host
+        must support the chunked uploads).
+        :param kwargs: Other arguments of the API client.
+        """
+
+        # Call the API client constructor
+        super(UploaderApi, self).__init__(username, key, **kwargs)
+
+        self.UPLOAD_PARALLELISM = upload_parallelism
+        self.UPLOAD_CHUNK_SIZE = upload_chunk_size
+        self.CHUNKED_UPLOAD = chunked_upload
+
+    def get_thumbnail(self, media_id):
+        """
+        This method checks if the thumbnail generated by the host is ready (the ThumbnailPoller calls it until
+        the thumbnail is ready).
+
+        :param media_id: Media id that identifies the video.
+        :return: Url of the thumbnail image generated by the host or None if it's not ready yet.
+        """
+
+        try:
+            url = self.splash_image(media_id)
+        except Exception as ex:
+            print("[{}] Thumbnail of {} not ready yet:".format(self.NAME, media_id), str(ex))
+            return None
+
+        return self._get_thumbnail_url(media_id, url)
+
+    async def get_thumbnail_async(self, media_id):
+        """
+        Async version of 'get_thumbnail'.
+
+        :param media_id: Media id that identifies the video.
+        :return: Url of the thumbnail image or None if it's not ready yet.
+        """
+
+        try:
+            url = await self.splash_image_async(media_id)
+        except Exception as ex:
+            print("[{}] Thumbnail of {} not ready yet:".format(self.NAME, media_id), str(ex))
+            return None
+
+        return self._get_thumbnail_url(media_id, url)
+
+    def _get_thumbnail_url(self, media_id, url):
+        # The API returns None (or "None") while the thumbnail is being generated
+        if url is None or url == "None":
+            print("[{}] Thumbnail of {} not ready yet".format(self.NAME, media_id))
+            return None
+
+        print("[{}] Found the thumbnail of {}: {}".format(self.NAME, media_id, url))
+        return url
+
+    def upload_stream(self, stream: StreamingUpload, file_name: str, **kwargs):
+        """
+        This method is used to upload a file on the host while it's still being downloaded. The body is sent
+        using a chunked HTTP request, so the upload ends right after the download.
+
+        :param stream: StreamingUpload object that reads the file while it's written.
+        :param file_name: Name of the uploaded file.
+        :return: Host response (uploaded file information) as Dict object.
+        """
+
+        response = self.upload_link(**kwargs)
+        upload_url = response.get("url")
+
+        boundary = stream.generate_boundary()
+        headers = {"Prefer": "respond-async", "Content-Type": "multipart/form-data; boundary=" + boundary}
+        response_json = requests.post(
+            upload_url,
+            headers=headers,
+            data=stream.iter_multipart("files", file_name, boundary)
+        ).json()
+
+        self._check_status(response_json)
+        return response_json['result']
+
+    def upload_file(self, file_path, parallelism=None, resume=True, progress=None, throttle=None, **kwargs):
+        """
+        This method is used to upload a file on the host using the ChunkedUploader: with the chunked uploads
+        enabled the file is sent in chunks (more at the same time), every chunk is retried on failure and an
+        interrupted upload continues from its last checkpoint. Otherwise it's sent with a single request ('parallelism'
+        and 'resume' are ignored).
+
+        :param file_path: Path to the file to upload.
+        :param parallelism: (Optional, Default=upload_parallelism) Number of chunks uploaded at the same time.
+        :param resume: (Optional, Default=True) If it's true a chunked upload continues from the last checkpoint.
+        :param progress: (Optional, Default=None) Function called with (bytes sent, file size) during the upload.
+        :param throttle: (Optional, Default=None) Function called with the number of bytes that are going to be
+        sent, it can wait to limit the upload speed (ex: BandwidthChannel.consume).
+        :return: Host response (uploaded file information) as Dict object.
+        """
+
+        if parallelism is None:
+            parallelism = self.UPLOAD_PARALLELISM
+
+        uploader = ChunkedUploader(self, chunk_size=self.UPLOAD_CHUNK_SIZE, chunked=self.CHUNKED_UPLOAD)
+        return uploader.upload_file(
+            file_path, parallelism=parallelism, resume=resume, progress=progress, throttle=throttle, **kwargs
+        )
+
+    def upload_link(self, **kwargs):
+        """
+        Makes a request to prepare for file upload. In async mode the request is sent using the shared
+        AsyncRuntime HTTP client.
+
+        :return: Dict object containing the upload url (url) and its expiration date (valid_until).
+        """
+
+        if AsyncRuntime.CURRENT is not None:
+            return AsyncRuntime.CURRENT.run(self.upload_link_async(**kwargs))
+
+        return super(UploaderApi, self).upload_link(**kwargs)
+
+    async def upload_link_async(self, folder_id=None, sha1=None, httponly=False):
+        """
+        Async version of 'upload_link'.
+
+        :param folder_id: (Optional, Default=None) Folder-ID to upload to.
+        :param sha1: (Optional, Default=None) Expected sha1 of the uploaded file.
+        :param httponly: (Optional, Default=False) If it's true only http upload links are used.
+        :return: Dict object containing the upload url (url) and its expiration date (valid_until).
+        """
+
+        kwargs = {'folder': folder_id, 'sha1': sha1, 'httponly': httponly}
+        params = {key: str(value) for key, value in kwargs.items() if value}
+        return await self._get_async('file/ul', params=params)
+
+    def splash_image(self, file_id):
+        """
+        Gets the video splash image (thumbnail) url. In async mode the request is sent using the shared
+        AsyncRuntime HTTP client.
+
+        :param file_id: Id of the video.
+        :return: Url of the splash image.
+        """
+
+        if AsyncRuntime.CURRENT is not None:
+            return AsyncRuntime.CURRENT.run(self.splash_image_async(file_id))
+
+        return super(UploaderApi, self).splash_image(file_id)
+
+    async def splash_image_async(self, file_id):
+        """
+        Async version of 'splash_image'.
+
+        :param file_id: Id of the video.
+        :return: Url of the splash image.
+        """
+
+        return await self._get_async('file/getsplash', params={'file': file_id})
+
+    async def _get_async(self, url, params=None):
+        """
+        Async version of the API GET request: it uses the shared AsyncRuntime HTTP client.
+
+        :param url: Relative path of the API service (ex: file/ul).
+        :param params: (Optional, Default=None) Parameters sent in the GET request.
+        :return: Result of the API request.
+        """
+
+        params = dict(params or {})
+        params.update({'login': self.login, 'key': self.key})
+
+        response_json = await AsyncRuntime.CURRENT.get_json(self.api_url + url, params=params)
+        return self._process_response(response_json)
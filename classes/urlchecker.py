@@ -1,14 +1,103 @@
+import asyncio
 import re
+import threading
+from urllib.parse import urlsplit, urlunsplit
 
 import requests
-from urllib3.exceptions import MaxRetryError
+from requests.adapters import HTTPAdapter
+
+from classes.asyncruntime import AsyncRuntime
+from classes.ttlcache import TTLCache
 
 
 class UrlChecker:
     """
     This class is used to check if a URL is valid in all of its forms (format and reachable via browser).
+
+    The reachability checks share a keep-alive session, send a HEAD request (with a streamed GET fallback, so
+    the page body is never downloaded) and their results are cached by normalized URL.
     """
 
+    URL_REGEX = re.compile(
+        r'^(?:http|ftp)s?://'  # http:// or https:// or ftp:// or ftps://
+        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
+        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+        r'(?::\d+)?'  # optional port
+        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+    # (connect, read) timeouts in seconds of every check
+    TIMEOUT = (3.05, 5)
+
+    # Max number of keep-alive connections for every host
+    POOL_SIZE = 10
+
+    # Seconds after which an unreachable URL is checked again (reachable URLs use the cache TTL)
+    NEGATIVE_TTL = 30
+
+    # Results of the reachability checks: <normalized url>: bool
+    CACHE = TTLCache(max_size=1024, ttl=300)
+
+    # Status codes of servers that don't support HEAD requests (a GET request is sent instead)
+    HEAD_NOT_SUPPORTED = (400, 403, 404, 405, 501)
+
+    _SESSION = None
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, timeout=None, cache_ttl=None, cache_size=None):
+        """
+        Changes the settings of the checks.
+
+        :param timeout: (Optional) Read timeout in seconds.
+        :param cache_ttl: (Optional) Seconds after which a reachable URL is checked again.
+        :param cache_size: (Optional) Max number of cached URLs.
+        """
+
+        if timeout is not None:
+            cls.TIMEOUT = (min(cls.TIMEOUT[0], timeout), timeout)
+
+        if cache_ttl is not None or cache_size is not None:
+            cls.CACHE = TTLCache(
+                max_size=cache_size if cache_size is not None else cls.CACHE.MAX_SIZE,
+                ttl=cache_ttl if cache_ttl is not None else cls.CACHE.TTL
+            )
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """
+        :return: Keep-alive session shared by all the checks.
+        """
+
+        with cls._session_lock:
+            if cls._SESSION is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=cls.POOL_SIZE, pool_maxsize=cls.POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._SESSION = session
+
+            return cls._SESSION
+
+    @staticmethod
+    def normalize(url) -> str:
+        """
+        Normalizes a URL so the same page is cached only once (lowercase scheme and host, default port,
+        fragment and empty path removed).
+
+        :param url: Url to normalize.
+        :return: Normalized url.
+        """
+
+        parts = urlsplit(str(url).strip())
+        scheme = parts.scheme.lower()
+        netloc = parts.netloc.lower()
+
+        default_port = {"http": ":80", "https": ":443"}.get(scheme)
+        if default_port is not None and netloc.endswith(default_port):
+            netloc = netloc[:-len(default_port)]
+
+        return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
     @staticmethod
     def check_format(url) -> bool:
         """
@@ -17,31 +106,82 @@ class UrlChecker:
         :return: True if the URL is valid, otherwise False.
         """
 
-        regex = re.compile(
-            r'^(?:http|ftp)s?://'  # http:// or https:// or ftp:// or ftps://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-
-        return regex.match(str(url))
+        return UrlChecker.URL_REGEX.match(str(url))
 
     @staticmethod
     def check_exists(url) -> bool:
         """
-        This method checks if a website URL is reachable using requests library. It send a HTTP GET
-        requests and reads the response code.
+        This method checks if a website URL is reachable using requests library. It sends a HTTP HEAD
+        request (or a streamed GET request if the server doesn't support HEAD) and reads the response code.
 
         :param url: Url of the website to check if it is reachable.
         :return: True if the HTTP response code is equals to 200, otherwise False.
         """
 
+        if AsyncRuntime.CURRENT is not None:
+            return AsyncRuntime.CURRENT.run(UrlChecker.check_exists_async(url))
+
+        key = UrlChecker.normalize(url)
+        cached = UrlChecker.CACHE.get(key)
+
+        if cached is not None:
+            return cached
+
+        session = UrlChecker.get_session()
+
         try:
-            request = requests.get(str(url))
-            return request.status_code == 200
+            with session.head(str(url), allow_redirects=True, timeout=UrlChecker.TIMEOUT) as response:
+                status = response.status_code
+
+            if status in UrlChecker.HEAD_NOT_SUPPORTED:
+                # The body is never read, the connection is closed as soon as the headers are received
+                with session.get(str(url), stream=True, timeout=UrlChecker.TIMEOUT) as response:
+                    status = response.status_code
+
+        except (requests.exceptions.RequestException, ValueError):
+            status = None
+
+        return UrlChecker._save_result(key, status)
+
+    @staticmethod
+    async def check_exists_async(url) -> bool:
+        """
+        Async version of 'check_exists', it uses the shared AsyncRuntime HTTP client.
+
+        :param url: Url of the website to check if it is reachable.
+        :return: True if the HTTP response code is equals to 200, otherwise False.
+        """
+
+        import aiohttp
+
+        key = UrlChecker.normalize(url)
+        cached = UrlChecker.CACHE.get(key)
+
+        if cached is not None:
+            return cached
+
+        # Same timeouts of the blocking check (the session timeout is meant for the slow API requests)
+        timeout = aiohttp.ClientTimeout(connect=UrlChecker.TIMEOUT[0], sock_read=UrlChecker.TIMEOUT[1])
+
+        try:
+            status = await AsyncRuntime.CURRENT.fetch_status(str(url), "HEAD", timeout=timeout)
+
+            if status in UrlChecker.HEAD_NOT_SUPPORTED:
+                status = await AsyncRuntime.CURRENT.fetch_status(str(url), "GET", timeout=timeout)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            status = None
+
+        return UrlChecker._save_result(key, status)
+
+    @staticmethod
+    def _save_result(key, status) -> bool:
+        exists = status == 200
+
+        UrlChecker.CACHE.set(key, exists, ttl=None if exists else UrlChecker.NEGATIVE_TTL)
+        print("[UrlChecker] {} -> {}".format(key, status))
 
-        except (MaxRetryError, requests.exceptions.ConnectionError):
-            return False
+        return exists
 
     @staticmethod
     def full_check(url):
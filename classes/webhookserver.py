@@ -0,0 +1,126 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telegram import Update
+
+
+class WebhookServer:
+    """
+    This class receives the Telegram updates on a local HTTP server (webhook mode) instead of asking them with
+    long polling. The updates are POSTed as JSON on the secret path: a single update (Telegram webhook) or a list
+    of updates (bulk, ex: recorded updates). They are put in the dispatcher queue, so they are processed by the
+    same handlers and workers of the polling mode. The server runs in a background thread.
+    """
+
+    def __init__(self, bot, update_queue, secret_path: str, host="127.0.0.1", port=8443, max_body_size=10485760):
+        """
+        Parametrized constructor method.
+
+        :param bot: Telegram.Bot object used to decode the updates.
+        :param update_queue: Queue of the dispatcher (Updater.update_queue).
+        :param secret_path: Path where the updates are accepted (ex: 'a8f3...', the other paths return 404).
+        :param host: (Optional, Default=127.0.0.1) Address where the server listens.
+        :param port: (Optional, Default=8443) Port where the server listens.
+        :param max_body_size: (Optional, Default=10MB) Max size in bytes of a request.
+        """
+
+        self.BOT = bot
+        self.UPDATE_QUEUE = update_queue
+        self.SECRET_PATH = "/" + secret_path.strip("/")
+        self.HOST = host
+        self.PORT = port
+        self.MAX_BODY_SIZE = max_body_size
+
+        # Number of received updates
+        self.received = 0
+        self._lock = threading.Lock()
+
+        self._server = None
+        self._thread = None
+
+    def dispatch(self, data) -> int:
+        """
+        Decodes the updates and puts them in the dispatcher queue.
+
+        :param data: Decoded JSON of an update (dict) or a list of updates.
+        :return: Number of dispatched updates.
+        :raises ValueError: If the data is not an update or a list of updates.
+        """
+
+        updates = data if isinstance(data, list) else [data]
+
+        if not all(isinstance(update, dict) and "update_id" in update for update in updates):
+            raise ValueError("Expected an update or a list of updates")
+
+        # All the updates are decoded before dispatching them, so an invalid bulk is rejected as a whole
+        decoded = [Update.de_json(update, self.BOT) for update in updates]
+
+        for update in decoded:
+            self.UPDATE_QUEUE.put(update)
+
+        with self._lock:
+            self.received += len(updates)
+
+        return len(updates)
+
+    def start(self):
+        """
+        Starts the server thread.
+        """
+
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split("?")[0].rstrip("/") != webhook.SECRET_PATH:
+                    self.send_error(404)
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                if length > webhook.MAX_BODY_SIZE:
+                    self.send_error(413)
+                    return
+
+                try:
+                    count = webhook.dispatch(json.loads(self.rfile.read(length).decode("utf-8")))
+                except (ValueError, KeyError, TypeError) as ex:
+                    # Invalid JSON or not an update (Telegram doesn't retry the 4xx responses)
+                    print("[WebhookServer] Invalid request:", str(ex))
+                    self.send_error(400)
+                    return
+
+                body = json.dumps({"ok": True, "updates": count}).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.send_error(405)
+
+            def log_message(self, *args):
+                # Every message is a request, they are not logged
+                pass
+
+        self._server = ThreadingHTTPServer((self.HOST, self.PORT), Handler)
+        self._server.daemon_threads = True
+
+        self._thread = threading.Thread(target=self._server.serve_forever, name="WebhookServer")
+        self._thread.daemon = True
+        self._thread.start()
+
+        print("[WebhookServer] Receiving updates on http://{}:{}{}".format(
+            self.HOST, self._server.server_port, self.SECRET_PATH))
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,315 @@
+import itertools
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class WorkerPool:
+    """
+    This class runs the CPU heavy steps of the jobs (metadata extraction and preview generation) in pre-forked
+    worker processes, so they don't compete for the GIL with the Telegram dispatcher and the other jobs.
+
+    Every worker imports Youtube-DL and OpenCV once and keeps a YoutubeDL object with the extractors already
+    initialized, so the startup cost is not paid by the jobs. The tasks are sent to the workers over a pipe, the
+    workers send back the events of the task while it runs (Youtube-DL messages, extracted preview frames) and
+    then its result. A worker that dies (ex: OpenCV crash) is replaced, its task fails with a RuntimeError. A
+    worker that doesn't finish a task in 'task_timeout' seconds (ex: stuck connection) is killed and replaced, its
+    task fails with a TimeoutError.
+
+    The downloads and the uploads are not run by the workers: they are I/O bound (the threads wait on sockets,
+    without holding the GIL) and they're tied to the job thread (progress hooks, pipelined upload, kill), so they
+    stay on the job threads of the JobScheduler.
+    """
+
+    # Tasks
+    EXTRACT, PREVIEW = "extract", "preview"
+
+    # Modules imported by the fork server, the workers are forked with them already loaded
+    PRELOAD = ["youtube_dl", "cv2", "classes.previewgenerator", "classes.workerpool"]
+
+    def __init__(self, workers=2, preview_options=None, task_timeout=600):
+        """
+        Parametrized constructor method.
+
+        :param workers: (Optional, Default=2) Number of worker processes.
+        :param preview_options: (Optional, Default=None) Arguments of the PreviewGenerator of every worker
+        (ex: {"seek_mode": "timestamp", "selection": "scene"}).
+        :param task_timeout: (Optional, Default=600) Max number of seconds of a task.
+        """
+
+        self.WORKERS = workers
+        self.TASK_TIMEOUT = task_timeout
+        self.PREVIEW_OPTIONS = dict(preview_options or {})
+
+        # The frames of a preview are already extracted in a worker process (no nested pools)
+        self.PREVIEW_OPTIONS["workers"] = 0
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            # Workers forked from a clean process (no threads of the bot) with the modules already imported
+            self._context = multiprocessing.get_context("forkserver")
+            self._context.set_forkserver_preload(self.PRELOAD)
+        else:
+            self._context = multiprocessing.get_context("spawn")
+
+        self._tasks = queue.Queue()
+        self._task_ids = itertools.count(1)
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        """
+        Starts the worker processes (and the threads that send them the tasks).
+        """
+
+        for index in range(self.WORKERS):
+            thread = threading.Thread(target=self._run, args=(index + 1,), name="WorkerPool-{}".format(index + 1))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+        print("[WorkerPool] Started {} worker processes".format(self.WORKERS))
+
+    def shutdown(self):
+        """
+        Stops the worker processes after their current task.
+        """
+
+        self._stopping = True
+
+        for _ in self._threads:
+            self._tasks.put(None)
+
+        self._threads = []
+
+    def submit(self, task: str, args: tuple, on_event=None) -> Future:
+        """
+        Sends a task to the first free worker.
+
+        :param task: Task name (EXTRACT or PREVIEW).
+        :param args: Arguments of the task.
+        :param on_event: (Optional, Default=None) Function called with every event of the task (dict).
+        :return: Future with the result of the task.
+        """
+
+        future = Future()
+        self._tasks.put((next(self._task_ids), task, args, on_event, future))
+        return future
+
+    def extract_info(self, url: str) -> dict:
+        """
+        Extracts the metadata of a URL in a worker ('extract_info' without download and without processing).
+
+        :param url: Video url.
+        :return: Metadata.
+        :raises youtube_dl.utils.DownloadError: If the extraction fails.
+        :raises TimeoutError: If the extraction takes more than 'task_timeout' seconds.
+        """
+
+        # The future always ends: the worker is killed when the task times out
+        return self.submit(self.EXTRACT, (url,), on_event=self._print_event).result()
+
+    def generate_preview(self, video_path, save_path, on_frame=None) -> dict:
+        """
+        Generates the preview of a video in a worker (same arguments and result of
+        'PreviewGenerator.generate_preview').
+
+        :raises TimeoutError: If the generation takes more than 'task_timeout' seconds.
+        """
+
+        def on_event(event):
+            if on_frame is not None and "frames" in event:
+                on_frame(event["frames"], event["total"])
+
+        return self.submit(self.PREVIEW, (video_path, save_path), on_event=on_event).result()
+
+    @staticmethod
+    def _print_event(event):
+        if "message" in event:
+            print("[WorkerPool]", event["message"])
+
+    def _start_worker(self, index: int):
+        parent_conn, child_conn = self._context.Pipe()
+
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.PREVIEW_OPTIONS), name="RimeSegateWorker-{}".format(index)
+        )
+        process.daemon = True
+        process.start()
+
+        # Only the worker uses its end of the pipe (EOF is detected if the worker dies)
+        child_conn.close()
+
+        return process, parent_conn
+
+    def _run(self, index: int):
+        """
+        Thread of a worker: sends it the tasks one at a time, dispatches the events and sets the results.
+        The thread waits on the pipe, so it doesn't hold the GIL while the worker works.
+        """
+
+        process, conn = self._start_worker(index)
+
+        while True:
+            item = self._tasks.get()
+
+            if item is None:
+                conn.send(None)
+                process.join(5)
+                conn.close()
+                return
+
+            task_id, task, args, on_event, future = item
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if not process.is_alive():
+                # Died while it was waiting for a task
+                process, conn = self._restart_worker(index, process, conn)
+
+            deadline = time.monotonic() + self.TASK_TIMEOUT
+
+            try:
+                conn.send((task_id, task, args))
+
+                timed_out = False
+
+                while True:
+                    if not conn.poll(max(0.0, deadline - time.monotonic())):
+                        timed_out = True
+                        break
+
+                    kind, _, data = conn.recv()
+
+                    if kind == "event":
+                        if on_event is not None:
+                            try:
+                                on_event(data)
+                            except Exception as ex:
+                                print("[WorkerPool] Event callback error:", str(ex))
+                        continue
+
+                    if kind == "result":
+                        future.set_result(data)
+                    else:
+                        future.set_exception(data)
+                    break
+
+                if timed_out:
+                    print("[WorkerPool] Worker {} timed out, killing it".format(index))
+                    process.kill()
+                    future.set_exception(TimeoutError("The task took more than {} seconds".format(self.TASK_TIMEOUT)))
+
+                    if self._stopping:
+                        return
+
+                    process, conn = self._restart_worker(index, process, conn)
+
+            except (EOFError, OSError) as ex:
+                print("[WorkerPool] Worker {} died ({})".format(index, str(ex) or "EOF"))
+                future.set_exception(RuntimeError("The worker process died while processing the task"))
+
+                if self._stopping:
+                    return
+
+                # Wait a little, so a crash at the startup doesn't become a fork loop
+                time.sleep(1)
+                process, conn = self._restart_worker(index, process, conn)
+
+    def _restart_worker(self, index: int, process, conn):
+        print("[WorkerPool] Starting a new worker {}".format(index))
+
+        conn.close()
+        process.join(1)
+
+        return self._start_worker(index)
+
+
+class _EventLogger:
+    """
+    Youtube-DL logger of a worker: the messages are sent to the bot process as events of the current task.
+    """
+
+    def __init__(self, send):
+        self.send = send
+
+    def debug(self, msg):
+        self.send({"message": msg})
+
+    def warning(self, msg):
+        self.send({"message": "WARNING: " + msg})
+
+    def error(self, msg):
+        self.send({"message": msg})
+
+
+def _worker_main(conn, preview_options):
+    """
+    Worker process: initializes Youtube-DL and the preview generator once, then runs the received tasks until
+    it receives None (or the bot process closes the pipe).
+
+    :param conn: Connection with the bot process.
+    :param preview_options: Arguments of the PreviewGenerator.
+    """
+
+    import youtube_dl
+    from youtube_dl.extractor import gen_extractor_classes
+
+    from classes.previewgenerator import PreviewGenerator
+
+    current = {"id": None}
+
+    def send_event(event):
+        conn.send(("event", current["id"], event))
+
+    ydl = youtube_dl.YoutubeDL({'quiet': True, 'no_warnings': True, 'logger': _EventLogger(send_event)})
+
+    # Compile the URL patterns of all the extractors now (they are compiled on the first 'suitable' call)
+    for extractor in gen_extractor_classes():
+        extractor.suitable("")
+
+    generator = PreviewGenerator(**preview_options)
+
+    tasks = {
+        WorkerPool.EXTRACT: lambda url: ydl.extract_info(url, download=False, process=False),
+        WorkerPool.PREVIEW: lambda video_path, save_path: generator.generate_preview(
+            video_path, save_path, on_frame=lambda frames, total: send_event({"frames": frames, "total": total})
+        ),
+    }
+
+    while True:
+        try:
+            item = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+
+        if item is None:
+            return
+
+        current["id"], task, args = item
+
+        try:
+            conn.send(("result", current["id"], tasks[task](*args)))
+
+        except Exception as ex:
+            conn.send(("error", current["id"], _picklable(ex)))
+
+
+def _picklable(ex: Exception) -> Exception:
+    """
+    :return: The exception (without traceback objects) if it can be sent to the bot process, otherwise a
+    RuntimeError with the same message.
+    """
+
+    if hasattr(ex, "exc_info"):
+        # Youtube-DL DownloadError keeps the traceback of the original error
+        ex.exc_info = None
+
+    try:
+        pickle.loads(pickle.dumps(ex))
+        return ex
+    except Exception:
+        return RuntimeError("{}: {}".format(type(ex).__name__, str(ex)))